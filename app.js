@@ -19,6 +19,10 @@ const CONFIG = {
     // Dla produkcji (GitHub Pages + Cloudflare Worker):
     API_URL: 'https://wispy-sunset-6278.bartlomiej-bartczak.workers.dev',
 
+    // Wszystkie strony w jednej odpowiedzi NDJSON (/stream/) - tylko z proxy_server.py
+    USE_STREAM: false,
+    STREAM_URL: '/stream',
+
     MAX_CONCURRENT_REQUESTS: 5,
     TIMEOUT: 30000,
     RETRY_DELAY: 1000,
@@ -1017,10 +1021,16 @@ async function searchVoivodeship(code, dateFrom, dateTo, filters, progressCallba
         params.append('filter[pochodzenie-pojazdu]', filters.origin.toUpperCase());
     }
 
-    const vehicles = [];
+    let vehicles = [];
     let page = 1;
     let hasMore = true;
 
+    if (CONFIG.USE_STREAM) {
+        // Proxy pobiera wszystkie strony i odsyła rekordy strumieniem
+        vehicles = await fetchVehiclesStream(params, progressCallback);
+        hasMore = false;
+    }
+
     // Debug: Pokaż co wysyłamy
     console.log(`🔍 Wyszukiwanie w województwie ${code}:`, {
         dateFrom: dateFromAPI,
@@ -1074,6 +1084,48 @@ function sleep(ms) {
     return new Promise(resolve => setTimeout(resolve, ms));
 }
 
+// Wszystkie strony zapytania jako jeden strumień NDJSON z proxy_server.py (/stream/pojazdy)
+async function fetchVehiclesStream(params, progressCallback = null) {
+    const streamParams = new URLSearchParams(params);
+    streamParams.delete('page');
+
+    const response = await fetch(`${CONFIG.STREAM_URL}/pojazdy?${streamParams}`);
+    if (!response.ok) {
+        throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+    }
+
+    const total = parseInt(response.headers.get('X-Total-Count') || '0', 10);
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    const vehicles = [];
+    let buffer = '';
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();  // niepełna linia - dokończy ją następny fragment
+
+        for (const line of lines) {
+            if (!line) continue;
+            const record = JSON.parse(line);
+            if (record.error) {
+                throw new Error(`Stream error: ${record.error}`);
+            }
+            vehicles.push(record);
+        }
+
+        updateProgress(vehicles.length, total || vehicles.length);
+        if (progressCallback) {
+            progressCallback(Math.ceil(vehicles.length / 500), vehicles.length);
+        }
+    }
+
+    return vehicles;
+}
+
 // Fetch z timeoutem i lepszą obsługą błędów
 async function fetchWithTimeout(url, options = {}, timeout = CONFIG.TIMEOUT) {
     const controller = new AbortController();
@@ -3,21 +3,34 @@ BRONA - Bieżące Raporty O Nabytych Autach
 Aplikacja Streamlit do przeglądania danych z CEPiK
 Wersja 2.3
 """
+import time
+_import_start = time.perf_counter()
+
 import streamlit as st
 import pandas as pd
-import plotly.express as px
+import numpy as np
 from datetime import datetime, timedelta
-from cepik_api import CepikAPI
+from cepik_api import CepikAPI, CircuitBreaker, RetryPolicy
+from dataset_store import DatasetRegistry, DictionarySnapshot, SnapshotStore, query_fingerprint
+from table_view import FrameIndexCache, SelectionView, page_count, search_mask, table_window
+from trends import FREQUENCIES, TrendEngine, shares
+import config
+import os
 import sys
+import threading
 import logging
 
-# Włącz tryb debugowania
+# plotly.express jest importowany dopiero przy rysowaniu wykresu (kilkaset ms przy starcie)
+_import_time = time.perf_counter() - _import_start
+
+# Poziom logowania z konfiguracji (DEBUG loguje każde połączenie urllib3)
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=getattr(logging, config.LOG_LEVEL, logging.WARNING),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     stream=sys.stdout
 )
-print("[DEBUG] Streamlit app started in DEBUG mode")
+if config.LOG_LEVEL == 'DEBUG':
+    print("[DEBUG] Streamlit app started in DEBUG mode")
 
 
 # Konfiguracja strony
@@ -28,23 +41,206 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Profil startu procesu - czasy etapów pierwszego uruchomienia skryptu
+@st.cache_resource
+def get_startup_profile():
+    return {'import': _import_time, 'done': False}
+
+startup_profile = get_startup_profile()
+_phase_start = time.perf_counter()
+
+
+def mark_startup(phase: str):
+    """Zapisuje czas etapu startu (tylko przy pierwszym uruchomieniu w procesie)."""
+    global _phase_start
+    now = time.perf_counter()
+    if not startup_profile['done']:
+        startup_profile[phase] = now - _phase_start
+    _phase_start = now
+
+
 # Inicjalizacja API
 @st.cache_resource
 def init_api():
-    return CepikAPI()
+    api = CepikAPI(
+        decode_workers=config.DECODE_WORKERS,
+        max_concurrency=config.MAX_CONCURRENCY,
+        retry_policy=RetryPolicy(config.RETRY_MAX, config.RETRY_BASE_DELAY, config.RETRY_MAX_DELAY),
+        circuit_breaker=CircuitBreaker(config.BREAKER_FAILURES, config.BREAKER_RESET),
+        hedging=config.HEDGING
+    )
+    if config.WARMUP_CONNECTIONS > 0:
+        # Połączenia TLS zestawiane w tle - nie opóźniają pierwszego renderu strony
+        threading.Thread(target=api.warmup, args=(config.WARMUP_CONNECTIONS,), daemon=True).start()
+    return api
 
 api = init_api()
+mark_startup('api')
+
+# Rejestr zbiorów danych współdzielonych przez wszystkie sesje
+@st.cache_resource
+def get_dataset_registry():
+    return DatasetRegistry(
+        max_datasets=config.SHARED_DATASETS_MAX,
+        ttl=config.SHARED_DATASETS_TTL,
+        memory_budget=config.MEMORY_BUDGET_MB * 1024 * 1024,
+        spill_dir=os.path.join(config.SPILL_DIR, str(os.getpid()))  # osobny katalog dla procesu
+    )
+
+registry = get_dataset_registry()
+
+# Nazwane migawki danych na dysku
+@st.cache_resource
+def get_snapshot_store():
+    return SnapshotStore(config.SNAPSHOT_DIR)
+
+snapshots = get_snapshot_store()
+
+# Indeksy sortowania i filtrowania zbiorów (liczone raz na wersję zbioru, wspólne dla sesji)
+@st.cache_resource
+def get_frame_indexes():
+    return FrameIndexCache(max_entries=config.SHARED_DATASETS_MAX)
+
+frame_indexes = get_frame_indexes()
+
+# Serie czasowe rejestracji (okresy wierszy i wyniki zapamiętywane dla wersji zbioru)
+@st.cache_resource
+def get_trend_engine():
+    return TrendEngine()
+
+trend_engine = get_trend_engine()
+
+# Stan aplikacji (przechowywanie danych między odświeżeniami)
+# Sesja trzyma tylko uchwyty do współdzielonych zbiorów: [{'handle', 'batch_id', 'params'}]
+if 'datasets' not in st.session_state:
+    st.session_state.datasets = []
+if 'search_params' not in st.session_state:
+    st.session_state.search_params = None
+if 'batch_id_counter' not in st.session_state:
+    st.session_state.batch_id_counter = 0
+
+
+def release_session_datasets():
+    """Zwalnia uchwyty sesji do współdzielonych zbiorów."""
+    for entry in st.session_state.get('datasets') or []:
+        entry['handle'].release()
+    if st.session_state.get('combined_handle'):
+        st.session_state.combined_handle.release()
+        st.session_state.combined_handle = None
+    st.session_state.datasets = []
 
-# Cache'owane funkcje dla słowników - ważne przez 24 godziny
-@st.cache_data(ttl=86400)  # 24 godziny = 86400 sekund
-def get_cached_voivodeships():
-    """Pobiera listę województw z cache (24h)"""
-    return api.get_voivodeships()
 
-@st.cache_data(ttl=86400)  # 24 godziny
-def get_cached_dictionaries():
-    """Pobiera wszystkie słowniki z cache (24h)"""
-    return api.get_all_dictionaries()
+def store_session_dataset(handle, params, append):
+    """Dodaje zbiór (uchwyt) do sesji jako nowy batch. Zwraca numer batcha."""
+    st.session_state.batch_id_counter += 1
+    entry = {'handle': handle, 'batch_id': st.session_state.batch_id_counter, 'params': params}
+    if append and st.session_state.datasets:
+        st.session_state.datasets = st.session_state.datasets + [entry]
+    else:
+        release_session_datasets()
+        st.session_state.datasets = [entry]
+    st.session_state.search_params = params
+    
+    # Budżet pamięci sesji - zrzuć na dysk najstarsze batche (oprócz nowego)
+    registry.enforce_budget(
+        config.SESSION_MEMORY_BUDGET_MB * 1024 * 1024,
+        keys=session_dataset_keys(),
+        keep={handle.key}
+    )
+    return entry['batch_id']
+
+
+def shift_table_page(delta, pages):
+    """Przejście do poprzedniej/następnej strony tabeli wyników (callback przycisków)."""
+    st.session_state.table_page = min(max(1, st.session_state.get('table_page', 1) + delta), pages)
+
+
+def session_dataset_keys():
+    """Klucze zbiorów w rejestrze używanych przez bieżącą sesję."""
+    keys = {e['handle'].key for e in st.session_state.get('datasets') or []}
+    if st.session_state.get('combined_handle'):
+        keys.add(st.session_state.combined_handle.key)
+    return keys
+
+
+def session_frame_key():
+    """
+    Wersja zbioru zwracanego przez session_frame() - klucz w rejestrze i czas rejestracji
+    (ten sam odcisk zapytania pobrany ponownie po usunięciu z rejestru to inny zbiór).
+    """
+    entries = st.session_state.datasets
+    if len(entries) == 1:
+        return entries[0]['handle'].version
+    return ('combined',) + tuple((e['handle'].version, e['batch_id']) for e in entries)
+
+
+def session_frame():
+    """
+    DataFrame sesji. Pojedynczy batch to współdzielony zbiór bez kopiowania;
+    kilka batchy jest łączonych (z kolumną _batch_id) i również trafia do rejestru.
+    """
+    entries = st.session_state.datasets
+    if len(entries) == 1:
+        return entries[0]['handle'].frame
+    
+    key = session_frame_key()
+    handle = st.session_state.get('combined_handle')
+    if handle is None or handle.key != key:
+        if handle is not None:
+            handle.release()
+        # Wspólne kody kolumn kategorycznych - łączenie bez ponownej faktoryzacji
+        handle = registry.get_or_create(key, lambda: api.categories.concat(
+            [e['handle'].frame.assign(_batch_id=e['batch_id']) for e in entries],
+            ignore_index=True
+        ))
+        st.session_state.combined_handle = handle
+        registry.enforce_budget(
+            config.SESSION_MEMORY_BUDGET_MB * 1024 * 1024,
+            keys=session_dataset_keys(),
+            keep={handle.key}
+        )
+    return handle.frame
+
+# Słowniki z migawki na dysku - odświeżane raz dziennie
+@st.cache_resource
+def get_dictionary_snapshot():
+    snapshot = DictionarySnapshot(config.DICTIONARY_SNAPSHOT, max_age=config.DICTIONARY_MAX_AGE)
+    # Kody wartości słowników z migawki przed pierwszym pobraniem - raz na proces
+    # (słowniki odświeżane z API trafiają do tabeli kodów w get_dictionary)
+    for name, values in ((snapshot.data or {}).get('dictionaries') or {}).items():
+        api.categories.seed(name, values)
+    return snapshot
+
+dictionary_snapshot = get_dictionary_snapshot()
+
+
+def load_dictionaries():
+    """Pobiera wszystkie słowniki z API (None, gdy API nie zwróciło słowników)."""
+    dictionaries = api.get_all_dictionaries()
+    if not dictionaries:
+        return None
+    return {'voivodeships': api.get_voivodeships(), 'dictionaries': dictionaries}
+
+
+def get_cached_dictionary_data():
+    """
+    Województwa i słowniki z migawki. W trybie szybkiego startu przestarzała lub
+    brakująca migawka jest odświeżana w tle, a do tego czasu pasek boczny używa
+    zapisanych danych (lub wbudowanej listy województw).
+    """
+    if dictionary_snapshot.stale:
+        if config.FAST_START:
+            dictionary_snapshot.refresh_async(load_dictionaries)
+        else:
+            data = load_dictionaries()
+            if data:
+                dictionary_snapshot.save(data)
+    data = dictionary_snapshot.data or {}
+    voivodeships = [tuple(v) for v in data.get('voivodeships') or api.WOJEWODZTWA_KODY.items()]
+    return voivodeships, data.get('dictionaries') or {}
+
+voivodeships, dictionaries = get_cached_dictionary_data()
+mark_startup('dictionaries')
 
 # Ukryj elementy deweloperskie Streamlit
 hide_streamlit_style = """
@@ -79,8 +275,8 @@ with st.expander("ℹ️ Jak działa aplikacja?"):
     - 🔍 Po rodzaju paliwa (w tabeli)
     
     **Wskazówki:**
-    - 🚗 **Marka pojazdu:** Domyślnie widoczne "Wpisz markę..." oznacza wyszukiwanie wszystkich marek. 
-      Wybierz konkretną markę z listy aby zawęzić wyniki.
+    - 🚗 **Marka i model:** Puste pole oznacza wyszukiwanie wszystkich marek/modeli. Wystarczy
+      początek nazwy lub nazwa z literówką - aplikacja podpowie pasujące wartości z rejestru.
     - ⚡ Użyj filtrów marki/modelu przed wyszukiwaniem - API zwróci tylko pasujące pojazdy (szybciej!)
     - 📊 Bez filtrów pobierzesz wszystkie pojazdy z okresu (może być ich dużo)
     - ⏱️ Pobieranie dużej ilości pojazdów może potrwać do 60 sekund
@@ -91,9 +287,6 @@ with st.expander("ℹ️ Jak działa aplikacja?"):
 # Sidebar z filtrami
 st.sidebar.header("🔍 Wyszukiwanie")
 
-# Pobieranie województw (cache 24h)
-voivodeships = get_cached_voivodeships()
-
 # 1. WOJEWÓDZTWO (wymagane)
 st.sidebar.markdown("### 📍 Województwo *")
 
@@ -186,36 +379,40 @@ st.session_state.date_to = date_to
 # 3. FILTRY API (wszystkie w jednej ramce)
 st.sidebar.markdown("### 🚀 Filtry wyszukiwania")
 st.sidebar.caption("⚡ Filtrowanie przez API - zwraca tylko pasujące pojazdy")
-st.sidebar.caption("📦 Słowniki odświeżane raz dziennie")
-
-# Pobierz słowniki z API (cache 24h)
-dictionaries = get_cached_dictionaries()
+if dictionary_snapshot.refreshing and not dictionaries:
+    st.sidebar.caption("📦 Wczytywanie słowników z API w tle...")
+else:
+    st.sidebar.caption("📦 Słowniki odświeżane raz dziennie")
 
 with st.sidebar.expander("🔧 Wszystkie filtry", expanded=True):
-    # Marka - z API (dropdown jeśli dostępne)
+    # Marka - pole tekstowe z podpowiedziami (słownik ma tysiące wartości)
     marki = dictionaries.get('marka', [])
-    if marki and len(marki) > 0:
-        brand_options = ["Wpisz markę..."] + sorted(marki)
-        brand_search = st.selectbox(
-            "Marka pojazdu",
-            options=brand_options,
-            index=0,
-            key="brand_filter",
-            help="Zostaw 'Wpisz markę...' aby wyszukać wszystkie marki, lub wybierz konkretną markę"
-        )
-        # Jeśli nie zmieniono domyślnej opcji, wyszukaj wszystkie marki (None = wszystkie)
-        if brand_search == "Wpisz markę...":
-            brand_search = None
-    else:
-        brand_search = st.text_input(
-            "Marka pojazdu",
-            value="",
-            placeholder="np. BMW, TOYOTA, AUDI (zostaw puste dla wszystkich)",
-            key="brand_filter",
-            help="Zostaw puste aby przeszukać wszystkie marki"
-        )
-        # Puste pole = wszystkie marki
-        brand_search = brand_search.strip() if brand_search else None
+    if marki and api.suggestions.brand_count == 0:
+        api.suggestions.add_brands(marki)
+    brand_text = st.text_input(
+        "Marka pojazdu",
+        value="",
+        placeholder="np. BMW, TOYOTA, AUDI (zostaw puste dla wszystkich)",
+        key="brand_filter",
+        help="Wystarczy początek nazwy - pasujące marki pojawią się poniżej. Zostaw puste aby przeszukać wszystkie marki"
+    )
+    brand_text = brand_text.strip() if brand_text else ""
+    brand_search = None
+    if brand_text:
+        brand_search = api.suggestions.resolve_brand(brand_text)
+        if brand_search is None:
+            brand_matches = api.suggestions.suggest_brands(brand_text, limit=20)
+            if brand_matches:
+                brand_search = st.selectbox(
+                    "Pasujące marki",
+                    options=brand_matches,
+                    key="brand_suggestion",
+                    help="Marki ze słownika CEPiK pasujące do wpisanego tekstu"
+                )
+            else:
+                # Brak w słowniku - wyszukaj wpisaną wartość
+                brand_search = brand_text.upper()
+                st.caption("⚠️ Marki nie ma w słowniku - zostanie wyszukana wpisana wartość")
     
     # Model - text input (za dużo wartości dla dropdown)
     model_search = st.text_input(
@@ -225,7 +422,33 @@ with st.sidebar.expander("🔧 Wszystkie filtry", expanded=True):
         help="Wielkość liter nie ma znaczenia. Zostaw puste dla wszystkich modeli.",
         key="model_filter"
     )
-    model_search = model_search if model_search else None
+    model_search = model_search.strip() if model_search else None
+    
+    # Model rozwiązywany do wartości z rejestru (modele poznane z pobranych stron)
+    model_query = model_search
+    if model_search:
+        # O jeden kandydat więcej niż limit - wiadomo, czy lista została obcięta
+        resolved_models, resolve_method = api.suggestions.resolve_model(
+            brand_search, model_search, limit=config.MODEL_FANOUT + 1
+        )
+        truncated = resolve_method != 'exact' and len(resolved_models) > config.MODEL_FANOUT
+        if truncated:
+            resolved_models = resolved_models[:config.MODEL_FANOUT]
+        if resolve_method != 'unknown':
+            model_query = resolved_models[0] if len(resolved_models) == 1 else resolved_models
+            if resolved_models != [model_search]:
+                st.caption(f"🔎 Model „{model_search}” → {', '.join(resolved_models)}")
+            if truncated:
+                st.caption(
+                    f"⚠️ Pasuje więcej modeli - wyszukane zostaną tylko pierwsze {config.MODEL_FANOUT} "
+                    f"(limit MODEL_FANOUT). Wpisz dokładniejszą nazwę modelu."
+                )
+        elif api.suggestions.model_count:
+            st.caption("⚠️ Modelu nie ma w pobranych danych - zostanie wyszukana wpisana wartość")
+    elif brand_search:
+        model_hints = api.suggestions.suggest_models(brand_search, "", limit=8)
+        if model_hints:
+            st.caption("💡 Znane modele: " + ", ".join(model_hints))
     
     # Rok produkcji
     st.markdown("**Rok produkcji:**")
@@ -296,26 +519,121 @@ append_mode = st.sidebar.checkbox(
     help="Zaznacz aby dodać nowe wyniki do poprzednich zamiast je zastępować"
 )
 
+# Specyfikacja zapytania dla planera (szacowanie kosztu przed pobieraniem)
+query_spec = None
+if voiv_code and date_from and date_to and date_from <= date_to:
+    query_spec = {
+        'voivodeship_codes': voiv_codes_list if voiv_code == "ALL" else [voiv_code],
+        'date_from': date_from.strftime("%Y%m%d"),
+        'date_to': date_to.strftime("%Y%m%d"),
+        'brand': brand_search,
+        'model': model_query,
+        'year_from': year_from,
+        'year_to': year_to,
+        'filters': dict(api_filters)
+    }
+
+if st.sidebar.button("📐 Oszacuj rozmiar zapytania", use_container_width=True, disabled=query_spec is None):
+    with st.sidebar:
+        with st.spinner("Szacowanie liczby pojazdów..."):
+            st.session_state.query_plan = {
+                'spec': query_spec,
+                'plan': api.plan_query(query_spec, max_pages=config.MAX_QUERY_PAGES)
+            }
+
+# Plan jest aktualny tylko dla tej samej specyfikacji zapytania
+plan_entry = st.session_state.get('query_plan')
+current_plan = plan_entry['plan'] if plan_entry and plan_entry['spec'] == query_spec else None
+allow_oversized = False
+
+if current_plan:
+    count_text = f"{current_plan['estimated_count']:,}".replace(',', ' ')
+    st.sidebar.caption(
+        f"📐 {current_plan['summary']} (~{count_text} pojazdów przed filtrami lokalnymi)"
+    )
+    if current_plan['local_filters']:
+        st.sidebar.caption("🔍 Filtrowane lokalnie: " + ", ".join(current_plan['local_filters'].keys()))
+    if current_plan['oversized']:
+        splits_text = ", ".join(f"{od}-{do}" for od, do in current_plan['splits'])
+        st.sidebar.warning(
+            f"⚠️ Zapytanie przekracza limit {config.MAX_QUERY_PAGES} stron. "
+            f"Podziel okres na: {splits_text} (użyj opcji dodawania do istniejących danych)."
+        )
+        allow_oversized = st.sidebar.checkbox("Pozwól na duże zapytanie", value=False)
+
 # Przycisk wyszukiwania
 search_button = st.sidebar.button("🔎 Wyszukaj pojazdy", type="primary", use_container_width=True)
 
 # Przycisk czyszczenia danych
-if st.session_state.get('vehicles_data'):
+if st.session_state.get('datasets'):
     if st.sidebar.button("🗑️ Wyczyść dane", use_container_width=True):
-        st.session_state.vehicles_data = None
+        release_session_datasets()
         st.session_state.search_params = None
         st.rerun()
 
+# Migawki danych - zapis bieżących danych na dysk i szybkie otwieranie bez ponownego pobierania
+with st.sidebar.expander("💾 Migawki danych", expanded=False):
+    if not snapshots.available:
+        st.caption("Zainstaluj pakiet pyarrow, aby zapisywać migawki danych")
+    else:
+        snapshot_name = st.text_input("Nazwa migawki", placeholder="np. mazowieckie_2024", key="snapshot_name")
+        if st.button(
+            "💾 Zapisz bieżące dane",
+            use_container_width=True,
+            disabled=not (st.session_state.datasets and snapshot_name)
+        ):
+            try:
+                snapshots.save(snapshot_name, session_frame(), {
+                    'search_params': st.session_state.search_params,
+                    'batches': [{'batch_id': e['batch_id'], 'params': e['params']} for e in st.session_state.datasets]
+                })
+                st.success(f"✅ Zapisano migawkę '{snapshot_name}'")
+            except Exception as e:
+                st.error(f"❌ Nie udało się zapisać migawki: {e}")
+        
+        available_snapshots = snapshots.list()
+        if available_snapshots:
+            snapshot_by_label = {
+                f"{snap['label']} · {snap['rows']} poj. · {snap['size'] / 1e6:.1f} MB · "
+                f"{datetime.fromtimestamp(snap['created']).strftime('%Y-%m-%d %H:%M')}": snap['name']
+                for snap in available_snapshots
+            }
+            selected_label = st.selectbox(
+                "Zapisane migawki",
+                options=list(snapshot_by_label.keys()),
+                key="snapshot_select"
+            )
+            selected_snapshot = snapshot_by_label[selected_label]
+            snap_col1, snap_col2 = st.columns(2)
+            with snap_col1:
+                if st.button("📂 Otwórz", use_container_width=True):
+                    snapshot_info = next(snap for snap in available_snapshots if snap['name'] == selected_snapshot)
+                    frame, info = snapshots.load(selected_snapshot)
+                    frame = api.categories.encode_frame(frame)  # kody migawki -> wspólna tabela
+                    # Kolumny zmapowane z pliku - poza budżetem RAM i bez ponownego zrzutu na dysk
+                    handle = registry.put(
+                        ('snapshot', selected_snapshot, snapshot_info['mtime']), frame,
+                        meta={'snapshot': info}, on_disk=True
+                    )
+                    snapshot_params = dict(info.get('params', {}).get('search_params') or {})
+                    for key in ('date_from', 'date_to'):
+                        if isinstance(snapshot_params.get(key), str):
+                            snapshot_params[key] = datetime.fromisoformat(snapshot_params[key])
+                    snapshot_params['voiv'] = f"{snapshot_params.get('voiv', '-')} (migawka: {info.get('name', selected_snapshot)})"
+                    store_session_dataset(handle, snapshot_params, append_mode)
+                    st.rerun()
+            with snap_col2:
+                if st.button("🗑️ Usuń", use_container_width=True):
+                    snapshots.delete(selected_snapshot)
+                    st.rerun()
+        else:
+            st.caption("Brak zapisanych migawek")
+
 st.sidebar.markdown("---")
 st.sidebar.markdown(r"**\* Pola wymagane**")
 
-# Stan aplikacji (przechowywanie danych między odświeżeniami)
-if 'vehicles_data' not in st.session_state:
-    st.session_state.vehicles_data = None
-if 'search_params' not in st.session_state:
-    st.session_state.search_params = None
-if 'batch_id_counter' not in st.session_state:
-    st.session_state.batch_id_counter = 0
+# Zużycie pamięci (wypełniane na końcu skryptu, po ewentualnym pobraniu danych)
+memory_placeholder = st.sidebar.empty()
 
 # WYSZUKIWANIE
 if search_button:
@@ -331,8 +649,40 @@ if search_button:
         date_from_str = date_from.strftime("%Y%m%d")
         date_to_str = date_to.strftime("%Y%m%d")
         
+        search_params = {
+            'voiv': 'WSZYSTKIE WOJEWÓDZTWA' if voiv_code == "ALL" else selected_voiv,
+            'date_from': date_from,
+            'date_to': date_to,
+            'brand': brand_search,
+            'model': ", ".join(model_query) if isinstance(model_query, list) else model_query
+        }
+        
+        # Ten sam zbiór mógł już zostać pobrany (np. przez innego użytkownika)
+        dataset_key = query_fingerprint(query_spec)
+        shared_handle = registry.acquire(dataset_key)
+        
+        # Rozmiar zapytania sprawdzany przed każdym pobieraniem, także bez "Oszacuj"
+        if shared_handle is None and current_plan is None:
+            with st.spinner("Szacowanie liczby pojazdów..."):
+                current_plan = api.plan_query(query_spec, max_pages=config.MAX_QUERY_PAGES)
+            st.session_state.query_plan = {'spec': query_spec, 'plan': current_plan}
+        
+        if shared_handle is not None:
+            current_batch_id = store_session_dataset(shared_handle, search_params, append_mode)
+            st.success(
+                f"⚡ Użyto wcześniej pobranych danych: {len(shared_handle.frame)} pojazdów "
+                f"(Batch #{current_batch_id}) - bez ponownego pobierania!"
+            )
+        
+        elif current_plan['oversized'] and not allow_oversized:
+            splits_text = ", ".join(f"{od}-{do}" for od, do in current_plan['splits'])
+            st.error(
+                f"⚠️ Zapytanie jest zbyt duże ({current_plan['summary']}, limit {config.MAX_QUERY_PAGES} stron). "
+                f"Podziel okres na: {splits_text} lub zaznacz w panelu bocznym \"Pozwól na duże zapytanie\"."
+            )
+        
         # Jeśli wybrano WSZYSTKIE województwa
-        if voiv_code == "ALL":
+        elif voiv_code == "ALL":
             st.info(f"⏳ Odpytywanie {len(voiv_codes_list)} województw...")
             
             # Twórz placeholder dla tabeli statusów
@@ -380,20 +730,13 @@ if search_button:
                         height=400
                     )
             
-            # Przygotuj dodatkowe filtry (bez marka/model, bo są osobne parametry)
-            add_filters = {k: v for k, v in api_filters.items() if k not in ['marka', 'model']}
-            
-            # Użyj brand_search i model_search (None = wszystkie)
-            # Użyj równoległego pobierania
-            all_vehicles, errors, statuses = api.search_all_voivodeships_parallel(
+            # Równoległe pobieranie dokładnie tych zapytań, które oszacował planer
+            # (filtry API, rozgałęzienia po wartościach i filtry lokalne z planu)
+            df_result, errors, statuses = api.search_all_voivodeships_columnar(
                 date_from=date_from_str,
                 date_to=date_to_str,
-                brand=brand_search,  # None = wszystkie marki
-                model=model_search,  # None = wszystkie modele
-                year_from=year_from,
-                year_to=year_to,
                 progress_callback=progress_callback,
-                additional_filters=add_filters
+                plan=current_plan
             )
             
             status_placeholder.empty()
@@ -414,7 +757,7 @@ if search_button:
                 st.metric("Ukończono", f"{completed}/{len(statuses)}", 
                          delta=f"{(completed/len(statuses)*100):.0f}%" if statuses else "0%")
             with col2:
-                st.metric("Pojazdów", total_fetched, delta="deduplikowanych" if len(all_vehicles) < total_fetched else "")
+                st.metric("Pojazdów", total_fetched, delta="deduplikowanych" if len(df_result) < total_fetched else "")
             with col3:
                 st.metric("Całkowity czas", f"{total_time:.1f}s")
             with col4:
@@ -443,40 +786,21 @@ if search_button:
                     for error in errors:
                         st.error(error)
             
-            if all_vehicles:
-                # Przypisz batch_id dla śledzenia źródła danych (dla wykresów z różnymi kolorami)
-                st.session_state.batch_id_counter += 1
-                current_batch_id = st.session_state.batch_id_counter
-                
-                # Dodaj batch_id do każdego pojazdu
-                for vehicle in all_vehicles:
-                    vehicle['_batch_id'] = current_batch_id
-                
-                results = {
-                    'data': all_vehicles,
-                    'meta': {'total': len(all_vehicles)}
-                }
+            if not df_result.empty:
+                # Niepełne wyniki (błędy województw) nie są udostępniane innym sesjom
+                if errors:
+                    dataset_key = query_fingerprint({'spec': query_spec, 'partial': time.time()})
+                handle = registry.put(dataset_key, df_result, meta={'params': search_params})
                 
                 # Append mode - dodaj do istniejących
-                if append_mode and st.session_state.vehicles_data:
-                    existing_data = st.session_state.vehicles_data['data']
-                    combined_data = existing_data + all_vehicles
-                    results = {
-                        'data': combined_data,
-                        'meta': {'total': len(combined_data)}
-                    }
-                    msg = f"➕ Dodano {len(all_vehicles)} nowych pojazdów (Batch #{current_batch_id}). Łącznie: {len(combined_data)} pojazdów"
-                else:
-                    msg = f"✅ Znaleziono {len(all_vehicles)} pojazdów ze wszystkich województw (Batch #{current_batch_id})"
+                appended = append_mode and bool(st.session_state.datasets)
+                current_batch_id = store_session_dataset(handle, search_params, append_mode)
                 
-                st.session_state.vehicles_data = results
-                st.session_state.search_params = {
-                    'voiv': 'WSZYSTKIE WOJEWÓDZTWA',
-                    'date_from': date_from,
-                    'date_to': date_to,
-                    'brand': brand_search,
-                    'model': model_search
-                }
+                if appended:
+                    total = sum(len(e['handle'].frame) for e in st.session_state.datasets)
+                    msg = f"➕ Dodano {len(df_result)} nowych pojazdów (Batch #{current_batch_id}). Łącznie: {total} pojazdów"
+                else:
+                    msg = f"✅ Znaleziono {len(df_result)} pojazdów ze wszystkich województw (Batch #{current_batch_id})"
                 
                 if brand_search:
                     msg += f" marki {brand_search}"
@@ -504,56 +828,27 @@ if search_button:
                     status_text.text(f"Pobrano: {fetched}/{total} pojazdów (strona {page})")
                     progress_bar.progress(progress)
             
-            # Przygotuj dodatkowe filtry (bez marka/model, bo są osobne parametry)
-            add_filters = {k: v for k, v in api_filters.items() if k not in ['marka', 'model']}
-            
-            results = api.search_vehicles(
-                voivodeship_code=voiv_code,
-                date_from=date_from_str,
-                date_to=date_to_str,
-                brand=brand_search,  # None = wszystkie marki
-                model=model_search,  # None = wszystkie modele
-                year_from=year_from,
-                year_to=year_to,
-                retry=True,
-                additional_filters=add_filters,
-                progress_callback=progress_callback
-            )
+            # Plan zapytania: filtry API, zapytanie per model, rok produkcji lokalnie
+            df_result, errors = api.execute_plan(current_plan, progress_callback=progress_callback)
             
             progress_bar.empty()
             status_text.empty()
             
-            if 'error' in results:
-                st.error(f"❌ {results['error']}")
-            elif 'data' in results:
-                # Przypisz batch_id dla śledzenia źródła danych
-                st.session_state.batch_id_counter += 1
-                current_batch_id = st.session_state.batch_id_counter
-                
-                # Dodaj batch_id do każdego pojazdu
-                for vehicle in results['data']:
-                    vehicle['_batch_id'] = current_batch_id
+            if errors:
+                for error in errors:
+                    st.error(f"❌ {error}")
+            else:
+                handle = registry.put(dataset_key, df_result, meta={'params': search_params})
                 
                 # Append mode - dodaj do istniejących
-                if append_mode and st.session_state.vehicles_data:
-                    existing_data = st.session_state.vehicles_data['data']
-                    combined_data = existing_data + results['data']
-                    results = {
-                        'data': combined_data,
-                        'meta': results.get('meta', {})
-                    }
-                    msg = f"➕ Dodano {len(results['data'])} nowych pojazdów (Batch #{current_batch_id}). Łącznie: {len(combined_data)} pojazdów"
-                else:
-                    msg = f"✅ Znaleziono {len(results['data'])} pojazdów (Batch #{current_batch_id})"
+                appended = append_mode and bool(st.session_state.datasets)
+                current_batch_id = store_session_dataset(handle, search_params, append_mode)
                 
-                st.session_state.vehicles_data = results
-                st.session_state.search_params = {
-                    'voiv': selected_voiv,
-                    'date_from': date_from,
-                    'date_to': date_to,
-                    'brand': brand_search,
-                    'model': model_search
-                }
+                if appended:
+                    total = sum(len(e['handle'].frame) for e in st.session_state.datasets)
+                    msg = f"➕ Dodano {len(df_result)} nowych pojazdów (Batch #{current_batch_id}). Łącznie: {total} pojazdów"
+                else:
+                    msg = f"✅ Znaleziono {len(df_result)} pojazdów (Batch #{current_batch_id})"
                 
                 if brand_search:
                     msg += f" marki {brand_search}"
@@ -562,34 +857,33 @@ if search_button:
                 st.success(msg + "!")
 
 # WYŚWIETLANIE WYNIKÓW
-if st.session_state.vehicles_data:
-    data = st.session_state.vehicles_data
+if st.session_state.datasets:
     params = st.session_state.search_params
     
     st.markdown("---")
     st.markdown("## 📊 Wyniki wyszukiwania")
     
-    # Konwersja do DataFrame aby sprawdzić batche
-    df_temp = api.vehicles_to_dataframe(data)
+    # DataFrame sesji (współdzielony - tylko do odczytu)
+    df = session_frame()
     
     # Sprawdź czy są różne batche
-    if '_batch_id' in df_temp.columns and df_temp['_batch_id'].nunique() > 1:
+    if '_batch_id' in df.columns and df['_batch_id'].nunique() > 1:
         # Pokaż statystyki per batch
         st.markdown("### 📦 Podsumowanie wyszukiwań")
         
-        batch_ids = sorted(df_temp['_batch_id'].unique())
+        batch_ids = sorted(df['_batch_id'].unique())
         cols = st.columns(min(len(batch_ids), 4))
         
         for idx, batch_id in enumerate(batch_ids):
             with cols[idx % 4]:
-                batch_data = df_temp[df_temp['_batch_id'] == batch_id]
+                batch_data = df[df['_batch_id'] == batch_id]
                 st.metric(
                     f"Zapytanie #{batch_id}",
                     f"{len(batch_data)} pojazdów",
                     delta=None
                 )
         
-        st.info(f"**Łącznie:** {len(df_temp)} pojazdów z {len(batch_ids)} zapytań")
+        st.info(f"**Łącznie:** {len(df)} pojazdów z {len(batch_ids)} zapytań")
     else:
         # Pojedyncze wyszukiwanie - stara wersja
         info_text = f"""
@@ -601,16 +895,13 @@ if st.session_state.vehicles_data:
         if params.get('model'):
             info_text += f"  \n**Model:** {params['model']}"
         
-        info_text += f"  \n**Liczba pojazdów:** {len(data['data'])}"
+        info_text += f"  \n**Liczba pojazdów:** {len(df)}"
         
         st.info(info_text)
     
-    if len(data['data']) == 0:
+    if len(df) == 0:
         st.warning("Nie znaleziono pojazdów dla wybranych kryteriów.")
     else:
-        # Konwersja do DataFrame
-        df = api.vehicles_to_dataframe(data)
-        
         if df.empty:
             st.warning("Nie można przetworzyć danych.")
         else:
@@ -636,7 +927,7 @@ if st.session_state.vehicles_data:
                 if pd.api.types.is_numeric_dtype(df[col]):
                     numeric_cols.append(col)
                 # Kolumny z datami
-                elif 'data' in col.lower() or 'date' in col.lower():
+                elif df[col].dtype.kind == 'M' or 'data' in col.lower() or 'date' in col.lower():
                     date_cols.append(col)
                 # Kolumny kategoryczne
                 elif df[col].nunique() < 200:  # Zwiększony limit
@@ -709,7 +1000,7 @@ if st.session_state.vehicles_data:
                         st.rerun()
             
             # Sortowanie
-            sort_col1, sort_col2, sort_col3 = st.columns([2, 2, 1])
+            sort_col1, sort_col2, sort_col3, sort_col4 = st.columns([2, 2, 2, 1])
             
             with sort_col1:
                 sort_column = st.selectbox(
@@ -730,55 +1021,74 @@ if st.session_state.vehicles_data:
                     sort_order = 'Rosnąco ⬆️'
             
             with sort_col3:
-                st.metric("Rekordów", len(df))
+                if sort_column != 'Brak sortowania':
+                    then_column = st.selectbox(
+                        "Następnie według",
+                        options=['Brak'] + [c for c in df.columns if c != sort_column],
+                        key="sort_col_then",
+                        help="Kolejność wierszy o tej samej wartości pierwszej kolumny (ten sam kierunek)"
+                    )
+                else:
+                    then_column = 'Brak'
             
-            # Zastosuj filtry dynamicznie
-            df_filtered = df.copy()
+            with sort_col4:
+                st.metric("Rekordów", len(df))
             
-            if 'filters_applied' in locals():
-                for col, (filter_type, filter_value) in filters_applied.items():
-                    if filter_type == 'categorical':
-                        df_filtered = df_filtered[df_filtered[col].isin(filter_value)]
-                    elif filter_type == 'numeric':
-                        df_filtered = df_filtered[
-                            (df_filtered[col] >= filter_value[0]) &
-                            (df_filtered[col] <= filter_value[1])
-                        ]
+            # Zastosuj filtry dynamicznie - iloczyn bitmap z indeksów zbioru
+            # (kategorie: bitmapy wartości, liczby: posortowane wartości)
+            frame_index = frame_indexes.get(session_frame_key(), df)
+            active_filters = filters_applied if 'filters_applied' in locals() else {}
+            filter_mask = frame_index.select([
+                frame_index.isin(col, filter_value) if filter_type == 'categorical'
+                else frame_index.between(col, *filter_value)
+                for col, (filter_type, filter_value) in active_filters.items()
+            ])
+            # Klucz wyboru wierszy - wartości filtrów (nie tylko liczba wybranych wierszy)
+            selection_key = tuple(
+                (col, filter_type, tuple(filter_value))
+                for col, (filter_type, filter_value) in sorted(active_filters.items())
+            )
             
-            # Zastosuj sortowanie
+            # Zastosuj sortowanie - wybór pozycji z permutacji zapamiętanej dla
+            # wersji zbioru (bez ponownego sortowania przy każdym odświeżeniu)
             if sort_column != 'Brak sortowania':
+                sort_by = [sort_column] + ([then_column] if then_column != 'Brak' else [])
                 ascending = (sort_order == 'Rosnąco ⬆️')
-                try:
-                    df_filtered = df_filtered.sort_values(by=sort_column, ascending=ascending)
-                except:
-                    pass
+                rows = frame_index.sorted_rows(sort_by, ascending, filter_mask)
+            elif filter_mask is not None:
+                rows = np.flatnonzero(filter_mask)
+            else:
+                rows = None
+            
+            # Wybrane wiersze bez kopiowania DataFrame - kolejne etapy pobierają tylko potrzebne kolumny
+            selection = SelectionView(df, rows)
             
             # Statystyki
             st.markdown("### 📈 Statystyki")
             col1, col2, col3, col4, col5 = st.columns(5)
             
             with col1:
-                st.metric("Po filtrach", len(df_filtered), delta=f"{len(df_filtered)-len(df)}")
+                st.metric("Po filtrach", len(selection), delta=f"{len(selection)-len(df)}")
             with col2:
                 st.metric("Wszystkich", len(df))
             with col3:
-                st.metric("Unikalne marki", df_filtered['marka'].nunique())
+                st.metric("Unikalne marki", selection['marka'].nunique())
             with col4:
-                if 'rok-produkcji' in df_filtered.columns:
-                    years_numeric = pd.to_numeric(df_filtered['rok-produkcji'], errors='coerce')
+                if 'rok-produkcji' in selection.columns:
+                    years_numeric = pd.to_numeric(selection['rok-produkcji'], errors='coerce')
                     avg_year = int(years_numeric.mean()) if not years_numeric.isna().all() else 0
                     st.metric("Średni rok prod.", avg_year)
                 else:
                     st.metric("Średni rok prod.", "N/A")
             with col5:
-                filtered_pct = (len(df_filtered) / len(df) * 100) if len(df) > 0 else 0
+                filtered_pct = (len(selection) / len(df) * 100) if len(df) > 0 else 0
                 st.metric("% pokazanych", f"{filtered_pct:.1f}%")
             
             # Tabela z wyborem kolumn
             st.markdown("### 📋 Lista pojazdów")
             
             # Wszystkie dostępne kolumny
-            all_available_columns = list(df_filtered.columns)
+            all_available_columns = list(selection.columns)
             
             # Domyślne kolumny do wyświetlenia
             default_columns = ['marka', 'model', 'rok-produkcji', 'rodzaj-pojazdu', 
@@ -807,19 +1117,75 @@ if st.session_state.vehicles_data:
             if not selected_columns:
                 st.warning("⚠️ Wybierz przynajmniej jedną kolumnę do wyświetlenia")
             else:
-                # Info o sortowaniu w tabeli
-                st.info("💡 Kliknij nagłówek kolumny w tabeli aby posortować. Pierwsze kliknięcie - sortowanie rosnąco, drugie kliknięcie - sortowanie malejąco.")
+                # Wyszukiwanie i stronicowanie po stronie serwera - do przeglądarki
+                # trafia tylko bieżąca strona, a nie cały zbiór
+                table_col1, table_col2 = st.columns([3, 1])
+                
+                with table_col1:
+                    search_text = st.text_input(
+                        "🔎 Szukaj w tabeli",
+                        key="table_search",
+                        placeholder="np. COROLLA, 2015, benzyna",
+                        help="Wyszukiwanie w wybranych kolumnach (bez rozróżniania wielkości liter)"
+                    )
+                
+                with table_col2:
+                    page_sizes = config.TABLE_PAGE_SIZES
+                    page_size = st.selectbox(
+                        "Wierszy na stronie",
+                        options=page_sizes,
+                        index=page_sizes.index(config.TABLE_PAGE_SIZE) if config.TABLE_PAGE_SIZE in page_sizes else 0,
+                        key="table_page_size"
+                    )
+                
+                table_mask = search_mask(selection, selected_columns, search_text)
+                table_rows = len(selection) if table_mask is None else int(table_mask.sum())
+                pages = page_count(table_rows, page_size)
+                
+                # Zmiana filtrów, sortowania lub wyszukiwania wraca na pierwszą stronę
+                table_state = (session_frame_key(), selection_key, sort_column, sort_order, then_column, search_text, page_size)
+                if st.session_state.get('table_state') != table_state:
+                    st.session_state.table_state = table_state
+                    st.session_state.table_page = 1
+                st.session_state.table_page = min(max(1, st.session_state.get('table_page', 1)), pages)
+                
+                nav_col1, nav_col2, nav_col3, nav_col4 = st.columns([1, 2, 1, 3])
+                
+                with nav_col1:
+                    st.button("⬅️ Poprzednia", key="table_prev", on_click=shift_table_page, args=(-1, pages),
+                              disabled=st.session_state.table_page <= 1)
+                with nav_col2:
+                    page = st.number_input(
+                        f"Strona (z {pages})",
+                        min_value=1,
+                        max_value=pages,
+                        step=1,
+                        key="table_page",
+                        label_visibility="collapsed"
+                    )
+                with nav_col3:
+                    st.button("Następna ➡️", key="table_next", on_click=shift_table_page, args=(1, pages),
+                              disabled=st.session_state.table_page >= pages)
+                
+                window, start, stop, table_rows = table_window(
+                    selection, selected_columns, int(page), page_size, table_mask
+                )
+                
+                with nav_col4:
+                    if table_rows:
+                        st.caption(f"Wiersze {start + 1}–{stop} z {table_rows} · strona {int(page)} z {pages}")
+                    else:
+                        st.caption("Brak wierszy pasujących do wyszukiwania")
                 
-                # Tabela z możliwością sortowania
                 st.dataframe(
-                    df_filtered[selected_columns],
+                    window,
                     use_container_width=True,
-                    height=400,
+                    height=min(400, 38 + 35 * max(len(window), 1)),
                     hide_index=False
                 )
             
             # Wizualizacje z dynamicznym wyborem kolumn
-            if len(df_filtered) > 0:
+            if len(selection) > 0:
                 st.markdown("### 📊 Wizualizacje")
                 
                 # Wybór typu wykresu i kolumn
@@ -832,11 +1198,12 @@ if st.session_state.vehicles_data:
                         help="Wybierz typ wizualizacji"
                     )
                 
-                # Kolumny kategoryczne i numeryczne
-                categorical_cols = [col for col in df_filtered.columns 
-                                  if df_filtered[col].dtype == 'object' or df_filtered[col].nunique() < 50]
-                numeric_cols = [col for col in df_filtered.columns 
-                              if pd.api.types.is_numeric_dtype(df_filtered[col])]
+                # Kolumny kategoryczne i numeryczne (liczba wartości z indeksu zbioru)
+                categorical_cols = [col for col in df.columns 
+                                  if df[col].dtype == 'object' or isinstance(df[col].dtype, pd.CategoricalDtype)
+                                  or frame_index.distinct(col) < 50]
+                numeric_cols = [col for col in df.columns 
+                              if pd.api.types.is_numeric_dtype(df[col])]
                 
                 with viz_col2:
                     if chart_type in ["Słupkowy (Bar)", "Kołowy (Pie)"]:
@@ -884,20 +1251,30 @@ if st.session_state.vehicles_data:
                         )
                 
                 # Sprawdź czy są różne batche (dla różnych kolorów)
-                has_batch = '_batch_id' in df_filtered.columns and df_filtered['_batch_id'].nunique() > 1
+                has_batch = '_batch_id' in selection.columns and selection['_batch_id'].nunique() > 1
                 color_col = '_batch_id' if has_batch else None
                 
-                if has_batch:
-                    # Konwertuj _batch_id na string dla lepszych legend
-                    df_filtered['_batch_id'] = df_filtered['_batch_id'].astype(str)
-                    df_filtered['_batch_id'] = 'Zapytanie #' + df_filtered['_batch_id']
-                
                 # Generowanie wykresu
+                import plotly.express as px  # import dopiero przy pierwszym wykresie
                 try:
+                    # Dane wykresu - tylko używane kolumny wybranych wierszy
+                    chart_columns = [x_column]
+                    if chart_type in ["Scatter", "Box Plot"] and y_column not in chart_columns:
+                        chart_columns.append(y_column)
+                    if has_batch:
+                        chart_columns.append('_batch_id')
+                    if not set(chart_columns) <= set(selection.columns):
+                        raise KeyError(f"Brak kolumny do wykresu: {chart_columns}")
+                    df_chart = selection.take(chart_columns)
+                    
+                    if has_batch:
+                        # Konwertuj _batch_id na string dla lepszych legend
+                        df_chart = df_chart.assign(_batch_id='Zapytanie #' + df_chart['_batch_id'].astype(str))
+                    
                     if chart_type == "Słupkowy (Bar)":
                         if has_batch:
                             # Grupuj po x_column i _batch_id
-                            df_grouped = df_filtered.groupby([x_column, '_batch_id']).size().reset_index(name='count')
+                            df_grouped = df_chart.groupby([x_column, '_batch_id'], observed=True).size().reset_index(name='count')
                             df_grouped = df_grouped.sort_values('count', ascending=True)
                             fig = px.bar(
                                 df_grouped.tail(top_n * 2),  # Więcej dla wielu batchy
@@ -909,7 +1286,8 @@ if st.session_state.vehicles_data:
                                 title=f"Top {top_n}: {x_column} (kolorowane według źródła)"
                             )
                         else:
-                            value_counts = df_filtered[x_column].value_counts().head(top_n)
+                            value_counts = df_chart[x_column].value_counts()
+                            value_counts = value_counts[value_counts > 0].head(top_n)  # bez nieobecnych kategorii
                             fig = px.bar(
                                 x=value_counts.values,
                                 y=value_counts.index,
@@ -920,7 +1298,8 @@ if st.session_state.vehicles_data:
                         st.plotly_chart(fig, use_container_width=True)
                     
                     elif chart_type == "Kołowy (Pie)":
-                        value_counts = df_filtered[x_column].value_counts().head(10)
+                        value_counts = df_chart[x_column].value_counts()
+                        value_counts = value_counts[value_counts > 0].head(10)
                         fig = px.pie(
                             values=value_counts.values,
                             names=value_counts.index,
@@ -929,7 +1308,7 @@ if st.session_state.vehicles_data:
                         st.plotly_chart(fig, use_container_width=True)
                     
                     elif chart_type == "Histogram":
-                        df_clean = df_filtered[df_filtered[x_column].notna()].copy()
+                        df_clean = df_chart[df_chart[x_column].notna()]
                         fig = px.histogram(
                             df_clean,
                             x=x_column,
@@ -946,7 +1325,7 @@ if st.session_state.vehicles_data:
                         cols_needed = [x_column, y_column]
                         if has_batch:
                             cols_needed.append('_batch_id')
-                        df_clean = df_filtered[cols_needed].dropna()
+                        df_clean = df_chart[cols_needed].dropna()
                         fig = px.scatter(
                             df_clean,
                             x=x_column,
@@ -961,7 +1340,7 @@ if st.session_state.vehicles_data:
                         cols_needed = [x_column, y_column]
                         if has_batch:
                             cols_needed.append('_batch_id')
-                        df_clean = df_filtered[cols_needed].dropna()
+                        df_clean = df_chart[cols_needed].dropna()
                         fig = px.box(
                             df_clean,
                             x=x_column,
@@ -974,10 +1353,75 @@ if st.session_state.vehicles_data:
                 except Exception as e:
                     st.error(f"Błąd generowania wykresu: {str(e)}")
                     st.info("Spróbuj wybrać inne kolumny lub typ wykresu")
+                
+                # Trendy rejestracji - liczby w okresach z silnika serii czasowych
+                trend_date_cols = [col for col in date_cols if df[col].dtype.kind == 'M']  # także daty z migawek (Arrow)
+                if trend_date_cols:
+                    st.markdown("### 📅 Trendy rejestracji")
+                    
+                    trend_col1, trend_col2, trend_col3, trend_col4 = st.columns([2, 2, 2, 2])
+                    
+                    with trend_col1:
+                        default_date = 'data-pierwszej-rejestracji-w-kraju'
+                        trend_date = st.selectbox(
+                            "Data",
+                            trend_date_cols,
+                            index=trend_date_cols.index(default_date) if default_date in trend_date_cols else 0,
+                            key="trend_date"
+                        )
+                    
+                    with trend_col2:
+                        freq_label = st.radio(
+                            "Okres",
+                            options=list(FREQUENCIES.values()),
+                            index=list(FREQUENCIES).index('M'),
+                            horizontal=True,
+                            key="trend_freq"
+                        )
+                        trend_freq = next(code for code, label in FREQUENCIES.items() if label == freq_label)
+                    
+                    with trend_col3:
+                        dimension_cols = [col for col in categorical_cols if col not in trend_date_cols and col != 'id']
+                        trend_by = st.selectbox(
+                            "Podział według",
+                            ['Brak'] + dimension_cols,
+                            index=(['Brak'] + dimension_cols).index('marka') if 'marka' in dimension_cols else 0,
+                            key="trend_by",
+                            help="Najczęstsze wartości jako osobne serie, pozostałe jako 'Inne'"
+                        )
+                    
+                    with trend_col4:
+                        trend_mode = st.radio(
+                            "Wartości",
+                            options=['Liczba', 'Udział %'],
+                            horizontal=True,
+                            key="trend_mode"
+                        )
+                    
+                    # Wynik zależy tylko od filtrów (nie od sortowania) - klucz wyboru wierszy
+                    trend = trend_engine.counts(
+                        session_frame_key(), df, frame_index, trend_date, trend_freq,
+                        by=None if trend_by == 'Brak' else trend_by,
+                        rows=None if filter_mask is None else np.flatnonzero(filter_mask),
+                        selection_key=selection_key
+                    )
+                    
+                    if trend.empty:
+                        st.info("Brak dat w wybranych wierszach")
+                    else:
+                        if trend_mode == 'Udział %':
+                            trend = shares(trend)
+                        fig = px.line(
+                            trend,
+                            labels={'okres': FREQUENCIES[trend_freq], 'value': trend_mode, 'variable': trend_by},
+                            title=f"Rejestracje ({FREQUENCIES[trend_freq].lower()}): {trend_date}"
+                            + (f" według {trend_by}" if trend_by != 'Brak' else "")
+                        )
+                        st.plotly_chart(fig, use_container_width=True)
             
             # Eksport
             st.markdown("### 💾 Eksport danych")
-            csv = df_filtered.to_csv(index=False).encode('utf-8')
+            csv = selection.take().to_csv(index=False).encode('utf-8')
             
             # Nazwa pliku - użyj nazwy województwa (zamień spacje i polskie znaki)
             voiv_name = params['voiv'].replace(' ', '_').replace('Ł', 'L').replace('ł', 'l').replace('ą', 'a').replace('ć', 'c').replace('ę', 'e').replace('ń', 'n').replace('ó', 'o').replace('ś', 's').replace('ź', 'z').replace('ż', 'z').replace('Ą', 'A').replace('Ć', 'C').replace('Ę', 'E').replace('Ń', 'N').replace('Ó', 'O').replace('Ś', 'S').replace('Ź', 'Z').replace('Ż', 'Z')
@@ -1016,6 +1460,42 @@ else:
     [API CEPiK](https://api.cepik.gov.pl/) - Centralna Ewidencja Pojazdów i Kierowców
     """)
 
+# Zużycie pamięci przez dane sesji i wszystkie sesje
+session_usage = registry.memory_usage(session_dataset_keys())
+global_usage = registry.memory_usage()
+memory_caption = (
+    f"🧠 Pamięć sesji: {session_usage['memory'] / 1e6:.1f} MB · "
+    f"wszystkie sesje: {global_usage['memory'] / 1e6:.1f} / {config.MEMORY_BUDGET_MB} MB"
+)
+if global_usage['spilled']:
+    memory_caption += f" · na dysku: {global_usage['spilled'] / 1e6:.1f} MB"
+pool = api.pool_stats()
+memory_caption += (
+    f"  \n🔌 Połączenia API: {pool['connections_opened']} otwartych · "
+    f"{pool['idle_connections']} wolnych · ponowne użycie {pool['reuse_ratio']:.0%}"
+)
+page_latency = api.latency.stats().get('/pojazdy')
+if page_latency and page_latency['p95'] is not None:
+    memory_caption += (
+        f"  \n⏱️ Strona API: p50 {page_latency['p50']:.1f}s · p95 {page_latency['p95']:.1f}s · "
+        f"timeout {page_latency['timeout']:.0f}s · zapasowe zapytania: {page_latency['hedged']}"
+    )
+mark_startup('render')
+if not startup_profile['done']:
+    startup_profile['done'] = True
+    startup_profile['total'] = sum(startup_profile.get(k, 0) for k in ('import', 'api', 'dictionaries', 'render'))
+    print(
+        f"Start procesu: import {startup_profile['import']:.2f}s · API {startup_profile['api']:.2f}s · "
+        f"słowniki {startup_profile['dictionaries']:.2f}s · render {startup_profile['render']:.2f}s · "
+        f"razem {startup_profile['total']:.2f}s"
+    )
+if config.STARTUP_PROFILE:
+    memory_caption += (
+        f"  \n🚀 Start procesu: {startup_profile['total']:.2f}s (import {startup_profile['import']:.2f}s · "
+        f"słowniki {startup_profile['dictionaries']:.2f}s · render {startup_profile['render']:.2f}s)"
+    )
+memory_placeholder.caption(memory_caption)
+
 # Footer
 st.markdown("---")
 st.markdown(
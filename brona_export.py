@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+BRONA - eksport danych z API CEPiK z linii poleceń (bez Streamlit)
+
+Pobiera pojazdy dla wybranych województw i okresu, a każdą stronę API od razu
+zapisuje do pliku wynikowego (Parquet - grupy wierszy, CSV lub JSONL).
+Pełny wynik nigdy nie jest trzymany w pamięci, więc eksport dowolnej wielkości
+działa w stałej pamięci - nadaje się do cron.
+
+Użycie:
+    python brona_export.py --date-from 20240101 --date-to 20240131 -o styczen.parquet
+    python brona_export.py --spec nocny_eksport.json
+    python brona_export.py --date-from 20240101 --date-to 20240131 \\
+        --voivodeship 14 --voivodeship 24 --brand TOYOTA \\
+        --filter rodzaj-paliwa=BENZYNA --format csv -o toyota.csv
+
+Plik --spec (JSON) przyjmuje te same klucze co opcje, np.:
+    {"date_from": "20240101", "date_to": "20240131", "voivodeships": ["14"],
+     "filters": {"rodzaj-paliwa": "BENZYNA"}, "format": "jsonl", "output": "eksport.jsonl"}
+"""
+import abc
+import argparse
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+
+from cepik_api import CepikAPI, chunk_columns
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+FORMATS = ('parquet', 'csv', 'jsonl')
+
+
+class ChunkWriter(abc.ABC):
+    """
+    Bazowy zapis fragmentów kolumnowych do pliku.
+    Kolumny są ustalane przy pierwszym fragmencie (lub z projekcji) i stałe dla całego pliku.
+    """
+
+    def __init__(self, path: str, columns: Optional[List[str]] = None):
+        self.path = path
+        self.columns = columns
+        self.rows = 0
+        self._opened = False
+        self._warned_columns = set()
+
+    def _ensure_open(self, columns: Optional[List[str]] = None):
+        if self._opened:
+            return
+        if self.columns is None:
+            self.columns = columns if columns is not None else ['id']
+        self._open()
+        self._opened = True
+
+    def _align(self, columns: Dict[str, List]) -> Dict[str, List]:
+        """Dopasowuje fragment do stałego zestawu kolumn pliku."""
+        self._ensure_open(list(columns.keys()))
+
+        for name in columns:
+            if name not in self.columns and name not in self._warned_columns:
+                self._warned_columns.add(name)
+                print(f"⚠️  Pominięto kolumnę spoza schematu pliku: {name}", file=sys.stderr)
+
+        rows = len(columns.get('id', []))
+        return {name: columns.get(name, [None] * rows) for name in self.columns}
+
+    def write(self, columns: Dict[str, List]):
+        aligned = self._align(columns)
+        self._write(aligned)
+        self.rows += len(aligned[self.columns[0]]) if self.columns else 0
+
+    @abc.abstractmethod
+    def _open(self):
+        """Otwiera plik wyjściowy (kolumny są już ustalone)."""
+
+    @abc.abstractmethod
+    def _write(self, columns: Dict[str, List]):
+        """Zapisuje fragment dopasowany do kolumn pliku."""
+
+    @abc.abstractmethod
+    def close(self):
+        """Zamyka plik (także gdy nie zapisano żadnego fragmentu)."""
+
+
+class CsvChunkWriter(ChunkWriter):
+    def _open(self):
+        self._file = open(self.path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.columns)
+
+    def _write(self, columns):
+        self._writer.writerows(zip(*columns.values()))
+        self._file.flush()
+
+    def close(self):
+        # Brak danych - plik powstaje i tak (sam nagłówek)
+        self._ensure_open()
+        self._file.close()
+
+
+class JsonlChunkWriter(ChunkWriter):
+    def _open(self):
+        self._file = open(self.path, 'w', encoding='utf-8')
+
+    def _write(self, columns):
+        names = list(columns.keys())
+        for values in zip(*columns.values()):
+            self._file.write(json.dumps(dict(zip(names, values)), ensure_ascii=False))
+            self._file.write('\n')
+        self._file.flush()
+
+    def close(self):
+        self._ensure_open()
+        self._file.close()
+
+
+class ParquetChunkWriter(ChunkWriter):
+    """Każdy fragment to osobna grupa wierszy; wszystkie kolumny zapisywane jako tekst."""
+
+    def _open(self):
+        self._schema = pa.schema([(name, pa.string()) for name in self.columns])
+        self._writer = pq.ParquetWriter(self.path, self._schema, compression='snappy')
+
+    def _write(self, columns):
+        arrays = [
+            pa.array([None if v is None else str(v) for v in values], type=pa.string())
+            for values in columns.values()
+        ]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self):
+        self._ensure_open()
+        self._writer.close()
+
+
+def create_writer(fmt: str, path: str, columns: Optional[List[str]] = None) -> ChunkWriter:
+    if fmt == 'csv':
+        return CsvChunkWriter(path, columns)
+    if fmt == 'jsonl':
+        return JsonlChunkWriter(path, columns)
+    if fmt == 'parquet':
+        if pa is None:
+            raise SystemExit("❌ Format parquet wymaga pakietu pyarrow (pip install pyarrow)")
+        return ParquetChunkWriter(path, columns)
+    raise SystemExit(f"❌ Nieznany format: {fmt}")
+
+
+def parse_args(argv=None) -> Dict:
+    """Parsuje opcje; wartości z --spec są nadpisywane przez opcje z linii poleceń."""
+    parser = argparse.ArgumentParser(
+        description="Eksport pojazdów z API CEPiK strumieniowo do Parquet/CSV/JSONL"
+    )
+    parser.add_argument('--spec', help="Plik JSON ze specyfikacją eksportu")
+    parser.add_argument('--date-from', help="Data od (YYYYMMDD)")
+    parser.add_argument('--date-to', help="Data do (YYYYMMDD)")
+    parser.add_argument('--voivodeship', action='append', dest='voivodeships',
+                        help="Kod lub nazwa województwa (można powtarzać; domyślnie wszystkie)")
+    parser.add_argument('--brand', help="Marka (filtr API)")
+    parser.add_argument('--model', help="Model (filtr API)")
+    parser.add_argument('--year-from', type=int, help="Rok produkcji od (filtr lokalny)")
+    parser.add_argument('--year-to', type=int, help="Rok produkcji do (filtr lokalny)")
+    parser.add_argument('--filter', action='append', dest='filters', metavar='KLUCZ=WARTOŚĆ',
+                        help="Dodatkowy filtr API, np. rodzaj-paliwa=BENZYNA (można powtarzać)")
+    parser.add_argument('--columns', help="Lista atrybutów do zapisania, rozdzielona przecinkami")
+    parser.add_argument('--format', choices=FORMATS, help="Format wyjścia (domyślnie z rozszerzenia pliku)")
+    parser.add_argument('-o', '--output', help="Plik wynikowy")
+    parser.add_argument('--workers', type=int, help="Liczba województw pobieranych równolegle (domyślnie 4)")
+    parser.add_argument('--decode-workers', type=int, help="Liczba procesów dekodujących strony (domyślnie 0)")
+    parser.add_argument('--dedup', action='store_true', default=None,
+                        help="Pomijaj powtórzone ID (pamięć rośnie z liczbą ID)")
+    args = parser.parse_args(argv)
+
+    spec = {}
+    if args.spec:
+        with open(args.spec, encoding='utf-8') as f:
+            spec = json.load(f)
+
+    for key, value in vars(args).items():
+        if key in ('spec', 'filters', 'columns') or value is None:
+            continue
+        spec[key] = value
+    if args.filters:
+        filters = dict(spec.get('filters') or {})
+        for item in args.filters:
+            key, sep, value = item.partition('=')
+            if not sep:
+                parser.error(f"Filtr musi mieć postać KLUCZ=WARTOŚĆ: {item}")
+            filters[key.strip()] = value.strip()
+        spec['filters'] = filters
+    if args.columns:
+        spec['columns'] = [c.strip() for c in args.columns.split(',') if c.strip()]
+
+    if not spec.get('date_from') or not spec.get('date_to'):
+        parser.error("Wymagane są --date-from i --date-to (lub date_from/date_to w --spec)")
+    if not spec.get('output'):
+        parser.error("Wymagany jest plik wynikowy -o/--output (lub output w --spec)")
+    if not spec.get('format'):
+        extension = os.path.splitext(spec['output'])[1].lstrip('.').lower()
+        spec['format'] = extension if extension in FORMATS else 'csv'
+    return spec
+
+
+def resolve_voivodeships(api: CepikAPI, voivodeships: Optional[List[str]]) -> List[str]:
+    """Zamienia kody/nazwy województw na kody (None = wszystkie)."""
+    if not voivodeships:
+        return list(api.WOJEWODZTWA_KODY.keys())
+
+    codes = []
+    for value in voivodeships:
+        if value in api.WOJEWODZTWA_KODY:
+            codes.append(value)
+        else:
+            code = api.get_voivodeship_code(value)
+            if code is None:
+                raise SystemExit(f"❌ Nieznane województwo: {value}")
+            codes.append(code)
+    return codes
+
+
+def run_export(spec: Dict) -> int:
+    """
+    Wykonuje eksport. Wątki pobierające oddają strony przez ograniczoną kolejkę
+    do jednego wątku zapisującego, więc w pamięci jest tylko kilka stron naraz.
+
+    Returns:
+        Kod wyjścia (0 - sukces, 1 - błędy części województw)
+    """
+    api = CepikAPI(decode_workers=spec.get('decode_workers', 0))
+    codes = resolve_voivodeships(api, spec.get('voivodeships'))
+    workers = api.worker_count(spec.get('workers', 4))
+    columns = spec.get('columns')
+    if columns and 'id' not in columns:
+        columns = ['id'] + columns
+
+    pages_queue = queue.Queue(maxsize=workers * 2)
+    errors = []
+    done = object()
+    codes_queue = queue.Queue()
+    for code in codes:
+        codes_queue.put(code)
+
+    def fetch_worker():
+        while True:
+            try:
+                code = codes_queue.get_nowait()
+            except queue.Empty:
+                break
+            name = api.WOJEWODZTWA_KODY.get(code, code)
+            params = api.build_search_params(
+                code, spec['date_from'], spec['date_to'],
+                spec.get('brand'), spec.get('model'), spec.get('filters')
+            )
+            try:
+                for chunk in api.iter_vehicle_pages(params, columns, spec.get('year_from'), spec.get('year_to')):
+                    pages_queue.put((name, chunk))
+            except requests.exceptions.RequestException as e:
+                errors.append(f"{name}: {str(e)[:120]}")
+            except Exception as e:
+                errors.append(f"{name}: {type(e).__name__}: {str(e)[:120]}")
+        pages_queue.put(done)
+
+    writer = create_writer(spec['format'], spec['output'], columns)
+    threads = [threading.Thread(target=fetch_worker, daemon=True) for _ in range(min(workers, len(codes)))]
+    for thread in threads:
+        thread.start()
+
+    start_time = time.time()
+    seen_ids = set() if spec.get('dedup') else None
+    finished = 0
+    try:
+        while finished < len(threads):
+            item = pages_queue.get()
+            if item is done:
+                finished += 1
+                continue
+
+            name, chunk = item
+            page_columns = chunk_columns(chunk)
+            if seen_ids is not None and page_columns.get('id'):
+                keep = []
+                for i, vehicle_id in enumerate(page_columns['id']):
+                    if vehicle_id not in seen_ids:
+                        seen_ids.add(vehicle_id)
+                        keep.append(i)
+                if len(keep) < len(page_columns['id']):
+                    page_columns = {k: [v[i] for i in keep] for k, v in page_columns.items()}
+
+            if page_columns.get('id'):
+                writer.write(page_columns)
+            print(
+                f"[{name}] strona {chunk['page']} · zapisano łącznie {writer.rows} pojazdów "
+                f"· {time.time() - start_time:.0f}s",
+                file=sys.stderr
+            )
+    finally:
+        writer.close()
+
+    for error in errors:
+        print(f"❌ {error}", file=sys.stderr)
+    print(f"✅ Zapisano {writer.rows} pojazdów do {spec['output']} ({spec['format']})", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(run_export(parse_args()))
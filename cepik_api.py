@@ -6,15 +6,1037 @@ Wyszukuje pojazdy po województwie i dacie, filtrowanie po marce/modelu odbywa s
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.ssl_ import create_urllib3_context
-from typing import Optional, Dict, List, Tuple
+from typing import Optional, Dict, Iterable, List, Tuple, Union
 import pandas as pd
+import numpy as np
 import ssl
-import asyncio
-import aiohttp
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import queue
 import time
+import math
+import random
 import threading
-from datetime import datetime
+import json
+import abc
+import logging
+from datetime import datetime, timedelta
+
+from suggestions import SuggestionIndex
+
+try:
+    import orjson as _fast_json  # Opcjonalny, szybszy parser JSON
+except ImportError:
+    _fast_json = None
+
+try:
+    import pyarrow as pa  # Opcjonalny, kompaktowe kolumny z procesów dekodujących
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+
+# Maksymalna liczba rekordów na stronę (limit API)
+PAGE_LIMIT = 500
+
+# Słowniki API, po których można filtrować przez filter[klucz]
+DICTIONARY_FILTERS = {'marka', 'rodzaj-pojazdu', 'rodzaj-paliwa', 'pochodzenie-pojazdu', 'sposob-produkcji'}
+
+# Atrybuty kategoryczne kodowane wspólnym słownikiem (CategoryCodec) - wartości ze
+# słowników API oraz model i województwo
+ENCODED_COLUMNS = DICTIONARY_FILTERS | {'model', 'wojewodztwo', 'wojewodztwo-kod'}
+
+# Atrybuty z datami (data-pierwszej-rejestracji-w-kraju, ...) konwertowane na datetime64
+DATE_COLUMN_PREFIX = 'data-'
+
+# Kolumny konwertowane na typy numeryczne
+NUMERIC_COLUMNS = [
+    'pojemnosc-skokowa-silnika',
+    'masa-wlasna',
+    'rok-produkcji',
+    'liczba-miejsc-siedzacych',
+    'masa-calkowita',
+    'dopuszczalna-ladownosc',
+    'liczba-osi'
+]
+
+
+def loads_json(raw):
+    """Parsuje JSON przez orjson jeśli jest zainstalowany, w przeciwnym razie przez json."""
+    if _fast_json is not None:
+        return _fast_json.loads(raw)
+    return json.loads(raw)
+
+
+def decode_vehicle_page(raw, columns: Optional[List[str]] = None) -> Dict:
+    """
+    Dekoduje surową stronę /pojazdy bezpośrednio do kolumn.
+    Pomija 'links', 'type' i atrybuty spoza projekcji - rekordy nie są kopiowane
+    ani przechowywane jako słowniki, powstają tylko listy wartości per kolumna.
+    
+    Args:
+        raw: Surowe bajty odpowiedzi (response.content)
+        columns: Atrybuty do zachowania (None = wszystkie występujące na stronie)
+    
+    Returns:
+        {'columns': {nazwa: [wartości]}, 'rows': int, 'total_count': int, 'has_next': bool}
+        Kolumna 'id' jest zawsze dołączana.
+    """
+    doc = loads_json(raw)
+    items = doc.get('data')
+    if not isinstance(items, list):
+        items = []
+    
+    attrs = []
+    ids = []
+    for item in items:
+        a = item.get('attributes')
+        if a is not None:
+            attrs.append(a)
+            ids.append(item.get('id', ''))
+    
+    if columns is None:
+        # Unia kluczy w kolejności wystąpienia
+        names = {}
+        for a in attrs:
+            for key in a:
+                names[key] = None
+        columns = list(names)
+    
+    out = {'id': ids}
+    for name in columns:
+        if name != 'id':
+            out[name] = [a.get(name) for a in attrs]
+    
+    meta = doc.get('meta') or {}
+    links = doc.get('links') or {}
+    return {
+        'columns': out,
+        'rows': len(ids),
+        'total_count': meta.get('count', 0),
+        'has_next': bool(links.get('next'))
+    }
+
+
+def split_date_range(date_from: str, date_to: str, freq: str = 'month') -> List[Tuple[str, str]]:
+    """
+    Dzieli zakres dat na okna (dzień/tydzień/miesiąc).
+    
+    Args:
+        date_from: Data od w formacie YYYYMMDD
+        date_to: Data do w formacie YYYYMMDD
+        freq: 'day', 'week' lub 'month'
+    
+    Returns:
+        Lista tupli (data_od, data_do) w formacie YYYYMMDD, okna nie nachodzą na siebie
+    """
+    start = datetime.strptime(date_from, "%Y%m%d")
+    end = datetime.strptime(date_to, "%Y%m%d")
+    windows = []
+    
+    while start <= end:
+        if freq == 'day':
+            window_end = start
+        elif freq == 'week':
+            window_end = start + timedelta(days=6 - start.weekday())
+        elif freq == 'month':
+            next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+            window_end = next_month - timedelta(days=1)
+        else:
+            raise ValueError(f"Nieznana częstotliwość: {freq}")
+        
+        window_end = min(window_end, end)
+        windows.append((start.strftime("%Y%m%d"), window_end.strftime("%Y%m%d")))
+        start = window_end + timedelta(days=1)
+    
+    return windows
+
+
+# Kolumny zmieniane przez _postprocess_dataframe - predykaty na nich nie mogą być
+# liczone na surowych stronach API (np. model "TOYOTA CAMRY" -> "CAMRY")
+POSTPROCESSED_COLUMNS = {'model', 'wojewodztwo'}
+
+
+class Predicate(abc.ABC):
+    """
+    Predykat filtrujący wiersze, liczony wektorowo (maska NumPy) na fragmencie
+    kolumnowym (dict kolumna -> lista) lub na DataFrame.
+    Predykaty łączy się operatorami & (i), | (lub) oraz ~ (negacja):
+    
+        where = Col('rok-produkcji').between(2015, 2020) & ~Col('kolor').isnull()
+    """
+    
+    def mask(self, data, rows: Optional[int] = None) -> np.ndarray:
+        """
+        Maska wierszy spełniających predykat.
+        
+        Args:
+            data: DataFrame lub dict {kolumna: lista wartości}
+            rows: Liczba wierszy (wymagana dla dict bez kolumn predykatu)
+        """
+        if rows is None:
+            rows = len(data) if isinstance(data, pd.DataFrame) else len(next(iter(data.values()), []))
+        return self._mask(data, rows, {})
+    
+    @abc.abstractmethod
+    def columns(self) -> set:
+        """Kolumny potrzebne do obliczenia predykatu."""
+    
+    @abc.abstractmethod
+    def _mask(self, data, rows: int, cache: Dict) -> np.ndarray:
+        """Maska predykatu; cache - kolumny przekształcone raz dla całego wyrażenia."""
+    
+    def __and__(self, other: 'Predicate') -> 'Predicate':
+        return _BoolOp('and', [self, other])
+    
+    def __or__(self, other: 'Predicate') -> 'Predicate':
+        return _BoolOp('or', [self, other])
+    
+    def __invert__(self) -> 'Predicate':
+        return _Not(self)
+
+
+def parse_dates(values: pd.Series) -> pd.Series:
+    """Kolumna dat z API ("YYYY-MM-DD", ewentualnie z czasem) jako datetime64 (błędne = NaT)."""
+    if values.dtype.kind == 'M':  # datetime64 lub pd.ArrowDtype(timestamp) z migawki
+        return values
+    text = values.astype(str).str.slice(0, 10)
+    return pd.to_datetime(text, format='%Y-%m-%d', errors='coerce')
+
+
+def _column_series(data, name: str, rows: int, cache: Dict) -> pd.Series:
+    """Kolumna jako Series (brakująca kolumna = same None); wynik zapamiętywany w cache."""
+    key = ('raw', name)
+    if key not in cache:
+        if isinstance(data, pd.DataFrame):
+            series = data[name] if name in data.columns else pd.Series([None] * rows, dtype=object)
+        else:
+            values = data.get(name)
+            series = pd.Series(values if values is not None else [None] * rows, dtype=object)
+        cache[key] = series
+    return cache[key]
+
+
+def _numeric_series(data, name: str, rows: int, cache: Dict) -> pd.Series:
+    """Kolumna jako liczby (wartości nieliczbowe = NaN); np. rok "2015" -> 2015.0."""
+    key = ('numeric', name)
+    if key not in cache:
+        cache[key] = pd.to_numeric(_column_series(data, name, rows, cache), errors='coerce')
+    return cache[key]
+
+
+def _to_mask(result) -> np.ndarray:
+    if isinstance(result, pd.Series):
+        result = result.fillna(False)
+    return np.asarray(result, dtype=bool)
+
+
+class _Range(Predicate):
+    def __init__(self, name: str, low=None, high=None):
+        self.name, self.low, self.high = name, low, high
+    
+    def columns(self) -> set:
+        return {self.name}
+    
+    def _mask(self, data, rows, cache):
+        values = _numeric_series(data, self.name, rows, cache)
+        result = values.notna()
+        if self.low is not None:
+            result &= values >= self.low
+        if self.high is not None:
+            result &= values <= self.high
+        return _to_mask(result)
+
+
+class _IsIn(Predicate):
+    def __init__(self, name: str, values):
+        self.name = name
+        self.values = list(values)
+    
+    def columns(self) -> set:
+        return {self.name}
+    
+    def _mask(self, data, rows, cache):
+        numeric = self.values and all(
+            isinstance(v, (int, float)) and not isinstance(v, bool) for v in self.values
+        )
+        if numeric:
+            # Wartości liczbowe porównywane z kolumną po konwersji (API zwraca tekst)
+            return _to_mask(_numeric_series(data, self.name, rows, cache).isin(self.values))
+        return _to_mask(_column_series(data, self.name, rows, cache).isin(self.values))
+
+
+class _IsNull(Predicate):
+    def __init__(self, name: str):
+        self.name = name
+    
+    def columns(self) -> set:
+        return {self.name}
+    
+    def _mask(self, data, rows, cache):
+        return _to_mask(_column_series(data, self.name, rows, cache).isna())
+
+
+class _BoolOp(Predicate):
+    def __init__(self, op: str, parts: List[Predicate]):
+        self.op = op
+        # Spłaszczenie (a & b) & c -> and(a, b, c)
+        self.parts = []
+        for part in parts:
+            self.parts.extend(part.parts if isinstance(part, _BoolOp) and part.op == op else [part])
+    
+    def columns(self) -> set:
+        return set().union(*(part.columns() for part in self.parts))
+    
+    def _mask(self, data, rows, cache):
+        result = self.parts[0]._mask(data, rows, cache)
+        for part in self.parts[1:]:
+            if self.op == 'and':
+                if not result.any():
+                    break  # nic już nie przejdzie
+                result = result & part._mask(data, rows, cache)
+            else:
+                result = result | part._mask(data, rows, cache)
+        return result
+
+
+class _Not(Predicate):
+    def __init__(self, part: Predicate):
+        self.part = part
+    
+    def columns(self) -> set:
+        return self.part.columns()
+    
+    def _mask(self, data, rows, cache):
+        return ~self.part._mask(data, rows, cache)
+
+
+class Col:
+    """Odwołanie do kolumny w predykatach, np. Col('rok-produkcji').between(2010, 2020)."""
+    
+    def __init__(self, name: str):
+        self.name = name
+    
+    def between(self, low=None, high=None) -> Predicate:
+        """Wartość liczbowa w zakresie [low, high] (None = bez ograniczenia, brak wartości odrzucany)."""
+        return _Range(self.name, low, high)
+    
+    def ge(self, value) -> Predicate:
+        return _Range(self.name, low=value)
+    
+    def le(self, value) -> Predicate:
+        return _Range(self.name, high=value)
+    
+    def eq(self, value) -> Predicate:
+        return _IsIn(self.name, [value])
+    
+    def isin(self, values) -> Predicate:
+        return _IsIn(self.name, values)
+    
+    def isnull(self) -> Predicate:
+        return _IsNull(self.name)
+    
+    def notnull(self) -> Predicate:
+        return ~_IsNull(self.name)
+
+
+def all_of(*predicates: Optional[Predicate]) -> Optional[Predicate]:
+    """Koniunkcja predykatów z pominięciem None (None, gdy nie ma żadnego)."""
+    predicates = [p for p in predicates if p is not None]
+    if not predicates:
+        return None
+    return predicates[0] if len(predicates) == 1 else _BoolOp('and', predicates)
+
+
+def year_predicate(year_from: Optional[int], year_to: Optional[int]) -> Optional[Predicate]:
+    """Predykat roku produkcji (brak/niepoprawny rok = odrzucony); None bez ograniczeń."""
+    if not year_from and not year_to:
+        return None
+    return Col('rok-produkcji').between(year_from or None, year_to or None)
+
+
+def _merge_filter_values(column: str, value, other):
+    """
+    Łączy dwie wartości tego samego filtra (np. marka z parametru i z filtrów):
+    część wspólna - jedna wartość jako str, kilka jako lista, brak = None.
+
+    Raises:
+        ValueError: Gdy wartości się wykluczają
+    """
+    if value is None or value == '' or value == []:
+        return None if other == '' or other == [] else other
+    if other is None or other == '' or other == []:
+        return value
+    others = other if isinstance(other, list) else [other]
+    common = [v for v in (value if isinstance(value, list) else [value]) if v in others]
+    if not common:
+        raise ValueError(f"Sprzeczne wartości filtra '{column}': {value} i {other}")
+    return common[0] if len(common) == 1 else common
+
+
+def filters_predicate(filters: Dict) -> Optional[Predicate]:
+    """
+    Predykat z filtrów w formacie planera (plan_query['local_filters']):
+    (min, max) = zakres, lista = przynależność, pozostałe = równość.
+    """
+    parts = []
+    for column, value in (filters or {}).items():
+        if isinstance(value, tuple):
+            parts.append(Col(column).between(*value))
+        elif isinstance(value, list):
+            parts.append(Col(column).isin(value))
+        else:
+            parts.append(Col(column).eq(value))
+    return all_of(*parts)
+
+
+def filter_columns(columns: Dict[str, List], predicate: Optional[Predicate], rows: Optional[int] = None) -> Dict[str, List]:
+    """Zostawia w fragmencie kolumnowym tylko wiersze spełniające predykat."""
+    if predicate is None or not columns:
+        return columns
+    keep = predicate.mask(columns, rows)
+    if keep.all():
+        return columns
+    indices = keep.nonzero()[0]
+    return {name: [values[i] for i in indices] for name, values in columns.items()}
+
+
+def filter_vehicles(vehicles: List[Dict], predicate: Optional[Predicate]) -> List[Dict]:
+    """Filtruje listę pojazdów JSON:API (słowniki z 'attributes') predykatem."""
+    if predicate is None or not vehicles:
+        return vehicles
+    columns = {
+        name: [(v.get('attributes') or {}).get(name) for v in vehicles]
+        for name in predicate.columns()
+    }
+    keep = predicate.mask(columns, len(vehicles))
+    return [vehicle for vehicle, ok in zip(vehicles, keep) if ok]
+
+
+def _columns_to_arrow(columns: Dict[str, List]) -> bytes:
+    """Pakuje kolumny do bufora Arrow IPC (mniejszy i szybszy w przesyłaniu niż pickle list)."""
+    arrays = []
+    for values in columns.values():
+        try:
+            arrays.append(pa.array(values))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mieszane typy - sprowadź do tekstu
+            arrays.append(pa.array([None if v is None else str(v) for v in values], type=pa.string()))
+    batch = pa.RecordBatch.from_arrays(arrays, names=list(columns.keys()))
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def decode_filtered_page(raw, columns: Optional[List[str]] = None, where: Optional[Predicate] = None) -> Dict:
+    """
+    decode_vehicle_page z predykatem liczonym od razu na stronie - odrzucone wiersze
+    nigdy nie trafiają do wyniku. Kolumny potrzebne tylko predykatowi są dekodowane
+    i usuwane po filtrowaniu.
+    """
+    decode_columns = columns
+    if columns is not None and where is not None:
+        decode_columns = list(columns) + [c for c in where.columns() if c not in columns and c != 'id']
+    chunk = decode_vehicle_page(raw, decode_columns)
+    
+    if where is not None and chunk['rows']:
+        chunk['columns'] = filter_columns(chunk['columns'], where, chunk['rows'])
+        chunk['rows'] = len(chunk['columns']['id'])
+    if decode_columns is not columns:
+        for name in decode_columns[len(columns):]:
+            chunk['columns'].pop(name, None)
+    return chunk
+
+
+def decode_page_worker(
+    raw: bytes,
+    columns: Optional[List[str]] = None,
+    where: Optional[Predicate] = None
+) -> Dict:
+    """
+    Dekodowanie strony w procesie roboczym (ProcessPoolExecutor).
+    Filtruje wiersze predykatem na miejscu i zwraca kompaktowy fragment kolumnowy:
+    bufor Arrow IPC w kluczu 'arrow' (jeśli jest pyarrow) lub listy w 'columns'.
+    """
+    chunk = decode_filtered_page(raw, columns, where)
+    
+    if pa is not None:
+        chunk['arrow'] = _columns_to_arrow(chunk.pop('columns'))
+    return chunk
+
+
+def chunk_columns(chunk: Dict) -> Dict[str, List]:
+    """Zwraca kolumny fragmentu jako listy (niezależnie od formatu fragmentu)."""
+    if 'arrow' in chunk:
+        return pa.ipc.open_stream(chunk['arrow']).read_all().to_pydict()
+    return chunk['columns']
+
+
+def chunk_to_dataframe(chunk: Dict) -> pd.DataFrame:
+    """Zamienia fragment kolumnowy na surowy DataFrame (bez obróbki z _postprocess_dataframe)."""
+    if 'arrow' in chunk:
+        return pa.ipc.open_stream(chunk['arrow']).read_all().to_pandas()
+    return pd.DataFrame(chunk['columns'])
+
+
+class RateLimiter:
+    """
+    Wspólny ogranicznik tempa zapytań do API CEPiK.
+    Pilnuje minimalnego odstępu między zapytaniami i pozwala wstrzymać
+    wszystkie wątki po wykryciu rate limiting.
+    """
+    
+    def __init__(self, min_interval: float = 0.5):
+        self.min_interval = min_interval  # sekund między zapytaniami
+        self._lock = threading.Lock()
+        self._last_request_time = 0.0
+        self._resume = threading.Event()
+        self._resume.set()  # Initially not blocked
+    
+    def wait(self):
+        """Blokuje do momentu, gdy wolno wysłać kolejne zapytanie."""
+        self._resume.wait()
+        with self._lock:
+            time_since_last = time.time() - self._last_request_time
+            if time_since_last < self.min_interval:
+                time.sleep(self.min_interval - time_since_last)
+            self._last_request_time = time.time()
+    
+    def try_acquire(self) -> bool:
+        """
+        Nieblokujący odpowiednik wait(): zajmuje miejsce na zapytanie tylko wtedy,
+        gdy minimalny odstęp już minął (używane dla zapytań dodatkowych, np. hedging).
+        """
+        if self.paused or not self._lock.acquire(blocking=False):
+            return False
+        try:
+            if time.time() - self._last_request_time < self.min_interval:
+                return False
+            self._last_request_time = time.time()
+            return True
+        finally:
+            self._lock.release()
+    
+    def pause(self, seconds: float) -> bool:
+        """
+        Wstrzymuje wszystkie zapytania na podaną liczbę sekund.
+        Zwraca True jeśli to wywołanie założyło blokadę (tylko pierwszy wątek).
+        """
+        with self._lock:
+            if not self._resume.is_set():
+                first = False
+            else:
+                self._resume.clear()
+                first = True
+        
+        if first:
+            time.sleep(seconds)
+            self._resume.set()
+        else:
+            self._resume.wait()
+        return first
+    
+    @property
+    def paused(self) -> bool:
+        return not self._resume.is_set()
+
+
+class LatencyTracker:
+    """
+    Krocząca historia czasów odpowiedzi API per endpoint (ostatnie `window` zapytań).
+    Na jej podstawie wyznaczany jest adaptacyjny timeout oraz próg wysłania
+    zapytania zapasowego (hedging).
+    """
+    
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._counters = {}
+    
+    def record(self, endpoint: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None:
+                samples = self._samples[endpoint] = deque(maxlen=self.window)
+            samples.append(seconds)
+    
+    def count(self, endpoint: str, counter: str):
+        """Zlicza zdarzenia dla endpointu (np. 'hedged', 'hedge_won', 'timeouts')."""
+        with self._lock:
+            counters = self._counters.setdefault(endpoint, {})
+            counters[counter] = counters.get(counter, 0) + 1
+    
+    def counter(self, endpoint: str, counter: str) -> int:
+        with self._lock:
+            return self._counters.get(endpoint, {}).get(counter, 0)
+    
+    def quantile(self, endpoint: str, q: float) -> Optional[float]:
+        """Kwantyl q (0-1) czasów odpowiedzi; None przy zbyt małej liczbie próbek."""
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if not samples or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    
+    def timeout_for(
+        self,
+        endpoint: str,
+        default: float = 30.0,
+        multiplier: float = 3.0,
+        floor: float = 5.0
+    ) -> float:
+        """
+        Adaptacyjny timeout: wielokrotność p99, nie mniej niż floor i nie więcej niż default.
+        Bez wystarczającej historii zwraca default.
+        """
+        p99 = self.quantile(endpoint, 0.99)
+        if p99 is None:
+            return default
+        return min(default, max(floor, p99 * multiplier))
+    
+    def stats(self) -> Dict[str, Dict]:
+        """{endpoint: {'samples', 'p50', 'p95', 'p99', 'timeout', 'requests', 'hedged', 'hedge_won', 'timeouts'}}"""
+        with self._lock:
+            endpoints = list(self._samples.keys())
+        result = {}
+        for endpoint in endpoints:
+            with self._lock:
+                samples = len(self._samples[endpoint])
+                counters = dict(self._counters.get(endpoint, {}))
+            result[endpoint] = {
+                'samples': samples,
+                'p50': self.quantile(endpoint, 0.5),
+                'p95': self.quantile(endpoint, 0.95),
+                'p99': self.quantile(endpoint, 0.99),
+                'timeout': self.timeout_for(endpoint),
+                'requests': counters.get('requests', 0),
+                'hedged': counters.get('hedged', 0),
+                'hedge_won': counters.get('hedge_won', 0),
+                'timeouts': counters.get('timeouts', 0)
+            }
+        return result
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Zapytanie odrzucone bez wysyłania - API uznane za niedostępne (otwarty bezpiecznik)."""
+
+
+class RetryPolicy:
+    """
+    Polityka ponawiania zapytań: wykładniczy backoff z górnym limitem i losowym
+    rozrzutem (jitter), podział odpowiedzi na błędy przejściowe i trwałe.
+    """
+    
+    # Przeciążenie / chwilowa niedostępność - warto ponowić
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    # Rate limiting - wstrzymanie wszystkich wątków zamiast backoffu pojedynczego zapytania
+    RATE_LIMIT_STATUSES = {429, 503}
+    
+    def __init__(
+        self,
+        max_retries: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        rate_limit_pause: float = 15.0
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limit_pause = rate_limit_pause
+    
+    def delay(self, attempt: int) -> float:
+        """
+        Czas oczekiwania przed ponowieniem nr attempt (1, 2, ...) - losowy z przedziału
+        [cap/2, cap] ("equal jitter"), gdzie cap rośnie wykładniczo do max_delay.
+        """
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(cap / 2, cap)
+    
+    def is_retryable_status(self, status: int) -> bool:
+        return status in self.RETRY_STATUSES
+    
+    def is_retryable_exception(self, error: Exception) -> bool:
+        # Błąd SSL to problem konfiguracji, nie chwilowy - nie ponawiamy
+        if isinstance(error, (requests.exceptions.SSLError, CircuitOpenError)):
+            return False
+        return isinstance(error, (
+            requests.exceptions.Timeout,
+            requests.exceptions.ConnectionError,
+            requests.exceptions.ChunkedEncodingError
+        ))
+
+
+class CircuitBreaker:
+    """
+    Bezpiecznik dla API: po failure_threshold kolejnych błędach przejściowych
+    zapytania są odrzucane od razu (CircuitOpenError) przez reset_timeout sekund.
+    Potem przepuszczane jest jedno zapytanie próbne - sukces zamyka bezpiecznik,
+    błąd otwiera go ponownie. Zapytanie próbne może być ponawiane przez swojego
+    właściciela (np. po 429); zakończone bez wyniku zwalnia próbę (release_trial).
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial = 0        # numer trwającego zapytania próbnego (0 = brak)
+        self._trials = 0
+    
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.time() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+    
+    def before_request(self, trial: int = 0) -> int:
+        """
+        Rzuca CircuitOpenError, jeśli zapytanie nie powinno zostać wysłane.
+        
+        Args:
+            trial: Numer zapytania próbnego, które wywołujący już prowadzi (ponowienie)
+        
+        Returns:
+            Numer zapytania próbnego prowadzonego przez wywołującego (0 = zwykłe zapytanie).
+            Próba kończy się przez record_success/record_failure albo release_trial.
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return 0
+            remaining = self.reset_timeout - (time.time() - self._opened_at)
+            if self._state == self.OPEN and remaining > 0:
+                raise CircuitOpenError(
+                    f"API CEPiK niedostępne - wstrzymano zapytania (ponowna próba za {remaining:.0f}s)"
+                )
+            if self._trial and self._trial != trial:
+                raise CircuitOpenError("API CEPiK niedostępne - trwa zapytanie próbne")
+            if not self._trial:
+                self._trials += 1
+                self._trial = self._trials
+            self._state = self.HALF_OPEN
+            return self._trial
+    
+    def release_trial(self, trial: int):
+        """Zwalnia zapytanie próbne zakończone bez wyniku (następne zapytanie będzie próbą)."""
+        with self._lock:
+            if trial and self._trial == trial:
+                self._trial = 0
+    
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial = 0
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial = 0
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning("Circuit breaker otwarty po %d błędach", self._failures)
+                self._state = self.OPEN
+                self._opened_at = time.time()
+
+
+class ProgressThrottle:
+    """Ogranicza częstotliwość wywołań callbacku postępu (najwyżej raz na interval sekund)."""
+    
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self._last = 0.0
+    
+    def due(self, final: bool = False) -> bool:
+        """True, jeśli można teraz odświeżyć postęp (zawsze dla final=True)."""
+        now = time.time()
+        if final or now - self._last >= self.interval:
+            self._last = now
+            return True
+        return False
+
+
+class ProgressStream:
+    """
+    Strumień zdarzeń postępu pobierania (per województwo i per strona).
+    Wątki robocze tylko wrzucają zdarzenia do kolejki - nie czekają na żadną blokadę
+    współdzieloną z UI. Wątek główny składa zdarzenia w stan (tylko on go modyfikuje)
+    i przekazuje migawki do callbacku UI najwyżej co `interval` sekund.
+    
+    Stan ma format statusów search_all_voivodeships_parallel:
+        {klucz: {'name', 'status', 'count', 'pages', 'error', 'time', 'start_time'}}
+    Strony mogą przychodzić w dowolnej kolejności (fragmenty z różnych wątków) -
+    'pages' to liczba pobranych stron.
+    """
+    
+    def __init__(self, names: Dict[str, str], interval: float = 0.5):
+        self.interval = interval
+        self._events = queue.SimpleQueue()
+        now = time.time()
+        self._state = {
+            key: {
+                'name': name,
+                'status': '⏳ Oczekiwanie...',
+                'count': 0,
+                'pages': 0,
+                'error': None,
+                'time': 0,
+                'start_time': now
+            }
+            for key, name in names.items()
+        }
+    
+    # Zdarzenia wysyłane z wątków roboczych
+    
+    def emit(self, key: str, kind: str, **fields):
+        self._events.put((key, kind, time.time(), fields))
+    
+    def start(self, key: str):
+        self.emit(key, 'start')
+    
+    def page(self, key: str, rows: int):
+        self.emit(key, 'page', rows=rows)
+    
+    def expect(self, key: str, pages: int):
+        """Szacowana łączna liczba stron (z meta.count) - do wyświetlenia postępu."""
+        self.emit(key, 'expect', pages=pages)
+    
+    def status(self, key: str, status: str):
+        self.emit(key, 'status', status=status)
+    
+    def done(self, key: str):
+        self.emit(key, 'done')
+    
+    def fail(self, key: str, error: str):
+        self.emit(key, 'error', error=error)
+    
+    # Wątek główny
+    
+    def drain(self) -> int:
+        """Nakłada wszystkie oczekujące zdarzenia na stan. Zwraca liczbę zdarzeń."""
+        applied = 0
+        while True:
+            try:
+                key, kind, timestamp, fields = self._events.get_nowait()
+            except queue.Empty:
+                return applied
+            self._apply(key, kind, timestamp, fields)
+            applied += 1
+    
+    def _apply(self, key: str, kind: str, timestamp: float, fields: Dict):
+        state = self._state[key]
+        if state['error']:
+            return  # Błąd jest stanem końcowym (zdarzenia z pozostałych shardów są pomijane)
+        if kind == 'start':
+            state['start_time'] = timestamp
+            state['status'] = '🔄 Pobieranie...'
+        elif kind == 'page':
+            state['pages'] += 1
+            state['count'] += fields['rows']
+            if state.get('expected_pages'):
+                state['status'] = f"🔄 Strona {state['pages']}/{state['expected_pages']}..."
+            else:
+                state['status'] = f"🔄 Strona {state['pages']}..."
+        elif kind == 'expect':
+            state['expected_pages'] = state.get('expected_pages', 0) + fields['pages']
+        elif kind == 'status':
+            state['status'] = fields['status']
+        elif kind == 'done':
+            state['status'] = '✅ Ukończono'
+            state['time'] = timestamp - state['start_time']
+        elif kind == 'error':
+            state['status'] = '❌ Błąd'
+            state['error'] = fields['error']
+            state['time'] = timestamp - state['start_time']
+    
+    def snapshot(self) -> Dict[str, Dict]:
+        """Kopia stanu - bezpieczna do przekazania do UI."""
+        return {key: dict(state) for key, state in self._state.items()}
+    
+    def pump(self, futures, callback=None):
+        """
+        Czeka na zakończenie futures, przekazując callbackowi migawkę stanu
+        najwyżej co interval sekund i tylko wtedy, gdy przyszły nowe zdarzenia
+        (wiele zdarzeń z jednego okresu daje jedno odświeżenie UI).
+        """
+        pending = set(futures)
+        if callback:
+            callback(self.snapshot())
+        while pending:
+            _, pending = wait(pending, timeout=self.interval)
+            if self.drain() and callback:
+                callback(self.snapshot())
+
+
+class ShardScheduler:
+    """
+    Kolejki zadań z podkradaniem pracy (work stealing) dla wątków pobierających.
+    Każdy wątek bierze zadania z końca własnej kolejki (ostatnio dodane przez siebie),
+    a gdy jest pusta - podkrada najstarsze zadanie z najdłuższej kolejki innego wątku.
+    Zadania mogą dodawać nowe zadania w trakcie wykonania; get() zwraca None dopiero,
+    gdy wszystkie kolejki są puste i żadne zadanie nie jest w toku.
+    """
+    
+    def __init__(self, workers: int):
+        self._queues = [deque() for _ in range(workers)]
+        self._cond = threading.Condition()
+        self._outstanding = 0  # zadania w kolejkach + w toku
+        self.stolen = 0
+    
+    def push(self, worker: int, task):
+        with self._cond:
+            self._queues[worker].append(task)
+            self._outstanding += 1
+            self._cond.notify()
+    
+    def get(self, worker: int):
+        """Następne zadanie dla wątku (blokuje, dopóki inne zadania mogą dodać pracę)."""
+        with self._cond:
+            while True:
+                own = self._queues[worker]
+                if own:
+                    return own.pop()
+                victim = max(self._queues, key=len)
+                if victim:
+                    self.stolen += 1
+                    return victim.popleft()
+                if self._outstanding == 0:
+                    return None
+                self._cond.wait()
+    
+    def task_done(self):
+        with self._cond:
+            self._outstanding -= 1
+            if self._outstanding == 0:
+                self._cond.notify_all()
+
+
+class CategoryCodec:
+    """
+    Wspólna dla procesu, stabilna tabela kodów wartości kategorycznych (osobna dla
+    każdej kolumny). Wartość dostaje kod przy pierwszym wystąpieniu (lub ze słownika
+    API) i nigdy go nie zmienia - kolejne wartości są tylko dopisywane na końcu.
+    Kolumny są kodowane do pd.Categorical o kategoriach tabeli: fragmenty z różnych
+    stron, batchy, sesji i migawek mają te same kody, więc łączenie (concat) i
+    grupowanie nie wymagają ponownej faktoryzacji tekstu.
+    Bezpieczna wątkowo - fragmenty są kodowane w wątkach pobierających.
+    """
+    
+    def __init__(self, columns: Iterable[str]):
+        self.columns = set(columns)
+        self._lock = threading.Lock()
+        self._values: Dict[str, List] = {col: [] for col in self.columns}
+        self._indexes: Dict[str, pd.Index] = {col: pd.Index([], dtype=object) for col in self.columns}
+        self._dtypes: Dict[str, pd.CategoricalDtype] = {
+            col: pd.CategoricalDtype(pd.Index([], dtype=object)) for col in self.columns
+        }
+    
+    def __len__(self):
+        return sum(len(values) for values in self._values.values())
+    
+    def _lookup(self, column: str, values: np.ndarray) -> np.ndarray:
+        """Kody unikalnych wartości (bez braków); nieznane wartości są dopisywane do tabeli."""
+        with self._lock:
+            codes = self._indexes[column].get_indexer(values)
+            unknown = codes < 0
+            if unknown.any():
+                self._values[column].extend(values[unknown])
+                index = pd.Index(self._values[column], dtype=object)
+                self._indexes[column] = index
+                self._dtypes[column] = pd.CategoricalDtype(index)
+                codes[unknown] = index.get_indexer(values[unknown])
+        return codes
+    
+    def seed(self, column: str, values: Iterable):
+        """Dodaje wartości słownika API (kolumny spoza tabeli są pomijane)."""
+        if column in self.columns:
+            values = pd.unique(pd.Series(list(values), dtype=object).dropna())
+            self._lookup(column, np.asarray(values, dtype=object))
+    
+    def dtype(self, column: str) -> pd.CategoricalDtype:
+        """Aktualny typ kategoryczny kolumny (kategorie = wszystkie znane wartości)."""
+        with self._lock:
+            return self._dtypes[column]
+    
+    def codes(self, column: str, values: pd.Series, memo: Optional[Dict] = None) -> np.ndarray:
+        """
+        Kody tabeli dla kolumny (-1 = brak wartości). Tekst jest faktoryzowany raz,
+        a do tabeli mapowane są tylko unikalne wartości. Kolumna kategoryczna zakodowana
+        wcześniej (kategorie są początkiem tabeli) zachowuje kody bez przeliczania.
+        
+        Args:
+            memo: Wynik sprawdzenia kategorii dla typu ((kolumna, id typu) -> mapowanie),
+                przy wielu fragmentach o tym samym typie
+        """
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy()
+            # Ten sam obiekt typu może trafić do kilku kolumn - mapowanie jest per kolumna
+            key = (column, id(values.dtype))
+            if memo is not None and key in memo:
+                mapping = memo[key]
+            else:
+                categories = values.cat.categories
+                current = self.dtype(column).categories
+                if len(categories) <= len(current) and current[:len(categories)].equals(categories):
+                    mapping = None  # te same kody
+                else:
+                    mapping = self._lookup(column, np.asarray(categories, dtype=object))
+                if memo is not None:
+                    memo[key] = mapping
+            return codes if mapping is None else np.append(mapping, -1)[codes]
+        
+        local, uniques = pd.factorize(np.asarray(values, dtype=object))
+        if not len(uniques):
+            return local
+        return np.append(self._lookup(column, np.asarray(uniques, dtype=object)), -1)[local]
+    
+    def encode(self, column: str, values: pd.Series) -> pd.Series:
+        """Koduje kolumnę do pd.Categorical z kodami tabeli (nowe wartości są dopisywane)."""
+        codes = self.codes(column, values)
+        return pd.Series(
+            pd.Categorical.from_codes(codes, dtype=self.dtype(column)),
+            index=values.index, name=values.name
+        )
+    
+    def encode_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Koduje (w miejscu) kolumny tabeli obecne w DataFrame."""
+        for col in self.columns:
+            if col in df.columns:
+                df[col] = self.encode(col, df[col])
+        return df
+    
+    def concat(self, frames: List[pd.DataFrame], **kwargs) -> pd.DataFrame:
+        """
+        pd.concat z kolumnami kategorycznymi tabeli sklejanymi jako kody (jeden
+        np.concatenate) - bez powrotu do tekstu przy różnych kategoriach fragmentów.
+        """
+        order = list(dict.fromkeys(col for frame in frames for col in frame.columns))
+        encoded = [col for col in order if col in self.columns]
+        memo = {}
+        codes = {
+            col: np.concatenate([
+                self.codes(col, frame[col], memo) if col in frame.columns else np.full(len(frame), -1)
+                for frame in frames
+            ])
+            for col in encoded
+        }
+        result = pd.concat([frame.drop(columns=[c for c in encoded if c in frame.columns]) for frame in frames], **kwargs)
+        for col in encoded:
+            result[col] = pd.Categorical.from_codes(codes[col], dtype=self.dtype(col))
+        return result[order]
 
 
 class DESAdapter(HTTPAdapter):
@@ -55,20 +1077,176 @@ class CepikAPI:
         '32': 'ZACHODNIOPOMORSKIE'
     }
     
-    def __init__(self):
-        self.session = requests.Session()
+    # Połączenia zapasowe ponad równoległość pobierania (słowniki, sondy liczby rekordów)
+    POOL_HEADROOM = 2
+    
+    # Timeout zapytania bez historii czasów odpowiedzi [s]
+    DEFAULT_TIMEOUT = 30
+    # Hedging: zapytanie zapasowe po przekroczeniu kwantyla czasu odpowiedzi,
+    # najwyżej dla takiej części wszystkich zapytań
+    HEDGE_QUANTILE = 0.95
+    MAX_HEDGE_RATIO = 0.1
+    
+    # Najmniejszy odstęp między odświeżeniami postępu w UI [s]
+    PROGRESS_INTERVAL = 0.5
+    
+    # Liczba stron w jednym zadaniu (shardzie) pobierania wszystkich województw
+    SHARD_PAGES = 8
+    
+    def __init__(
+        self,
+        decode_workers: int = 0,
+        max_concurrency: int = 16,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        hedging: bool = True
+    ):
+        """
+        Args:
+            decode_workers: Liczba procesów dekodujących strony (0 = dekodowanie w wątku pobierającym)
+            max_concurrency: Maksymalna liczba równoległych zapytań; wyznacza rozmiar puli połączeń
+                i ogranicza liczbę wątków we wszystkich metodach równoległych
+            retry_policy: Polityka ponawiania zapytań (domyślnie RetryPolicy())
+            circuit_breaker: Bezpiecznik wspólny dla wszystkich zapytań (domyślnie CircuitBreaker())
+            hedging: Czy wysyłać zapytanie zapasowe, gdy odpowiedź przekracza p95 czasu odpowiedzi
+        """
+        # Procesy dekodujące (tworzone przy pierwszym użyciu)
+        self.decode_workers = decode_workers
+        self._decode_pool = None
+        self._decode_pool_lock = threading.Lock()
         
-        # Dodanie custom adaptera dla obsługi starszych certyfikatów SSL
-        adapter = DESAdapter()
-        self.session.mount('https://', adapter)
+        # Jeden adapter (pula połączeń urllib3 jest bezpieczna wątkowo) współdzielony
+        # przez sesje requests tworzone osobno dla każdego wątku.
+        # pool_block=True: przy braku wolnego połączenia wątek czeka, zamiast otwierać
+        # nadmiarowe połączenie i odrzucać je potem ("Connection pool is full").
+        self.max_concurrency = max(1, max_concurrency)
+        self.hedging = hedging
+        hedge_slots = math.ceil(self.max_concurrency * self.MAX_HEDGE_RATIO) if hedging else 0
+        self.pool_size = self.max_concurrency + self.POOL_HEADROOM + hedge_slots
+        self._adapter = DESAdapter(pool_connections=4, pool_maxsize=self.pool_size, pool_block=True)
+        self._local = threading.local()
+        self._sessions_created = 0
+        self._sessions_lock = threading.Lock()
         
         # Cache dla słowników
         self._dictionaries_cache = {}
         
-        self.session.headers.update({
-            'Accept': 'application/json',
-            'Content-Type': 'application/json'
-        })
+        # Podpowiedzi marek (słownik 'marka') i modeli (pary zaobserwowane na stronach)
+        self.suggestions = SuggestionIndex()
+        
+        # Wspólne kody wartości kategorycznych (słowniki API + wartości z pobranych stron)
+        self.categories = CategoryCodec(ENCODED_COLUMNS)
+        self.categories.seed('wojewodztwo-kod', self.WOJEWODZTWA_KODY.keys())
+        self.categories.seed('wojewodztwo', self.WOJEWODZTWA_KODY.values())
+        
+        # Wspólny limit tempa dla wszystkich równoległych zapytań
+        self.rate_limiter = RateLimiter()
+        
+        # Ponawianie i bezpiecznik dla wszystkich zapytań HTTP (_request)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        
+        # Czasy odpowiedzi per endpoint (adaptacyjne timeouty, hedging)
+        self.latency = LatencyTracker()
+        self._hedge_pool = None
+        self._hedge_pool_lock = threading.Lock()
+    
+    @property
+    def session(self) -> requests.Session:
+        """
+        Sesja HTTP bieżącego wątku (requests.Session nie gwarantuje bezpieczeństwa wątkowego).
+        Wszystkie sesje korzystają z tej samej puli połączeń, więc połączenia keep-alive
+        i ich uzgodnione TLS są ponownie używane między wątkami.
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('https://', self._adapter)
+            session.headers.update({
+                'Accept': 'application/json',
+                'Content-Type': 'application/json'
+            })
+            self._local.session = session
+            with self._sessions_lock:
+                self._sessions_created += 1
+        return session
+    
+    def worker_count(self, max_workers: int) -> int:
+        """Liczba wątków ograniczona do rozmiaru puli połączeń."""
+        return max(1, min(max_workers, self.max_concurrency))
+    
+    def warmup(self, connections: int = 4, timeout: float = 10) -> int:
+        """
+        Otwiera z wyprzedzeniem połączenia do API (TCP + uzgodnienie TLS), żeby pierwsze
+        wyszukiwanie nie płaciło za nie opóźnieniem. Zapytania wysyłane są jednocześnie,
+        dzięki czemu każde otwiera osobne połączenie, które wraca potem do puli.
+        
+        Args:
+            connections: Liczba połączeń do otwarcia (ograniczona rozmiarem puli)
+            timeout: Limit czasu pojedynczego zapytania
+        
+        Returns:
+            Liczba udanych połączeń
+        """
+        connections = max(1, min(connections, self.pool_size))
+        barrier = threading.Barrier(connections, timeout=timeout)
+        
+        def open_connection():
+            try:
+                barrier.wait()
+            except threading.BrokenBarrierError:
+                pass
+            try:
+                # Dowolna odpowiedź HTTP oznacza zestawione połączenie
+                self.session.head(f"{self.BASE_URL}/slowniki", timeout=timeout)
+                return True
+            except requests.exceptions.RequestException as e:
+                logger.debug("Rozgrzewanie połączenia nieudane: %s", str(e)[:80])
+                return False
+        
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            opened = sum(executor.map(lambda _: open_connection(), range(connections)))
+        logger.info("Rozgrzano %d/%d połączeń z API w %.2fs", opened, connections, time.time() - start_time)
+        return opened
+    
+    def pool_stats(self) -> Dict:
+        """
+        Statystyki puli połączeń.
+        
+        Returns:
+            {'pool_size', 'max_concurrency', 'sessions', 'connections_opened', 'requests',
+             'idle_connections', 'reuse_ratio', 'hosts': [{'host', 'connections_opened', 'requests', 'idle'}]}
+        """
+        hosts = []
+        manager = self._adapter.poolmanager
+        for key in list(manager.pools.keys()):
+            pool = manager.pools.get(key)
+            if pool is None:
+                continue
+            idle = 0
+            if pool.pool is not None:
+                idle = sum(1 for conn in list(pool.pool.queue) if conn is not None)
+            hosts.append({
+                'host': pool.host,
+                'connections_opened': pool.num_connections,
+                'requests': pool.num_requests,
+                'idle': idle
+            })
+        
+        opened = sum(h['connections_opened'] for h in hosts)
+        total_requests = sum(h['requests'] for h in hosts)
+        return {
+            'pool_size': self.pool_size,
+            'max_concurrency': self.max_concurrency,
+            'sessions': self._sessions_created,
+            'connections_opened': opened,
+            'requests': total_requests,
+            'idle_connections': sum(h['idle'] for h in hosts),
+            # Udział zapytań obsłużonych istniejącym połączeniem (bez nowego uzgodnienia TLS)
+            'reuse_ratio': (1 - opened / total_requests) if total_requests else 0.0,
+            'hosts': hosts
+        }
     
     def get_dictionary(self, dictionary_name: str) -> List[str]:
         """
@@ -85,11 +1263,11 @@ class CepikAPI:
             return self._dictionaries_cache[dictionary_name]
         
         try:
-            response = self.session.get(
+            response = self._request(
                 f"{self.BASE_URL}/slowniki/{dictionary_name}",
-                timeout=10
+                timeout=10,
+                rate_limited=False
             )
-            response.raise_for_status()
             data = response.json()
             
             values = []
@@ -107,6 +1285,9 @@ class CepikAPI:
             
             # Cache wynik
             self._dictionaries_cache[dictionary_name] = values
+            if dictionary_name == 'marka':
+                self.suggestions.add_brands(values)
+            self.categories.seed(dictionary_name, values)
             return values
             
         except Exception as e:
@@ -123,8 +1304,7 @@ class CepikAPI:
         """
         try:
             # Pobierz listę dostępnych słowników
-            response = self.session.get(f"{self.BASE_URL}/slowniki?limit=100&page=1", timeout=10)
-            response.raise_for_status()
+            response = self._request(f"{self.BASE_URL}/slowniki?limit=100&page=1", timeout=10, rate_limited=False)
             data = response.json()
             
             dictionaries = {}
@@ -168,8 +1348,7 @@ class CepikAPI:
         Returns: Lista tupli (kod, nazwa) np. [('02', 'DOLNOŚLĄSKIE'), ...]
         """
         try:
-            response = self.session.get(f"{self.BASE_URL}/slowniki/wojewodztwa", timeout=10)
-            response.raise_for_status()
+            response = self._request(f"{self.BASE_URL}/slowniki/wojewodztwa", timeout=10, rate_limited=False)
             data = response.json()
             
             if 'data' in data and isinstance(data['data'], dict):
@@ -193,6 +1372,38 @@ class CepikAPI:
                 return kod
         return None
     
+    def build_search_params(
+        self,
+        voivodeship_code: str,
+        date_from: str,
+        date_to: str,
+        brand: Optional[str] = None,
+        model: Optional[str] = None,
+        additional_filters: Optional[Dict] = None
+    ) -> Dict:
+        """Buduje parametry zapytania /pojazdy (filtry API jako filter[klucz])."""
+        params = {
+            'wojewodztwo': voivodeship_code,
+            'data-od': date_from,
+            'data-do': date_to,
+            'limit': PAGE_LIMIT,  # Max na stronę (API limit)
+            'page': 1
+        }
+        
+        # Filtrowanie przez API (o wiele szybsze!)
+        if brand:
+            params['filter[marka]'] = brand.upper()
+        if model:
+            params['filter[model]'] = model.upper()
+        
+        # Dodatkowe filtry API
+        if additional_filters:
+            for key, value in additional_filters.items():
+                if value and key not in ['marka', 'model']:  # marka i model już obsłużone
+                    params[f'filter[{key}]'] = value.upper() if isinstance(value, str) else value
+        
+        return params
+    
     def search_vehicles(
         self,
         voivodeship_code: Optional[str] = None,
@@ -232,92 +1443,50 @@ class CepikAPI:
                 return {'data': [], 'error': 'Wybierz zakres dat'}
             
             url = f"{self.BASE_URL}/pojazdy"
-            params = {
-                'wojewodztwo': voivodeship_code,
-                'data-od': date_from,
-                'data-do': date_to,
-                'limit': 500,  # Max na stronę (API limit)
-                'page': 1
-            }
-            
-            # Filtrowanie przez API (o wiele szybsze!)
-            if brand:
-                params['filter[marka]'] = brand.upper()
-            
-            if model:
-                params['filter[model]'] = model.upper()
-            
-            # Dodatkowe filtry API
-            if additional_filters:
-                for key, value in additional_filters.items():
-                    if value and key not in ['marka', 'model']:  # marka i model już obsłużone
-                        params[f'filter[{key}]'] = value.upper() if isinstance(value, str) else value
+            params = self.build_search_params(
+                voivodeship_code, date_from, date_to, brand, model, additional_filters
+            )
             
             # Pobierz wszystkie strony
             all_vehicles = []
             seen_ids = set()  # Do deduplicacji
             current_page = 1
             total_count = 0
+            throttle = ProgressThrottle(self.PROGRESS_INTERVAL)
+            where = year_predicate(year_from, year_to)
             
             while True:
                 params['page'] = current_page
                 
-                # Wykonaj zapytanie z retry
-                try:
-                    response = self.session.get(url, params=params, timeout=30)
-                    response.raise_for_status()
-                    result = response.json()
-                except (requests.exceptions.Timeout, requests.exceptions.RequestException) as e:
-                    # Retry raz jeśli włączone
-                    if retry:
-                        time.sleep(1)
-                        try:
-                            response = self.session.get(url, params=params, timeout=30)
-                            response.raise_for_status()
-                            result = response.json()
-                        except Exception:
-                            raise e  # Zwróć pierwotny błąd
-                    else:
-                        raise e
+                # Wykonaj zapytanie z retry (polityka ponawiania _request)
+                response = self._request(url, params, max_retries=None if retry else 0)
+                result = response.json()
                 
                 # Pobierz informacje o paginacji
                 if 'meta' in result and 'count' in result['meta']:
                     total_count = result['meta']['count']
                 
-                # Dodaj pojazdy z deduplicacją po ID
+                # Dodaj pojazdy z deduplicacją po ID; rok produkcji filtrowany lokalnie
+                # na każdej stronie (API nie wspiera tego bezpośrednio)
                 if 'data' in result and isinstance(result['data'], list):
-                    for vehicle in result['data']:
+                    for vehicle in filter_vehicles(result['data'], where):
                         vehicle_id = vehicle.get('id')
                         if vehicle_id and vehicle_id not in seen_ids:
                             seen_ids.add(vehicle_id)
                             all_vehicles.append(vehicle)
                 
-                # Wywołaj callback jeśli jest
-                if progress_callback:
+                has_next = bool(result.get('links', {}).get('next'))
+                
+                # Wywołaj callback jeśli jest (najwyżej co PROGRESS_INTERVAL, zawsze po ostatniej stronie)
+                if progress_callback and throttle.due(final=not has_next):
                     progress_callback(current_page, total_count, len(all_vehicles))
                 
                 # Sprawdź czy są kolejne strony
-                if 'links' in result and 'next' in result['links'] and result['links']['next']:
+                if has_next:
                     current_page += 1
                 else:
                     break  # Koniec stron
             
-            # Lokalne filtrowanie po roku produkcji (API nie wspiera tego bezpośrednio)
-            if year_from or year_to:
-                filtered = []
-                for v in all_vehicles:
-                    if 'attributes' in v and 'rok-produkcji' in v['attributes']:
-                        try:
-                            year = int(v['attributes']['rok-produkcji'])
-                            if year_from and year < year_from:
-                                continue
-                            if year_to and year > year_to:
-                                continue
-                            filtered.append(v)
-                        except (ValueError, TypeError):
-                            continue
-                all_vehicles = filtered
-            
             return {
                 'data': all_vehicles,
                 'meta': {
@@ -406,38 +1575,824 @@ class CepikAPI:
                     if '_batch_id' in vehicle:
                         record['_batch_id'] = vehicle['_batch_id']
                     
-                    # Zamień kod województwa na nazwę
-                    if 'wojewodztwo-kod' in record:
-                        kod = record['wojewodztwo-kod']
-                        record['wojewodztwo'] = self.WOJEWODZTWA_KODY.get(kod, kod)
-                    
-                    # Normalizuj nazwę modelu (usuń markę z modelu)
-                    if 'marka' in record and 'model' in record:
-                        record['model'] = self.normalize_model_name(record['marka'], record['model'])
-                    
                     records.append(record)
             
             if records:
-                df = pd.DataFrame(records)
+                return self._postprocess_dataframe(pd.DataFrame(records))
+        
+        return pd.DataFrame()
+    
+    def columns_to_dataframe(self, columns: Dict[str, List]) -> pd.DataFrame:
+        """
+        Konwertuje dane kolumnowe (wynik decode_vehicle_page / search_vehicles_columnar)
+        do pandas DataFrame z tą samą obróbką co vehicles_to_dataframe.
+        """
+        if not columns or not columns.get('id'):
+            return pd.DataFrame()
+        return self._postprocess_dataframe(pd.DataFrame(columns))
+    
+    def _postprocess_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Nazwy województw, normalizacja modeli, typy numeryczne, daty i kodowanie
+        kolumn kategorycznych wspólnym słownikiem (operacje kolumnowe).
+        """
+        # Zamień kod województwa na nazwę
+        if 'wojewodztwo-kod' in df.columns:
+            kody = df['wojewodztwo-kod']
+            df['wojewodztwo'] = kody.map(self.WOJEWODZTWA_KODY).fillna(kody)
+        
+        # Normalizuj nazwę modelu (usuń markę z modelu)
+        if 'marka' in df.columns and 'model' in df.columns:
+            df['model'] = [
+                self.normalize_model_name(marka, model)
+                if isinstance(marka, str) and isinstance(model, str) else model
+                for marka, model in zip(df['marka'], df['model'])
+            ]
+        
+        # Konwertuj kolumny numeryczne
+        for col in NUMERIC_COLUMNS:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+        
+        # Daty jako datetime64 - parsowane raz przy wczytywaniu (API zwraca "YYYY-MM-DD")
+        for col in df.columns:
+            if isinstance(col, str) and col.startswith(DATE_COLUMN_PREFIX):
+                df[col] = parse_dates(df[col])
+        
+        # Kolumny kategoryczne jako kody wspólnej tabeli (pd.Categorical)
+        return self.categories.encode_frame(df)
+    
+    def _get_decode_pool(self) -> Optional[ProcessPoolExecutor]:
+        """Zwraca wspólną pulę procesów dekodujących (None gdy decode_workers == 0)."""
+        if not self.decode_workers:
+            return None
+        with self._decode_pool_lock:
+            if self._decode_pool is None:
+                # spawn - bezpieczne przy wielu wątkach w procesie głównym
+                self._decode_pool = ProcessPoolExecutor(
+                    max_workers=self.decode_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._decode_pool
+    
+    def iter_vehicle_pages(
+        self,
+        params: Dict,
+        columns: Optional[List[str]] = None,
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None,
+        where: Optional[Predicate] = None,
+        on_retry=None,
+        stop_page: Optional[int] = None
+    ):
+        """
+        Generator stron /pojazdy zdekodowanych do kolumn (zapytania pod wspólnym RateLimiter).
+        Bez puli procesów strony dekodowane są w bieżącym wątku (decode_filtered_page).
+        Z pulą (decode_workers > 0) surowe bajty trafiają do procesów roboczych
+        (decode_page_worker), a pobieranie kolejnych stron nie czeka na dekodowanie.
+        
+        Args:
+            params: Parametry zapytania (build_search_params)
+            columns: Projekcja atrybutów (None = wszystkie)
+            year_from, year_to: Lokalny filtr roku produkcji stosowany do każdej strony
+            where: Dodatkowy predykat (Col(...)) liczony na każdej stronie przed jej oddaniem
+            on_retry: Opcjonalny callback ponowień zapytań (patrz _request)
+            stop_page: Ostatnia pobierana strona (None = do końca wyników); pierwsza
+                strona to params['page']
+        
+        Yields:
+            Fragment strony (patrz decode_page_worker) z dodanym kluczem 'page'
+        """
+        url = f"{self.BASE_URL}/pojazdy"
+        params = dict(params)
+        current_page = params.get('page', 1)
+        pool = self._get_decode_pool()
+        where = all_of(year_predicate(year_from, year_to), where)
+        
+        if pool is None:
+            while True:
+                params['page'] = current_page
+                response = self._request(url, params, on_retry=on_retry)
+                chunk = decode_filtered_page(response.content, columns, where)
+                chunk['page'] = current_page
+                self._observe_models(chunk)
+                yield chunk
+                
+                if not chunk['has_next'] or current_page == stop_page:
+                    break
+                current_page += 1
+            return
+        
+        # Potok: pobieranie w tym wątku, dekodowanie w procesach
+        pending = deque()
+        max_in_flight = 2 * self.decode_workers
+        last_page = None  # znana po zdekodowaniu pierwszej strony (meta.count)
+        
+        while True:
+            params['page'] = current_page
+            response = self._request(url, params, on_retry=on_retry)
+            future = pool.submit(decode_page_worker, response.content, columns, where)
+            pending.append((current_page, future))
+            
+            if last_page is None:
+                # Pierwsza strona - poczekaj na liczbę rekordów, żeby znać liczbę stron
+                page, future = pending.popleft()
+                chunk = future.result()
+                chunk['page'] = page
+                last_page = max(page, math.ceil(chunk['total_count'] / int(params.get('limit', PAGE_LIMIT))))
+                if stop_page is not None:
+                    last_page = min(last_page, stop_page)
+                self._observe_models(chunk)
+                yield chunk
+                if not chunk['has_next'] or page == stop_page:
+                    return
+            
+            # Oddaj gotowe fragmenty w kolejności stron, ogranicz liczbę oczekujących
+            while pending and (pending[0][1].done() or len(pending) >= max_in_flight):
+                page, future = pending.popleft()
+                chunk = future.result()
+                chunk['page'] = page
+                self._observe_models(chunk)
+                yield chunk
+            
+            if current_page >= last_page:
+                # Dokończ dekodowanie; API może mieć więcej stron niż wynika z meta.count
+                chunk = None
+                while pending:
+                    page, future = pending.popleft()
+                    chunk = future.result()
+                    chunk['page'] = page
+                    self._observe_models(chunk)
+                    yield chunk
+                if chunk is None or not chunk['has_next'] or current_page == stop_page:
+                    return
+                last_page = current_page + 1
+            current_page += 1
+    
+    def _observe_models(self, chunk: Dict):
+        """Dopisuje pary (marka, model) ze strony do indeksu podpowiedzi (surowe wartości API)."""
+        if not chunk['rows']:
+            return
+        if 'arrow' in chunk:
+            table = pa.ipc.open_stream(chunk['arrow']).read_all()
+            if 'marka' not in table.column_names or 'model' not in table.column_names:
+                return
+            brands, models = table.column('marka').to_pylist(), table.column('model').to_pylist()
+        else:
+            if 'marka' not in chunk['columns'] or 'model' not in chunk['columns']:
+                return
+            brands, models = chunk['columns']['marka'], chunk['columns']['model']
+        self.suggestions.observe(brands, models)
+    
+    def _iter_model_pages(
+        self,
+        voivodeship_code: str,
+        date_from: str,
+        date_to: str,
+        brand: Optional[str],
+        model,
+        additional_filters: Optional[Dict],
+        columns: Optional[List[str]] = None,
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None,
+        where: Optional[Predicate] = None,
+        on_retry=None
+    ):
+        """
+        iter_vehicle_pages dla jednego modelu lub listy modeli (osobne zapytanie API
+        dla każdego modelu). Numery stron i total_count są narastające dla całej listy.
+        """
+        models = model if isinstance(model, list) else [model]
+        pages_before = 0
+        count_before = 0
+        for query_model in models:
+            params = self.build_search_params(
+                voivodeship_code, date_from, date_to, brand, query_model, additional_filters
+            )
+            page = 0
+            total = 0
+            for chunk in self.iter_vehicle_pages(params, columns, year_from, year_to, where=where, on_retry=on_retry):
+                page = chunk['page']
+                total = chunk['total_count'] or total
+                chunk['page'] = pages_before + page
+                chunk['total_count'] = count_before + total
+                yield chunk
+            pages_before += page
+            count_before += total
+    
+    def search_vehicles_columnar(
+        self,
+        voivodeship_code: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        brand: Optional[str] = None,
+        model: Optional[Union[str, List[str]]] = None,
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None,
+        additional_filters: Optional[Dict] = None,
+        columns: Optional[List[str]] = None,
+        progress_callback=None,
+        where: Optional[Predicate] = None
+    ) -> Dict:
+        """
+        Odpowiednik search_vehicles zwracający dane kolumnowo.
+        Strony dekodowane są od razu do list per kolumna (z projekcją atrybutów),
+        bez tworzenia słowników per pojazd - mniejsze zużycie CPU i pamięci.
+        
+        Args:
+            columns: Atrybuty potrzebne użytkownikowi/dashboardowi (None = wszystkie).
+                'rok-produkcji' jest dołączany automatycznie przy filtrze roku.
+            where: Predykat lokalny (Col(...)) stosowany do każdej strony - niepasujące
+                wiersze nie są przechowywane
+            model: Model lub lista modeli (np. z suggestions.resolve_model) - zapytanie per model
+            Pozostałe jak w search_vehicles.
+        
+        Returns:
+            {'columns': {nazwa: [wartości]}, 'meta': {...}} lub {'columns': {}, 'error': str}
+        """
+        try:
+            if not voivodeship_code:
+                return {'columns': {}, 'error': 'Wybierz województwo'}
+            
+            if not date_from or not date_to:
+                return {'columns': {}, 'error': 'Wybierz zakres dat'}
+            
+            if columns is not None and (year_from or year_to) and 'rok-produkcji' not in columns:
+                columns = list(columns) + ['rok-produkcji']
+            
+            merged = {}
+            seen_ids = set()  # Do deduplicacji
+            fetched = 0
+            total_count = 0
+            pages = 0
+            throttle = ProgressThrottle(self.PROGRESS_INTERVAL)
+            
+            for chunk in self._iter_model_pages(
+                voivodeship_code, date_from, date_to, brand, model, additional_filters,
+                columns, year_from, year_to, where=where
+            ):
+                pages = chunk['page']
+                total_count = chunk['total_count'] or total_count
+                page_columns = chunk_columns(chunk)
+                if not page_columns.get('id'):
+                    continue
                 
-                # Konwertuj kolumny numeryczne
-                numeric_columns = [
-                    'pojemnosc-skokowa-silnika',
-                    'masa-wlasna',
-                    'rok-produkcji',
-                    'liczba-miejsc-siedzacych',
-                    'masa-calkowita',
-                    'dopuszczalna-ladownosc',
-                    'liczba-osi'
-                ]
+                # Deduplikacja po ID - indeksy nowych wierszy
+                keep = []
+                for i, vehicle_id in enumerate(page_columns['id']):
+                    if vehicle_id and vehicle_id not in seen_ids:
+                        seen_ids.add(vehicle_id)
+                        keep.append(i)
                 
-                for col in numeric_columns:
-                    if col in df.columns:
-                        df[col] = pd.to_numeric(df[col], errors='coerce')
+                for name in page_columns:
+                    if name not in merged:
+                        # Kolumna pojawiła się dopiero na tej stronie
+                        merged[name] = [None] * fetched
+                for name, values in merged.items():
+                    page_values = page_columns.get(name)
+                    if page_values is None:
+                        values.extend([None] * len(keep))
+                    elif len(keep) == len(page_values):
+                        values.extend(page_values)
+                    else:
+                        values.extend([page_values[i] for i in keep])
+                fetched += len(keep)
                 
-                return df
+                if progress_callback and throttle.due(final=not chunk['has_next']):
+                    progress_callback(pages, total_count, fetched)
+            
+            return {
+                'columns': merged,
+                'meta': {
+                    'total_count': total_count,
+                    'fetched_count': fetched,
+                    'pages_fetched': pages
+                }
+            }
+            
+        except requests.exceptions.Timeout:
+            return {'columns': {}, 'error': 'Przekroczono limit czasu oczekiwania (30s). Spróbuj mniejszy zakres dat.'}
+        except requests.exceptions.SSLError:
+            return {'columns': {}, 'error': 'Błąd SSL - problem z certyfikatem API'}
+        except requests.exceptions.RequestException as e:
+            return {'columns': {}, 'error': f'Błąd połączenia: {str(e)}'}
+        except Exception as e:
+            return {'columns': {}, 'error': f'Nieoczekiwany błąd: {str(e)}'}
+    
+    def _endpoint(self, url: str) -> str:
+        """Klucz endpointu dla statystyk czasów odpowiedzi, np. '/pojazdy', '/slowniki'."""
+        path = url[len(self.BASE_URL):] if url.startswith(self.BASE_URL) else url
+        return '/' + path.split('?')[0].strip('/').split('/')[0]
+    
+    def _get_hedge_pool(self) -> ThreadPoolExecutor:
+        with self._hedge_pool_lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(
+                    max_workers=self.pool_size, thread_name_prefix='cepik-hedge'
+                )
+            return self._hedge_pool
+    
+    def _timed_get(self, url: str, params: Optional[Dict], timeout: float, endpoint: str) -> requests.Response:
+        """GET z zapisem czasu odpowiedzi (timeout liczony jako próbka o długości timeoutu)."""
+        start_time = time.time()
+        try:
+            response = self.session.get(url, params=params, timeout=timeout)
+        except requests.exceptions.Timeout:
+            self.latency.count(endpoint, 'timeouts')
+            self.latency.record(endpoint, timeout)
+            raise
+        self.latency.record(endpoint, time.time() - start_time)
+        return response
+    
+    def _hedge_allowed(self, endpoint: str) -> bool:
+        """Zapytanie zapasowe mieści się w limicie udziału hedgingu i w odstępie RateLimiter."""
+        hedged = self.latency.counter(endpoint, 'hedged')
+        if hedged >= self.MAX_HEDGE_RATIO * max(1, self.latency.counter(endpoint, 'requests')):
+            return False
+        return self.rate_limiter.try_acquire()
+    
+    def _send(self, url: str, params: Optional[Dict], timeout: float, endpoint: str) -> requests.Response:
+        """
+        Pojedyncza próba zapytania z hedgingiem: jeśli odpowiedź nie nadeszła w czasie
+        p95 endpointu (od wysłania zapytania), wysyłane jest identyczne zapytanie zapasowe
+        i używana jest ta odpowiedź, która przyjdzie pierwsza.
+        """
+        self.latency.count(endpoint, 'requests')
+        hedge_after = self.latency.quantile(endpoint, self.HEDGE_QUANTILE) if self.hedging else None
+        if hedge_after is None:
+            return self._timed_get(url, params, timeout, endpoint)
         
-        return pd.DataFrame()
+        pool = self._get_hedge_pool()
+        started = threading.Event()
+        
+        def run_primary():
+            started.set()
+            return self._timed_get(url, params, timeout, endpoint)
+        
+        primary = pool.submit(run_primary)
+        # Czas do zapytania zapasowego liczony od faktycznego startu zapytania - oczekiwanie
+        # w kolejce wspólnej puli (wiele sesji) nie wchodzi do p95 z _timed_get, więc nie
+        # może wywoływać zapytań zapasowych akurat wtedy, gdy brakuje połączeń.
+        # Oczekiwanie na start jest ograniczone timeoutem zapytania - gdy pula jest zajęta
+        # dłużej, zapytanie zostaje wycofane z kolejki i wykonane w bieżącym wątku
+        if not started.wait(timeout) and primary.cancel():
+            return self._timed_get(url, params, timeout, endpoint)
+        try:
+            return primary.result(timeout=hedge_after)
+        except FutureTimeoutError:
+            pass
+        
+        if not self._hedge_allowed(endpoint):
+            return primary.result()
+        
+        self.latency.count(endpoint, 'hedged')
+        backup = pool.submit(self._timed_get, url, params, timeout, endpoint)
+        pending = {primary, backup}
+        first_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except requests.exceptions.RequestException as e:
+                    if first_error is None or future is primary:
+                        first_error = e
+                    continue
+                if future is backup:
+                    self.latency.count(endpoint, 'hedge_won')
+                return response
+        raise first_error
+    
+    def _request(
+        self,
+        url: str,
+        params: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        rate_limited: bool = True,
+        on_retry=None
+    ) -> requests.Response:
+        """
+        GET pod wspólnym RateLimiter, z polityką ponawiania i bezpiecznikiem.
+        - 429/503: wstrzymanie wszystkich zapytań (RateLimiter.pause) i ponowienie
+        - 5xx, timeout, błąd połączenia: ponowienie z wykładniczym backoffem i jitterem
+        - pozostałe błędy HTTP (np. 400, 404): zgłaszane od razu
+        Pojedyncza próba może zostać zdublowana zapytaniem zapasowym (patrz _send).
+        
+        Args:
+            url: Adres zapytania
+            params: Parametry zapytania
+            timeout: Limit czasu pojedynczej próby (None = adaptacyjny z historii endpointu)
+            max_retries: Liczba ponowień (None = z retry_policy)
+            rate_limited: Czy zachować minimalny odstęp RateLimiter (False dla lekkich słowników)
+            on_retry: Opcjonalny callback(attempt, reason, delay) wywoływany przed ponowieniem
+        
+        Returns:
+            Odpowiedź z kodem 2xx/3xx
+        
+        Raises:
+            requests.exceptions.RequestException (w tym CircuitOpenError)
+        """
+        policy = self.retry_policy
+        if max_retries is None:
+            max_retries = policy.max_retries
+        endpoint = self._endpoint(url)
+        if timeout is None:
+            timeout = self.latency.timeout_for(endpoint, default=self.DEFAULT_TIMEOUT)
+        
+        attempt = 0
+        trial = 0  # zapytanie próbne bezpiecznika prowadzone przez to wywołanie
+        try:
+            while True:
+                trial = self.circuit_breaker.before_request(trial)
+                if rate_limited:
+                    self.rate_limiter.wait()
+                try:
+                    response = self._send(url, params, timeout, endpoint)
+                except requests.exceptions.RequestException as e:
+                    if not policy.is_retryable_exception(e):
+                        raise
+                    self.circuit_breaker.record_failure()
+                    if attempt >= max_retries:
+                        raise
+                    attempt += 1
+                    delay = policy.delay(attempt)
+                    if on_retry:
+                        on_retry(attempt, type(e).__name__, delay)
+                    time.sleep(delay)
+                    continue
+                
+                status = response.status_code
+                if status in policy.RATE_LIMIT_STATUSES and attempt < max_retries:
+                    # API odpowiada - to nie awaria, tylko ograniczenie tempa
+                    attempt += 1
+                    if on_retry:
+                        on_retry(attempt, f"Rate limit ({status})", policy.rate_limit_pause)
+                    self.rate_limiter.pause(policy.rate_limit_pause)
+                    continue
+                
+                if policy.is_retryable_status(status):
+                    self.circuit_breaker.record_failure()
+                    if attempt < max_retries:
+                        attempt += 1
+                        delay = policy.delay(attempt)
+                        if on_retry:
+                            on_retry(attempt, f"HTTP {status}", delay)
+                        time.sleep(delay)
+                        continue
+                else:
+                    self.circuit_breaker.record_success()
+                
+                response.raise_for_status()
+                return response
+        finally:
+            # Próba zakończona bez wyniku (wyjątek, wyczerpane ponowienia po 429) nie może
+            # blokować bezpiecznika - kolejne zapytanie zostanie nową próbą
+            self.circuit_breaker.release_trial(trial)
+    
+    def _probe_count(self, params: Dict) -> int:
+        """Zwraca meta.count dla zapytania, pobierając tylko jeden rekord (limit=1)."""
+        response = self._request(f"{self.BASE_URL}/pojazdy", dict(params, limit=1, page=1))
+        meta = loads_json(response.content).get('meta') or {}
+        return int(meta.get('count', 0))
+    
+    def count_vehicles(
+        self,
+        date_windows: List[Tuple[str, str]],
+        voivodeship_codes: Optional[List[str]] = None,
+        dictionary_name: Optional[str] = None,
+        values: Optional[List[str]] = None,
+        brand: Optional[str] = None,
+        model: Optional[str] = None,
+        additional_filters: Optional[Dict] = None,
+        max_workers: int = 5
+    ) -> Tuple[pd.DataFrame, List[str]]:
+        """
+        Liczy pojazdy bez pobierania rekordów - tylko próbki meta.count (limit=1).
+        Dla każdej kombinacji (województwo × okno × wartość słownika) wykonywane jest
+        jedno małe zapytanie, równolegle, pod wspólnym RateLimiter.
+        
+        Args:
+            date_windows: Lista okien (data_od, data_do) w formacie YYYYMMDD (patrz split_date_range)
+            voivodeship_codes: Kody województw (None = wszystkie)
+            dictionary_name: Słownik do rozbicia (np. 'marka', 'rodzaj-paliwa'); None = bez rozbicia
+            values: Wartości słownika (None = wszystkie wartości z get_dictionary)
+            brand, model, additional_filters: Stałe filtry API jak w search_vehicles
+            max_workers: Liczba równoległych wątków
+        
+        Returns: (matrix, errors)
+            matrix: DataFrame z indeksem (wojewodztwo, data-od, data-do) i kolumnami
+                    = wartości słownika (lub 'liczba' bez rozbicia); NaN dla nieudanych próbek
+        """
+        if voivodeship_codes is None:
+            voivodeship_codes = list(self.WOJEWODZTWA_KODY.keys())
+        
+        if dictionary_name:
+            if values is None:
+                values = self.get_dictionary(dictionary_name)
+        else:
+            values = [None]
+        
+        def build_params(code, window, value):
+            filters = dict(additional_filters or {})
+            probe_brand, probe_model = brand, model
+            if value is not None:
+                if dictionary_name == 'marka':
+                    probe_brand = value
+                elif dictionary_name == 'model':
+                    probe_model = value
+                else:
+                    filters[dictionary_name] = value
+            return self.build_search_params(
+                code, window[0], window[1], probe_brand, probe_model, filters
+            )
+        
+        def probe(code, window, value):
+            try:
+                return (code, window, value, self._probe_count(build_params(code, window, value)), None)
+            except Exception as e:
+                return (code, window, value, None, str(e)[:80])
+        
+        rows = []
+        errors = []
+        with ThreadPoolExecutor(max_workers=self.worker_count(max_workers)) as executor:
+            futures = [
+                executor.submit(probe, code, window, value)
+                for code in voivodeship_codes
+                for window in date_windows
+                for value in values
+            ]
+            for future in as_completed(futures):
+                code, window, value, count, error = future.result()
+                name = self.WOJEWODZTWA_KODY.get(code, code)
+                if error:
+                    errors.append(f"{name} {window[0]}-{window[1]} {value or ''}: {error}".strip())
+                rows.append({
+                    'wojewodztwo': name,
+                    'data-od': window[0],
+                    'data-do': window[1],
+                    'wartosc': value if value is not None else 'liczba',
+                    'liczba': count
+                })
+        
+        if not rows:
+            return pd.DataFrame(), errors
+        
+        matrix = pd.DataFrame(rows).pivot(
+            index=['wojewodztwo', 'data-od', 'data-do'],
+            columns='wartosc',
+            values='liczba'
+        ).sort_index()
+        matrix.columns.name = dictionary_name
+        return matrix, errors
+    
+    # Parametry szacowania kosztu zapytania
+    MAX_FANOUT_VALUES = 5        # maks. wartości filtra rozbijanych na osobne zapytania API
+    PAGE_LATENCY_ESTIMATE = 1.5  # szacowany czas pobrania jednej strony [s]
+    
+    def plan_query(
+        self,
+        spec: Dict,
+        max_pages: Optional[int] = None,
+        max_workers: int = 5,
+        probe: bool = True
+    ) -> Dict:
+        """
+        Planuje zapytanie: decyduje, które predykaty idą do API jako filter[...],
+        a które są wykonywane lokalnie, oraz szacuje koszt przez próbki meta.count.
+        
+        Args:
+            spec: Pełna specyfikacja zapytania:
+                {'voivodeship_codes': [...] lub 'voivodeship_code': str,
+                 'date_from': 'YYYYMMDD', 'date_to': 'YYYYMMDD',
+                 'brand': str, 'model': str | [str], 'year_from': int, 'year_to': int,
+                 'filters': {kolumna: wartość | [wartości] | (min, max)}}
+            max_pages: Limit stron - powyżej plan jest oznaczany jako 'oversized'
+            max_workers: Równoległość używana do szacowania czasu i próbek
+            probe: False = bez zapytań do API (tylko podział predykatów)
+        
+        Returns:
+            {'queries': [...], 'api_filters': {...}, 'fanout': {...}, 'local_filters': {...},
+             'estimated_count': int, 'pages': int, 'requests': int, 'estimated_seconds': float,
+             'oversized': bool, 'splits': [(od, do), ...], 'summary': str, 'errors': [...]}
+
+        Raises:
+            ValueError: Sprzeczna marka/model w parametrach i w filtrach
+        """
+        codes = spec.get('voivodeship_codes') or (
+            [spec['voivodeship_code']] if spec.get('voivodeship_code') else list(self.WOJEWODZTWA_KODY.keys())
+        )
+        date_from = spec['date_from']
+        date_to = spec['date_to']
+        pushable = DICTIONARY_FILTERS | set(self._dictionaries_cache.keys())
+        
+        api_filters = {}
+        fanout = {}
+        local_filters = {}
+        
+        # Rok produkcji - API nie wspiera, zawsze lokalnie
+        if spec.get('year_from') or spec.get('year_to'):
+            local_filters['rok-produkcji'] = (spec.get('year_from'), spec.get('year_to'))
+        
+        # Marka i model mogą przyjść jako parametr i jako filtr - liczona jest część
+        # wspólna, a sprzeczne wartości są błędem (zamiast cichego pominięcia filtra)
+        filters = dict(spec.get('filters') or {})
+        brand = _merge_filter_values('marka', spec.get('brand'), filters.pop('marka', None))
+        model = _merge_filter_values('model', spec.get('model'), filters.pop('model', None))
+        if isinstance(brand, list):
+            if len(brand) <= self.MAX_FANOUT_VALUES:
+                fanout['marka'] = brand
+            else:
+                local_filters['marka'] = brand
+            brand = None
+        
+        for column, value in filters.items():
+            if value is None or value == [] or value == '':
+                continue
+            if column in pushable and isinstance(value, str):
+                api_filters[column] = value
+            elif column in pushable and isinstance(value, list):
+                if len(value) == 1:
+                    api_filters[column] = value[0]
+                elif len(value) <= self.MAX_FANOUT_VALUES and not fanout:
+                    # API wspiera tylko równość - jedno zapytanie na wartość
+                    fanout[column] = list(value)
+                else:
+                    local_filters[column] = list(value)
+            else:
+                local_filters[column] = value
+        
+        fanout_column, fanout_values = next(iter(fanout.items()), (None, [None]))
+        # Lista modeli (np. z resolve_model) - osobne zapytanie dla każdego modelu
+        models = model if isinstance(model, list) else [model]
+        
+        queries = []
+        for code in codes:
+            for value in fanout_values:
+                filters = dict(api_filters)
+                query_brand = brand
+                if fanout_column == 'marka':
+                    query_brand = value
+                elif fanout_column:
+                    filters[fanout_column] = value
+                for query_model in models:
+                    queries.append({
+                        'voivodeship_code': code,
+                        'date_from': date_from,
+                        'date_to': date_to,
+                        'brand': query_brand,
+                        'model': query_model,
+                        'additional_filters': filters,
+                        'estimated_count': None,
+                        'pages': None
+                    })
+        
+        errors = []
+        if probe:
+            def estimate(query):
+                params = self.build_search_params(
+                    query['voivodeship_code'], date_from, date_to,
+                    query['brand'], query['model'], query['additional_filters']
+                )
+                try:
+                    query['estimated_count'] = self._probe_count(params)
+                    query['pages'] = max(1, math.ceil(query['estimated_count'] / PAGE_LIMIT))
+                except Exception as e:
+                    errors.append(f"{self.WOJEWODZTWA_KODY.get(query['voivodeship_code'], query['voivodeship_code'])}: {str(e)[:80]}")
+            
+            with ThreadPoolExecutor(max_workers=self.worker_count(max_workers)) as executor:
+                list(executor.map(estimate, queries))
+        
+        estimated = [q for q in queries if q['pages'] is not None]
+        estimated_count = sum(q['estimated_count'] for q in estimated)
+        pages = sum(q['pages'] for q in estimated)
+        
+        # Czas: ograniczony przez RateLimiter, równoległość i najdłuższe pojedyncze zapytanie
+        longest = max((q['pages'] for q in estimated), default=0)
+        estimated_seconds = max(
+            pages * self.rate_limiter.min_interval,
+            pages * self.PAGE_LATENCY_ESTIMATE / self.worker_count(max_workers),
+            longest * self.PAGE_LATENCY_ESTIMATE
+        )
+        
+        oversized = bool(max_pages and pages > max_pages)
+        splits = []
+        if oversized:
+            # Podział okresu na mniejsze okna o zbliżonej liczbie stron
+            n_splits = math.ceil(pages / max_pages)
+            start = datetime.strptime(date_from, "%Y%m%d")
+            end = datetime.strptime(date_to, "%Y%m%d")
+            days = (end - start).days + 1
+            step = max(1, math.ceil(days / n_splits))
+            while start <= end:
+                window_end = min(start + timedelta(days=step - 1), end)
+                splits.append((start.strftime("%Y%m%d"), window_end.strftime("%Y%m%d")))
+                start = window_end + timedelta(days=1)
+        
+        if estimated_seconds >= 90:
+            time_text = f"~{round(estimated_seconds / 60)} min"
+        else:
+            time_text = f"~{max(1, round(estimated_seconds))} s"
+        summary = f"~{pages} stron, {time_text}" if probe else "brak oszacowania"
+        
+        return {
+            'queries': queries,
+            'api_filters': api_filters,
+            'fanout': fanout,
+            'local_filters': local_filters,
+            'estimated_count': estimated_count,
+            'pages': pages,
+            'requests': pages + (len(queries) if probe else 0),
+            'estimated_seconds': estimated_seconds,
+            'oversized': oversized,
+            'splits': splits,
+            'summary': summary,
+            'errors': errors
+        }
+    
+    def apply_local_filters(self, df: pd.DataFrame, local_filters: Dict) -> pd.DataFrame:
+        """
+        Stosuje predykaty lokalne z planu (plan_query) do DataFrame.
+        Wartość: (min, max) = zakres, lista = przynależność, pozostałe = równość.
+        """
+        if df.empty or not local_filters:
+            return df
+        
+        # Filtry na kolumnach spoza DataFrame są pomijane
+        where = filters_predicate({c: v for c, v in local_filters.items() if c in df.columns})
+        if where is None:
+            return df
+        return df[where.mask(df)]
+    
+    def execute_plan(
+        self,
+        plan: Dict,
+        columns: Optional[List[str]] = None,
+        max_workers: int = 5,
+        progress_callback=None
+    ) -> Tuple[pd.DataFrame, List[str]]:
+        """
+        Wykonuje plan z plan_query: zapytania API równolegle (kolumnowo), predykaty
+        lokalne liczone na każdej stronie, deduplikacja po ID.
+        
+        Args:
+            progress_callback: callback(strony, meta.count, pobrane) - sumy dla wszystkich
+                zapytań planu, wywoływany z wątku wywołującego (bezpieczny dla UI)
+        
+        Returns: (DataFrame, errors)
+        """
+        if columns is not None:
+            columns = list(columns) + [c for c in plan['local_filters'] if c not in columns]
+        
+        # Predykaty na kolumnach zmienianych przez _postprocess_dataframe liczone są
+        # dopiero na gotowym DataFrame, pozostałe już na stronach API
+        page_filters = {c: v for c, v in plan['local_filters'].items() if c not in POSTPROCESSED_COLUMNS}
+        frame_filters = {c: v for c, v in plan['local_filters'].items() if c in POSTPROCESSED_COLUMNS}
+        where = filters_predicate(page_filters)
+        progress = {}  # nr zapytania -> (strona, meta.count, pobrane)
+        
+        def run(number, query):
+            def on_progress(page, total, fetched):
+                progress[number] = (page, total, fetched)
+            
+            result = self.search_vehicles_columnar(
+                voivodeship_code=query['voivodeship_code'],
+                date_from=query['date_from'],
+                date_to=query['date_to'],
+                brand=query['brand'],
+                model=query['model'],
+                additional_filters=query['additional_filters'],
+                columns=columns,
+                progress_callback=on_progress if progress_callback else None,
+                where=where
+            )
+            return query, result
+        
+        frames = []
+        errors = []
+        with ThreadPoolExecutor(max_workers=self.worker_count(max_workers)) as executor:
+            futures = [executor.submit(run, number, query) for number, query in enumerate(plan['queries'])]
+            pending = set(futures)
+            reported = None
+            while pending:
+                _, pending = wait(pending, timeout=self.PROGRESS_INTERVAL)
+                states = list(progress.values())
+                if progress_callback and states and states != reported:
+                    reported = states
+                    progress_callback(*(sum(state[i] for state in states) for i in range(3)))
+            
+            for future in futures:
+                query, result = future.result()
+                if 'error' in result:
+                    errors.append(f"{self.WOJEWODZTWA_KODY.get(query['voivodeship_code'], query['voivodeship_code'])}: {result['error']}")
+                elif result['columns'].get('id'):
+                    frames.append(self.columns_to_dataframe(result['columns']))
+        
+        if not frames:
+            return pd.DataFrame(), errors
+        
+        df = self.categories.concat(frames, ignore_index=True).drop_duplicates(subset='id')
+        return self.apply_local_filters(df, frame_filters).reset_index(drop=True), errors
     
     def search_all_voivodeships_parallel(
         self,
@@ -468,11 +2423,6 @@ class CepikAPI:
         rate_limit_lock = threading.Lock()
         statuses = {}  # Szczegółowe statusy dla każdego województwa
         
-        # Throttling - minimalny odstęp między zapytaniami
-        last_request_time = {'time': 0}
-        request_lock = threading.Lock()
-        MIN_REQUEST_INTERVAL = 0.5  # sekund między zapytaniami
-        
         def check_rate_limit(response):
             """Sprawdź czy API zwróciło błąd rate limiting"""
             try:
@@ -511,27 +2461,25 @@ class CepikAPI:
                 with rate_limit_lock:
                     statuses[code]['status'] = '🔄 Pobieranie...'
                 
+                def on_retry(attempt, reason, delay):
+                    with rate_limit_lock:
+                        statuses[code]['status'] = (
+                            f'⚠️ {reason} - ponowienie {attempt}/{self.retry_policy.max_retries} za {delay:.0f}s...'
+                        )
+                        if reason.startswith('Rate limit'):
+                            for c in statuses:
+                                if c != code and statuses[c]['status'] not in ['✅ Ukończono', '❌ Błąd']:
+                                    statuses[c]['status'] = '⏸️ Wstrzymano (rate limit)'
+                
                 # Własna implementacja z obsługą rate limiting
                 url = f"{self.BASE_URL}/pojazdy"
-                params = {
-                    'wojewodztwo': code,
-                    'data-od': date_from,
-                    'data-do': date_to,
-                    'limit': 500,
-                    'page': 1
-                }
-                
-                if brand:
-                    params['filter[marka]'] = brand.upper()
-                if model:
-                    params['filter[model]'] = model.upper()
-                if additional_filters:
-                    for key, value in additional_filters.items():
-                        if value and key not in ['marka', 'model']:
-                            params[f'filter[{key}]'] = value.upper() if isinstance(value, str) else value
+                params = self.build_search_params(
+                    code, date_from, date_to, brand, model, additional_filters
+                )
                 
                 vehicles_data = []
                 current_page = 1
+                where = year_predicate(year_from, year_to)
                 
                 while True:
                     params['page'] = current_page
@@ -539,18 +2487,10 @@ class CepikAPI:
                     # Czekaj jeśli jest rate limit
                     rate_limit_event.wait()
                     
-                    # Throttling - odczekaj minimalny czas od ostatniego zapytania
-                    with request_lock:
-                        current_time = time.time()
-                        time_since_last = current_time - last_request_time['time']
-                        if time_since_last < MIN_REQUEST_INTERVAL:
-                            sleep_time = MIN_REQUEST_INTERVAL - time_since_last
-                            time.sleep(sleep_time)
-                        last_request_time['time'] = time.time()
+                    # Zapytanie z ponawianiem strony (backoff, 429/503, bezpiecznik) - patrz _request
+                    response = self._request(url, params, on_retry=on_retry)
                     
-                    response = self.session.get(url, params=params, timeout=30)
-                    
-                    # Sprawdź rate limiting
+                    # Sprawdź rate limiting (nagłówek X-RateLimit-Remaining)
                     if check_rate_limit(response):
                         with rate_limit_lock:
                             if rate_limit_event.is_set():  # Tylko pierwszy wątek blokuje
@@ -576,7 +2516,8 @@ class CepikAPI:
                     result = response.json()
                     
                     if 'data' in result and result['data']:
-                        vehicles_data.extend(result['data'])
+                        # Lokalne filtrowanie po roku produkcji (API nie wspiera) - od razu na stronie
+                        vehicles_data.extend(filter_vehicles(result['data'], where))
                         
                         with rate_limit_lock:
                             statuses[code]['count'] = len(vehicles_data)
@@ -589,22 +2530,6 @@ class CepikAPI:
                     else:
                         break
                 
-                # Lokalne filtrowanie po roku produkcji (API nie wspiera)
-                if year_from or year_to:
-                    filtered_vehicles = []
-                    for v in vehicles_data:
-                        if 'attributes' in v and 'rok-produkcji' in v['attributes']:
-                            try:
-                                year = int(v['attributes']['rok-produkcji'])
-                                if year_from and year < year_from:
-                                    continue
-                                if year_to and year > year_to:
-                                    continue
-                                filtered_vehicles.append(v)
-                            except (ValueError, TypeError):
-                                continue
-                    vehicles_data = filtered_vehicles
-                
                 elapsed = time.time() - start_time
                 with rate_limit_lock:
                     statuses[code]['status'] = '✅ Ukończono'
@@ -658,36 +2583,201 @@ class CepikAPI:
             progress_callback(statuses.copy())
         
         # Wykonaj równolegle
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            futures = {executor.submit(fetch_voivodeship, code): code for code in voiv_codes}
+        with ThreadPoolExecutor(max_workers=self.worker_count(5)) as executor:
+            pending = {executor.submit(fetch_voivodeship, code) for code in voiv_codes}
+            throttle = ProgressThrottle(self.PROGRESS_INTERVAL)
             
-            # Użyj as_completed() BEZ timeout dla lepszej wydajności
-            completed_count = 0
-            total_count = len(futures)
-            last_ui_update = time.time()
-            UI_UPDATE_INTERVAL = 2.0  # aktualizuj UI co 2s (jeśli nic się nie zakończyło)
-            
-            for future in as_completed(futures):
-                code, vehicles, error = future.result()
+            while pending:
+                # Budź się co PROGRESS_INTERVAL także wtedy, gdy nic się nie zakończyło,
+                # żeby UI pokazywało postęp stron
+                done, pending = wait(pending, timeout=self.PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
                 
-                if error:
-                    errors.append(f"{self.WOJEWODZTWA_KODY.get(code, code)}: {error}")
-                
-                if vehicles:
-                    # Deduplicacja między województwami
-                    for vehicle in vehicles:
-                        vehicle_id = vehicle.get('id')
-                        if vehicle_id and vehicle_id not in seen_ids:
-                            seen_ids.add(vehicle_id)
-                            all_vehicles.append(vehicle)
-                
-                completed_count += 1
+                for future in done:
+                    code, vehicles, error = future.result()
+                    
+                    if error:
+                        errors.append(f"{self.WOJEWODZTWA_KODY.get(code, code)}: {error}")
+                    
+                    if vehicles:
+                        # Deduplikacja między województwami
+                        for vehicle in vehicles:
+                            vehicle_id = vehicle.get('id')
+                            if vehicle_id and vehicle_id not in seen_ids:
+                                seen_ids.add(vehicle_id)
+                                all_vehicles.append(vehicle)
                 
-                # Aktualizuj UI po każdym zakończonym województwie
-                # (wywołane z głównego wątku, nie z osobnego wątku)
-                if progress_callback:
+                # Aktualizuj UI z głównego wątku; pod blokadą tylko kopia statusów,
+                # renderowanie poza nią - wątki pobierające nie czekają na UI
+                if progress_callback and throttle.due(final=not pending):
                     with rate_limit_lock:
-                        progress_callback(statuses.copy())
-                    last_ui_update = time.time()
+                        snapshot = {c: dict(s) for c, s in statuses.items()}
+                    progress_callback(snapshot)
         
         return all_vehicles, errors, statuses
+    
+    def search_all_voivodeships_columnar(
+        self,
+        date_from: str,
+        date_to: str,
+        brand: Optional[str] = None,
+        model: Optional[Union[str, List[str]]] = None,
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None,
+        progress_callback=None,
+        additional_filters: Optional[Dict] = None,
+        columns: Optional[List[str]] = None,
+        max_workers: int = 5,
+        where: Optional[Predicate] = None,
+        plan: Optional[Dict] = None
+    ) -> Tuple[pd.DataFrame, List[str], Dict]:
+        """
+        Kolumnowy odpowiednik search_all_voivodeships_parallel.
+        Pobieranie jest dzielone na shardy: pierwsza strona każdego województwa (i modelu)
+        podaje meta.count, a pozostałe strony trafiają do zakresów po SHARD_PAGES stron
+        rozdzielanych przez ShardScheduler - duże województwa nie zostają na koniec
+        pobierane przez jeden wątek. Wątki tylko pobierają strony; dekodowanie, projekcja
+        kolumn i filtr roku odbywają się w procesach dekodujących (gdy decode_workers > 0),
+        a deduplikacja jest wektorowa (drop_duplicates) zamiast pętli po pojazdach.
+        
+        Args:
+            model: Model lub lista modeli (zapytanie per model w każdym województwie)
+            where: Predykat lokalny (Col(...)) stosowany do każdej strony przed zapisaniem
+            plan: Plan z plan_query - shardy startują z jego zapytań ('queries'), a jego
+                'local_filters' są liczone lokalnie; bez planu jest on budowany (probe=False)
+                z marki, modelu, roku i additional_filters, jak w execute_plan
+        
+        Returns: (DataFrame, errors, statuses_dict) - statusy jak w search_all_voivodeships_parallel
+        """
+        if plan is None:
+            plan = self.plan_query({
+                'voivodeship_codes': list(self.WOJEWODZTWA_KODY.keys()),
+                'date_from': date_from,
+                'date_to': date_to,
+                'brand': brand,
+                'model': model,
+                'year_from': year_from,
+                'year_to': year_to,
+                'filters': additional_filters
+            }, probe=False)
+        
+        queries = plan['queries']
+        voiv_codes = list(dict.fromkeys(query['voivodeship_code'] for query in queries))
+        workers = self.worker_count(max_workers)
+        
+        if columns is not None:
+            columns = list(columns) + [c for c in plan['local_filters'] if c not in columns]
+        # Jak w execute_plan: kolumny zmieniane przez _postprocess_dataframe filtrowane na końcu
+        page_filters = {c: v for c, v in plan['local_filters'].items() if c not in POSTPROCESSED_COLUMNS}
+        frame_filters = {c: v for c, v in plan['local_filters'].items() if c in POSTPROCESSED_COLUMNS}
+        where = all_of(where, filters_predicate(page_filters))
+        
+        # Wątki tylko wysyłają zdarzenia; UI dostaje zbiorcze migawki z wątku głównego
+        progress = ProgressStream(
+            {code: self.WOJEWODZTWA_KODY.get(code, code) for code in voiv_codes},
+            interval=self.PROGRESS_INTERVAL
+        )
+        scheduler = ShardScheduler(workers)
+        lock = threading.Lock()
+        pages = {}        # (kod, nr zapytania, strona) -> DataFrame
+        remaining = {}    # kod -> liczba niedokończonych shardów
+        failed = {}       # kod -> komunikat błędu
+        
+        def push(worker, shard):
+            with lock:
+                remaining[shard['code']] = remaining.get(shard['code'], 0) + 1
+            scheduler.push(worker, shard)
+        
+        def finish(code, error=None):
+            with lock:
+                remaining[code] -= 1
+                if error and code not in failed:
+                    failed[code] = error
+                    progress.fail(code, error)
+                elif remaining[code] == 0 and code not in failed:
+                    progress.done(code)
+        
+        def run_shard(worker, shard):
+            code = shard['code']
+            if code in failed:
+                return
+            if shard['start'] == 1 and shard['query_index'] == 0:
+                progress.start(code)
+            
+            def on_retry(attempt, reason, delay):
+                progress.status(
+                    code, f'⚠️ {reason} - ponowienie {attempt}/{self.retry_policy.max_retries} za {delay:.0f}s...'
+                )
+            
+            query = queries[shard['query']]
+            params = self.build_search_params(
+                code, query['date_from'], query['date_to'], query['brand'], query['model'],
+                query['additional_filters']
+            )
+            params['page'] = shard['start']
+            chunk = None
+            for chunk in self.iter_vehicle_pages(
+                params, columns, where=where, on_retry=on_retry, stop_page=shard['stop']
+            ):
+                if code in failed:
+                    return  # Inny shard województwa się nie powiódł - wynik i tak jest odrzucany
+                if chunk['rows']:
+                    frame = chunk_to_dataframe(chunk)
+                    with lock:
+                        pages[(code, shard['query'], chunk['page'])] = frame
+                progress.page(code, chunk['rows'])
+            
+            if shard['start'] == 1 and chunk is not None:
+                # Pierwsza strona zna meta.count - reszta stron dzielona na shardy,
+                # które mogą przejąć wolne wątki; ostatni shard czyta do końca wyników
+                last_page = max(2, math.ceil(chunk['total_count'] / int(params.get('limit', PAGE_LIMIT))))
+                progress.expect(code, last_page if chunk['has_next'] else 1)
+                if chunk['has_next']:
+                    for first in range(2, last_page + 1, self.SHARD_PAGES):
+                        stop = first + self.SHARD_PAGES - 1
+                        push(worker, dict(shard, start=first, stop=stop if stop < last_page else None))
+        
+        def fetch_worker(worker):
+            while True:
+                shard = scheduler.get(worker)
+                if shard is None:
+                    return
+                error = None
+                try:
+                    run_shard(worker, shard)
+                except requests.exceptions.Timeout:
+                    error = "Timeout"
+                except requests.exceptions.RequestException as e:
+                    error = f"Błąd połączenia: {str(e)[:50]}"
+                except Exception as e:
+                    error = f"Błąd: {str(e)[:50]}"
+                finally:
+                    finish(shard['code'], error)
+                    scheduler.task_done()
+        
+        # Pierwsze strony zapytań planu (meta.count) rozdzielone między wątki;
+        # query_index numeruje zapytania w obrębie województwa
+        query_counts = {}
+        for number, query in enumerate(queries):
+            code = query['voivodeship_code']
+            query_counts[code] = query_counts.get(code, 0) + 1
+            push(number % workers, {
+                'code': code, 'query': number, 'query_index': query_counts[code] - 1, 'start': 1, 'stop': 1
+            })
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(fetch_worker, worker) for worker in range(workers)]
+            progress.pump(futures, progress_callback)
+            for future in futures:
+                future.result()
+        
+        errors = [f"{self.WOJEWODZTWA_KODY.get(code, code)}: {error}" for code, error in failed.items()]
+        frames = [frame for key, frame in sorted(pages.items()) if key[0] not in failed]
+        statuses = progress.snapshot()
+        
+        if not frames:
+            return pd.DataFrame(), errors, statuses
+        
+        df = pd.concat(frames, ignore_index=True)
+        df = df.drop_duplicates(subset='id', ignore_index=True)  # Deduplikacja między województwami
+        df = self.apply_local_filters(self._postprocess_dataframe(df), frame_filters)
+        return df.reset_index(drop=True), errors, statuses
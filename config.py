@@ -2,6 +2,7 @@
 Plik konfiguracyjny dla aplikacji CEPiK
 """
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Wczytanie zmiennych środowiskowych z pliku .env
@@ -18,6 +19,55 @@ STREAMLIT_SERVER_ADDRESS = os.getenv("STREAMLIT_SERVER_ADDRESS", "localhost")
 DEFAULT_LIMIT = 500
 DEFAULT_PAGE = 1
 
+# Limit wielkości pojedynczego zapytania (strony po 500 rekordów) - większe
+# zapytania są odrzucane przez planer z propozycją podziału okresu
+MAX_QUERY_PAGES = int(os.getenv("MAX_QUERY_PAGES", 2000))
+
+# Maksymalna liczba modeli, na które rozwijany jest wpisany model (dopasowanie
+# prefiksowe/przybliżone) - każdy model to osobne zapytanie w każdym województwie
+MODEL_FANOUT = int(os.getenv("MODEL_FANOUT", 5))
+
+# Liczba procesów dekodujących strony API (0 = dekodowanie w wątkach pobierających)
+DECODE_WORKERS = int(os.getenv("DECODE_WORKERS", 0))
+
+# Maksymalna liczba równoległych zapytań do API (rozmiar puli połączeń) oraz liczba
+# połączeń otwieranych z wyprzedzeniem przy starcie aplikacji (0 = bez rozgrzewania)
+MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", 16))
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", 4))
+
+# Ponawianie zapytań (liczba ponowień strony, backoff [s]) oraz bezpiecznik API
+# (liczba kolejnych błędów otwierająca bezpiecznik, czas do zapytania próbnego [s])
+RETRY_MAX = int(os.getenv("RETRY_MAX", 4))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", 0.5))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", 20))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", 8))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", 30))
+
+# Zapytanie zapasowe (hedging) dla stron odpowiadających wolniej niż p95
+HEDGING = os.getenv("HEDGING", "1") != "0"
+
+# Zbiory danych współdzielone między sesjami (liczba zbiorów, ważność do ponownego użycia [s])
+SHARED_DATASETS_MAX = int(os.getenv("SHARED_DATASETS_MAX", 20))
+SHARED_DATASETS_TTL = int(os.getenv("SHARED_DATASETS_TTL", 3600))
+
+# Katalog nazwanych migawek danych (Arrow IPC)
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+
+# Szybki start: słowniki z migawki na dysku (odświeżane w tle, gdy starsze niż
+# DICTIONARY_MAX_AGE [s]), poziom logowania (DEBUG loguje każde połączenie HTTP)
+# oraz wyświetlanie profilu startu procesu w pasku bocznym
+FAST_START = os.getenv("FAST_START", "1") != "0"
+DICTIONARY_SNAPSHOT = os.getenv("DICTIONARY_SNAPSHOT", os.path.join(SNAPSHOT_DIR, "slowniki.json"))
+DICTIONARY_MAX_AGE = int(os.getenv("DICTIONARY_MAX_AGE", 86400))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING").upper()
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "0") != "0"
+
+# Budżety pamięci pobranych danych [MB] - po przekroczeniu najdawniej używane
+# zbiory są zrzucane na dysk (SPILL_DIR) i wczytywane na żądanie
+MEMORY_BUDGET_MB = int(os.getenv("MEMORY_BUDGET_MB", 1024))
+SESSION_MEMORY_BUDGET_MB = int(os.getenv("SESSION_MEMORY_BUDGET_MB", 256))
+SPILL_DIR = os.getenv("SPILL_DIR", os.path.join(tempfile.gettempdir(), "brona_spill"))
+
 # Zakres lat
 MIN_YEAR = 1900
 MAX_YEAR = 2030
@@ -43,3 +93,7 @@ VOIVODESHIPS = [
 ]
 
 
+
+# Tabela wyników: rozmiary strony do wyboru (do przeglądarki trafia tylko bieżąca strona)
+TABLE_PAGE_SIZES = [25, 50, 100, 250, 500]
+TABLE_PAGE_SIZE = int(os.getenv("TABLE_PAGE_SIZE", 50))
@@ -0,0 +1,484 @@
+"""
+Współdzielone zbiory danych dla wszystkich sesji Streamlit.
+Pobrany zbiór jest przechowywany raz na proces (niezmienny), a sesje trzymają
+tylko lekkie uchwyty. Pamięć rośnie z liczbą różnych zbiorów, a nie użytkowników.
+Nazwane migawki zbiorów zapisywane są na dysku w formacie Arrow IPC.
+Po przekroczeniu budżetu pamięci najdawniej używane zbiory są zrzucane na dysk.
+Słowniki API (województwa, marki, ...) trzymane są w migawce JSON, aby nowy
+proces renderował pasek boczny bez czekania na API.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow as pa  # Opcjonalny - migawki w formacie Arrow IPC (Feather v2)
+except ImportError:
+    pa = None
+
+
+def write_arrow_file(path: str, frame: pd.DataFrame, metadata: Optional[Dict[bytes, bytes]] = None):
+    """Zapisuje DataFrame jako nieskompresowany plik Arrow IPC (atomowo)."""
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    if metadata:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+    
+    tmp_path = path + '.tmp'
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def read_arrow_file(path: str) -> Tuple[pd.DataFrame, Dict[bytes, bytes]]:
+    """
+    Otwiera plik Arrow IPC przez mmap. Kolumny są typu pd.ArrowDtype i wskazują
+    bezpośrednio na zmapowany plik (bez kopiowania na stertę). Kolumny słownikowe
+    (kategoryczne) wracają jako pd.Categorical - kopiowane są tylko małe kody.
+    """
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    frame = table.to_pandas(types_mapper=lambda t: None if pa.types.is_dictionary(t) else pd.ArrowDtype(t))
+    return frame, dict(table.schema.metadata or {})
+
+
+def query_fingerprint(params: Dict) -> str:
+    """Stabilny odcisk zapytania (kolejność kluczy nie ma znaczenia)."""
+    payload = json.dumps(params, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class DatasetHandle:
+    """
+    Lekki uchwyt sesji do zbioru w DatasetRegistry.
+    Zwalnia referencję przy release() lub automatycznie, gdy sesja zostanie usunięta.
+    """
+
+    def __init__(self, registry: 'DatasetRegistry', key, created: float = 0.0):
+        self.key = key
+        # Wersja zbioru: ten sam klucz po usunięciu z rejestru i ponownym pobraniu
+        # oznacza inny DataFrame - indeksy i wyniki liczone dla zbioru kluczuje się wersją
+        self.version = (key, created)
+        self._registry = registry
+        self._finalizer = weakref.finalize(self, registry.release, key, created)
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """Współdzielony DataFrame - tylko do odczytu (filtrowanie tworzy nowe obiekty)."""
+        return self._registry.frame(self.key, self.version[1])
+
+    @property
+    def meta(self) -> Dict:
+        return self._registry.meta(self.key, self.version[1])
+
+    @property
+    def released(self) -> bool:
+        return not self._finalizer.alive
+
+    def release(self):
+        """Zwalnia referencję (wielokrotne wywołanie jest bezpieczne)."""
+        self._finalizer()
+
+
+class DatasetRegistry:
+    """
+    Rejestr zbiorów danych kluczowany odciskiem zapytania.
+    Liczy referencje uchwytów i usuwa najdawniej używane zbiory bez referencji (LRU).
+    Zbiór starszy niż ttl nie jest już wydawany nowym sesjom; jeśli ma jeszcze uchwyty,
+    jest wycofywany (dostępny tylko dla nich) i zwalniany po ostatnim release().
+    
+    Rozlicza pamięć zbiorów; po przekroczeniu budżetu najdawniej używane zbiory
+    są zrzucane na dysk. Z pyarrow zrzucony zbiór zostaje zastąpiony widokiem mmap
+    na plik (strony wczytywane przez system na żądanie), bez pyarrow jest zapisywany
+    przez pickle i wczytywany ponownie przy pierwszym dostępie.
+    """
+
+    def __init__(
+        self,
+        max_datasets: int = 20,
+        ttl: Optional[float] = 3600,
+        memory_budget: Optional[int] = None,
+        spill_dir: Optional[str] = None
+    ):
+        """
+        Args:
+            max_datasets: Maksymalna liczba przechowywanych zbiorów
+            ttl: Czas ważności zbioru do ponownego użycia przez acquire() [s] (None = bez limitu)
+            memory_budget: Budżet pamięci wszystkich zbiorów [B] (None = bez limitu)
+            spill_dir: Katalog plików zrzutu (wymagany do zrzucania)
+        """
+        self.max_datasets = max_datasets
+        self.ttl = ttl
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        # key -> {'frame', 'meta', 'refs', 'created', 'nbytes', 'on_disk', 'spill_path'}
+        self._entries = OrderedDict()
+        # (key, created) -> wpis wycofany po ttl, trzymany do zwolnienia ostatniego uchwytu
+        self._retired = {}
+        self._lock = threading.RLock()
+
+    def _entry(self, key, created: Optional[float] = None) -> Dict:
+        """Wpis zbioru: bieżący pod kluczem albo wycofany o danym czasie rejestracji."""
+        entry = self._entries.get(key)
+        if entry is not None and (created is None or entry['created'] == created):
+            return entry
+        return self._retired[(key, created)]
+
+    def _expire(self, key) -> bool:
+        """
+        Usuwa z wydawania zbiór starszy niż ttl (niezależnie od liczby referencji).
+        Zwraca True, jeśli zbiór wygasł.
+        """
+        entry = self._entries.get(key)
+        if entry is None or self.ttl is None or time.time() - entry['created'] <= self.ttl:
+            return False
+        del self._entries[key]
+        if entry['refs'] > 0:
+            self._retired[(key, entry['created'])] = entry
+        else:
+            self._remove_spill_file(entry)
+        return True
+
+    def acquire(self, key) -> Optional[DatasetHandle]:
+        """Zwraca uchwyt do istniejącego, aktualnego zbioru lub None."""
+        with self._lock:
+            if self._expire(key):
+                return None
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry['refs'] += 1
+            self._entries.move_to_end(key)
+        return DatasetHandle(self, key, entry['created'])
+
+    def put(self, key, frame: pd.DataFrame, meta: Optional[Dict] = None, on_disk: bool = False) -> DatasetHandle:
+        """
+        Rejestruje zbiór i zwraca uchwyt. Jeśli zbiór o tym kluczu już istnieje,
+        zwracany jest uchwyt do istniejącego (nowy DataFrame jest porzucany).
+        on_disk=True oznacza zbiór zmapowany z pliku (np. migawkę) - nie liczy się do pamięci RAM.
+        """
+        with self._lock:
+            self._expire(key)
+            if key not in self._entries:
+                self._entries[key] = {
+                    'frame': frame,
+                    'meta': dict(meta or {}),
+                    'refs': 0,
+                    'created': time.time(),
+                    'nbytes': int(frame.memory_usage(index=True, deep=True).sum()),
+                    'on_disk': on_disk,
+                    'spill_path': None
+                }
+            entry = self._entries[key]
+            entry['refs'] += 1
+            self._entries.move_to_end(key)
+            self._evict()
+            self.enforce_budget(self.memory_budget, keep={key})
+        return DatasetHandle(self, key, entry['created'])
+
+    def get_or_create(self, key, factory: Callable[[], pd.DataFrame], meta: Optional[Dict] = None) -> DatasetHandle:
+        """Uchwyt do istniejącego zbioru albo zbioru utworzonego przez factory()."""
+        handle = self.acquire(key)
+        if handle is not None:
+            return handle
+        return self.put(key, factory(), meta)
+
+    def release(self, key, created: Optional[float] = None):
+        """Zmniejsza licznik referencji (wywoływane przez DatasetHandle)."""
+        with self._lock:
+            try:
+                entry = self._entry(key, created)
+            except KeyError:
+                return
+            if entry['refs'] > 0:
+                entry['refs'] -= 1
+            if entry['refs'] == 0 and self._retired.get((key, entry['created'])) is entry:
+                # Ostatni uchwyt wycofanego zbioru
+                self._remove_spill_file(self._retired.pop((key, entry['created'])))
+            self._evict()
+
+    def frame(self, key, created: Optional[float] = None) -> pd.DataFrame:
+        with self._lock:
+            entry = self._entry(key, created)
+            if self._entries.get(key) is entry:
+                self._entries.move_to_end(key)
+            if entry['frame'] is None:
+                # Zbiór zrzucony przez pickle - wczytaj ponownie
+                entry['frame'] = pd.read_pickle(entry['spill_path'])
+                entry['on_disk'] = False
+                self._remove_spill_file(entry)
+                self.enforce_budget(self.memory_budget, keep={key})
+            return entry['frame']
+
+    def meta(self, key, created: Optional[float] = None) -> Dict:
+        with self._lock:
+            return self._entry(key, created)['meta']
+
+    def _evict(self):
+        """Usuwa najdawniej używane zbiory bez referencji powyżej limitu."""
+        if len(self._entries) <= self.max_datasets:
+            return
+        for key in list(self._entries.keys()):
+            if len(self._entries) <= self.max_datasets:
+                break
+            if self._entries[key]['refs'] == 0:
+                self._remove_spill_file(self._entries.pop(key))
+
+    def _remove_spill_file(self, entry: Dict):
+        if entry['spill_path']:
+            try:
+                os.remove(entry['spill_path'])
+            except OSError:
+                pass
+            entry['spill_path'] = None
+
+    def spill(self, key) -> bool:
+        """
+        Zrzuca zbiór na dysk i zwalnia jego pamięć. Zwraca True jeśli zrzucono.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['on_disk'] or not self.spill_dir:
+                return False
+            
+            os.makedirs(self.spill_dir, exist_ok=True)
+            base_path = os.path.join(self.spill_dir, query_fingerprint({'key': key, 'created': entry['created']}))
+            try:
+                if pa is not None:
+                    entry['spill_path'] = base_path + '.arrow'
+                    write_arrow_file(entry['spill_path'], entry['frame'])
+                    entry['frame'], _ = read_arrow_file(entry['spill_path'])
+                else:
+                    entry['spill_path'] = base_path + '.pkl'
+                    entry['frame'].to_pickle(entry['spill_path'])
+                    entry['frame'] = None
+            except Exception as e:
+                print(f"Błąd zrzutu zbioru na dysk: {e}")
+                self._remove_spill_file(entry)
+                return False
+            entry['on_disk'] = True
+            return True
+
+    def enforce_budget(self, budget: Optional[int], keys=None, keep=()) -> int:
+        """
+        Zrzuca najdawniej używane zbiory (opcjonalnie tylko spośród keys),
+        dopóki pamięć zbiorów w RAM przekracza budżet. Zbiory z keep są pomijane.
+        
+        Returns:
+            Liczba zrzuconych zbiorów
+        """
+        if not budget or not self.spill_dir:
+            return 0
+        
+        spilled = 0
+        with self._lock:
+            candidates = [k for k in self._entries if (keys is None or k in keys) and k not in keep]
+            for key in candidates:
+                if self.memory_usage(keys)['memory'] <= budget:
+                    break
+                if self.spill(key):
+                    spilled += 1
+        return spilled
+
+    def memory_usage(self, keys=None) -> Dict:
+        """
+        Pamięć zbiorów (wszystkich lub tylko z keys): 'memory' - w RAM,
+        'spilled' - na dysku (zrzucone lub zmapowane migawki), 'datasets' - liczba zbiorów.
+        """
+        with self._lock:
+            entries = [e for k, e in self._entries.items() if keys is None or k in keys]
+            entries += [e for (k, _), e in self._retired.items() if keys is None or k in keys]
+            return {
+                'memory': sum(e['nbytes'] for e in entries if not e['on_disk']),
+                'spilled': sum(e['nbytes'] for e in entries if e['on_disk']),
+                'datasets': len(entries)
+            }
+
+    def stats(self) -> Dict:
+        """Statystyki rejestru: liczba zbiorów, referencji i szacowana pamięć."""
+        with self._lock:
+            usage = self.memory_usage()
+            return {
+                'datasets': len(self._entries) + len(self._retired),
+                'references': sum(e['refs'] for e in list(self._entries.values()) + list(self._retired.values())),
+                'nbytes': usage['memory'] + usage['spilled'],
+                'memory': usage['memory'],
+                'spilled': usage['spilled']
+            }
+
+
+class SnapshotStore:
+    """
+    Nazwane migawki zbiorów danych na dysku (Arrow IPC / Feather v2, bez kompresji).
+    Odczyt jest mapowany w pamięci (mmap) - dane nie są kopiowane na stertę,
+    więc nawet duża migawka otwiera się natychmiast.
+    """
+
+    EXTENSION = '.arrow'
+    METADATA_KEY = b'brona'
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    @property
+    def available(self) -> bool:
+        """Migawki wymagają pakietu pyarrow."""
+        return pa is not None
+
+    def _path(self, name: str) -> str:
+        safe_name = re.sub(r'[^0-9A-Za-z_.-]+', '_', name.strip()).strip('._')
+        if not safe_name:
+            raise ValueError("Nieprawidłowa nazwa migawki")
+        return os.path.join(self.directory, safe_name + self.EXTENSION)
+
+    def save(self, name: str, frame: pd.DataFrame, params: Optional[Dict] = None) -> str:
+        """
+        Zapisuje DataFrame (wraz z _batch_id) i parametry wyszukiwania jako migawkę.
+        Zapis jest atomowy (plik tymczasowy + zamiana nazwy).
+        
+        Returns:
+            Ścieżka pliku migawki
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(name)
+        
+        info = {'name': name, 'created': time.time(), 'rows': len(frame), 'params': params or {}}
+        write_arrow_file(path, frame, {
+            self.METADATA_KEY: json.dumps(info, default=str, ensure_ascii=False).encode('utf-8')
+        })
+        return path
+
+    def load(self, name: str) -> Tuple[pd.DataFrame, Dict]:
+        """
+        Otwiera migawkę przez mmap. Kolumny są typu pd.ArrowDtype i wskazują
+        bezpośrednio na zmapowany plik (bez kopiowania).
+        
+        Returns: (DataFrame, info) - info zawiera 'params' zapisane przy save()
+        """
+        frame, metadata = read_arrow_file(self._path(name))
+        return frame, json.loads(metadata.get(self.METADATA_KEY, b'{}'))
+
+    def list(self) -> List[Dict]:
+        """Lista migawek (czyta tylko metadane schematu), najnowsze pierwsze."""
+        if not self.available or not os.path.isdir(self.directory):
+            return []
+        
+        snapshots = []
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith(self.EXTENSION):
+                continue
+            path = os.path.join(self.directory, file_name)
+            try:
+                schema = pa.ipc.open_file(pa.memory_map(path, 'r')).schema
+                info = json.loads((schema.metadata or {}).get(self.METADATA_KEY, b'{}'))
+            except (pa.ArrowInvalid, OSError, ValueError):
+                continue
+            snapshots.append({
+                'name': file_name[:-len(self.EXTENSION)],
+                'label': info.get('name', file_name),
+                'rows': info.get('rows'),
+                'created': info.get('created', os.path.getmtime(path)),
+                'size': os.path.getsize(path),
+                'mtime': os.path.getmtime(path)
+            })
+        return sorted(snapshots, key=lambda s: s['created'], reverse=True)
+
+    def delete(self, name: str):
+        """Usuwa migawkę."""
+        os.remove(self._path(name))
+
+
+class DictionarySnapshot:
+    """
+    Słowniki API (województwa, marki, ...) zapisane w pliku JSON, aby pierwszy render
+    nowego procesu nie czekał na kilkadziesiąt zapytań do /slowniki.
+    Przestarzała migawka jest zwracana od razu i odświeżana w tle.
+    """
+
+    def __init__(self, path: str, max_age: float = 86400, retry_interval: float = 60):
+        self.path = path
+        self.max_age = max_age
+        self.retry_interval = retry_interval  # odstęp ponowienia po nieudanym odświeżeniu [s]
+        self._lock = threading.Lock()
+        self._data: Optional[Dict] = None
+        self._updated = 0.0
+        self._refreshing = False
+        self._last_attempt = 0.0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                payload = json.load(f)
+            self._data = payload['data']
+            self._updated = float(payload.get('updated', 0))
+        except (OSError, ValueError, KeyError, TypeError):
+            self._data = None
+
+    @property
+    def data(self) -> Optional[Dict]:
+        return self._data
+
+    @property
+    def age(self) -> Optional[float]:
+        """Wiek migawki [s] (None - brak migawki)."""
+        return time.time() - self._updated if self._data is not None else None
+
+    @property
+    def stale(self) -> bool:
+        return self._data is None or self.age > self.max_age
+
+    @property
+    def refreshing(self) -> bool:
+        return self._refreshing
+
+    def save(self, data: Dict):
+        """Podmienia migawkę w pamięci i zapisuje ją atomowo na dysk."""
+        updated = time.time()
+        with self._lock:
+            self._data = data
+            self._updated = updated
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'updated': updated, 'data': data}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Nie udało się zapisać migawki słowników: {e}")
+
+    def refresh_async(self, loader: Callable[[], Optional[Dict]]) -> bool:
+        """
+        Odświeża migawkę w wątku w tle (co najwyżej jedno odświeżanie naraz).
+        Loader zwracający None (np. API niedostępne) nie nadpisuje poprzednich danych.
+
+        Returns:
+            True, jeśli uruchomiono odświeżanie
+        """
+        with self._lock:
+            if self._refreshing or time.time() - self._last_attempt < self.retry_interval:
+                return False
+            self._refreshing = True
+            self._last_attempt = time.time()
+
+        def run():
+            try:
+                data = loader()
+                if data:
+                    self.save(data)
+            except Exception as e:
+                print(f"Błąd odświeżania słowników: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, daemon=True).start()
+        return True
@@ -4,27 +4,678 @@ Proxy Server dla BRONA - rozwiązuje problem CORS z API CEPiK
 
 Ten serwer pośredniczy między aplikacją frontendową a API CEPiK,
 dodając odpowiednie nagłówki CORS do odpowiedzi.
+
+Wszyscy użytkownicy proxy wychodzą do API z jednego adresu IP, dlatego zapytania
+do API przechodzą przez wspólny budżet (UpstreamGovernor): nadmiarowe czekają
+w kolejce zamiast kończyć się błędem 429, a kolejki klientów obsługiwane są
+na zmianę (round-robin) - pobieranie 16 województw przez jednego użytkownika
+nie blokuje pojedynczego zapytania innego. Odpowiedź zawiera nagłówki
+X-Queue-Position (miejsce w kolejce przy przyjęciu) i X-Queue-Wait (czas czekania [s]).
+
+Ustawienia (zmienne środowiskowe):
+    PROXY_UPSTREAM_RATE      - maks. zapytań do API na sekundę (domyślnie 2)
+    PROXY_UPSTREAM_PARALLEL  - maks. równoległych zapytań do API (domyślnie 4)
+    PROXY_MAX_QUEUE          - maks. oczekujących zapytań jednego klienta (domyślnie 100)
+    PROXY_MAX_WAIT           - maks. czas czekania w kolejce [s] (domyślnie 120)
+    PROXY_PREFETCH_DEPTH     - ile kolejnych stron /pojazdy pobierać z wyprzedzeniem (domyślnie 2, 0 = wyłączone)
+    PROXY_CACHE_TTL          - ważność stron w pamięci podręcznej proxy [s] (domyślnie 300)
+    PROXY_CRAWL_CACHE        - maks. stron /agg/ i /stream/ w osobnej pamięci podręcznej (domyślnie 100)
+
+Strony /pojazdy są zapisywane w pamięci podręcznej. Gdy odpowiedź ma kolejne
+strony, proxy pobiera w tle strony N+1..N+k (tylko przy wolnym budżecie zapytań),
+więc następne zapytanie klienta jest obsługiwane lokalnie (nagłówek X-Cache).
+
+Agregacje po stronie serwera - zamiast pobierać wszystkie rekordy do przeglądarki:
+    /agg/pojazdy?wojewodztwo=14,24&data-od=...&data-do=...&filter[marka]=...
+        &group_by=marka,rodzaj-paliwa   - kolumny grupowania (wymagane)
+        &stats=rok-produkcji,masa-wlasna - kolumny liczbowe: min/max/średnia w grupach
+        &rok-produkcji-od=2015&rok-produkcji-do=2020 - filtr lokalny (API go nie ma)
+        &top=50                          - tylko N największych grup
+Proxy pobiera wszystkie strony (z pamięci podręcznej lub API) i zwraca tylko
+liczności grup; wynik jest zapamiętywany (PROXY_AGG_TTL) według parametrów zapytania.
+
+Wszystkie strony w jednej odpowiedzi (NDJSON, Transfer-Encoding: chunked):
+    /stream/pojazdy?<parametry jak /pojazdy>[&rok-produkcji-od=...&rok-produkcji-do=...]
+Każda linia to jeden rekord API; rekordy są wysyłane zaraz po pobraniu strony.
+Nagłówek X-Total-Count podaje meta.count pierwszej strony, a błąd w trakcie
+pobierania jest zgłaszany ostatnią linią {"error": "..."}.
 """
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import http.client
+import math
+import queue
 import urllib.request
 import urllib.parse
 import json
+import os
 import ssl
+import threading
+import time
 from urllib.error import HTTPError, URLError
 
+API_BASE_URL = 'https://api.cepik.gov.pl'
+
+UPSTREAM_RATE = float(os.getenv('PROXY_UPSTREAM_RATE', 2))
+UPSTREAM_PARALLEL = int(os.getenv('PROXY_UPSTREAM_PARALLEL', 4))
+MAX_CLIENT_QUEUE = int(os.getenv('PROXY_MAX_QUEUE', 100))
+MAX_QUEUE_WAIT = float(os.getenv('PROXY_MAX_WAIT', 120))
+
+PREFETCH_DEPTH = int(os.getenv('PROXY_PREFETCH_DEPTH', 2))
+CACHE_TTL = float(os.getenv('PROXY_CACHE_TTL', 300))
+CACHE_MAX_ENTRIES = 500
+# Agregacje: ważność wyników [s] i liczba stron pobieranych równolegle
+AGG_CACHE_TTL = float(os.getenv('PROXY_AGG_TTL', 3600))
+CRAWL_PARALLEL = int(os.getenv('PROXY_CRAWL_PARALLEL', 3))
+CRAWL_PAGE_LIMIT = 500
+# Osobna, mniejsza pamięć stron przeglądanych przez /agg/ i /stream/ (strony po 500
+# rekordów) - duże przeglądanie nie wypiera stron pobranych dla klientów interaktywnych
+CRAWL_CACHE_MAX_ENTRIES = int(os.getenv('PROXY_CRAWL_CACHE', 100))
+# Parametry /agg/ i /stream/ obsługiwane przez proxy (nie są przekazywane do API)
+PROXY_PARAMS = ('group_by', 'stats', 'top', 'rok-produkcji-od', 'rok-produkcji-do')
+
+# Prefetch porzucany, gdy klient nie pobrał kolejnej strony przez tyle sekund
+PREFETCH_IDLE = 30
+PREFETCH_WORKERS = 2
+
+# Wstrzymanie wszystkich zapytań po odpowiedzi 429/503 bez Retry-After [s]
+RATE_LIMIT_PAUSE = 15
+UPSTREAM_RETRIES = 2
+
+
+class QueueFullError(Exception):
+    """Kolejka klienta jest pełna lub zapytanie czekało dłużej niż MAX_QUEUE_WAIT."""
+
+    def __init__(self, message, retry_after=5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BadRequestError(Exception):
+    """Niepoprawne parametry zapytania klienta (np. brak group_by) - odpowiedź 400."""
+
+
+class _Ticket:
+    __slots__ = ('client', 'position', 'enqueued', 'granted')
+
+    def __init__(self, client, position):
+        self.client = client
+        self.position = position
+        self.enqueued = time.monotonic()
+        self.granted = False
+
+
+class UpstreamGovernor:
+    """
+    Wspólny budżet zapytań do API: najwyżej `rate` zapytań na sekundę i `parallel`
+    naraz. Każdy klient ma własną kolejkę FIFO, a wolne miejsca przydzielane są
+    klientom po kolei (round-robin), więc długa seria zapytań jednego klienta
+    nie wydłuża czekania pozostałych.
+    """
+
+    def __init__(self, rate=2.0, parallel=4, max_queue=100, max_wait=120):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.parallel = parallel
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()  # klient -> deque biletów; kolejność = kolejka round-robin
+        self._active = 0
+        self._next_start = 0.0        # najwcześniejszy start kolejnego zapytania (monotonic)
+        self.granted = 0
+        self.rejected = 0
+
+    def _position(self, client):
+        """Szacowane miejsce nowego zapytania klienta w kolejności round-robin."""
+        own = len(self._queues.get(client, ()))
+        ahead = sum(min(len(q), own + 1) for c, q in self._queues.items() if c != client)
+        return own + ahead
+
+    def _dispatch(self, now):
+        """Przydziela wolne miejsca biletom z czoła kolejek (wywoływane pod blokadą)."""
+        while self._queues and self._active < self.parallel and now >= self._next_start:
+            client, tickets = next(iter(self._queues.items()))
+            ticket = tickets.popleft()
+            if tickets:
+                self._queues.move_to_end(client)
+            else:
+                del self._queues[client]
+            ticket.granted = True
+            self._active += 1
+            self._next_start = max(now, self._next_start) + self.interval
+            self.granted += 1
+            self._cond.notify_all()
+
+    def acquire(self, client):
+        """
+        Czeka na miejsce w budżecie zapytań do API.
+
+        Returns:
+            (miejsce w kolejce przy przyjęciu, czas czekania [s])
+
+        Raises:
+            QueueFullError: kolejka klienta pełna lub przekroczono max_wait
+        """
+        with self._cond:
+            queue = self._queues.get(client)
+            if queue is not None and len(queue) >= self.max_queue:
+                self.rejected += 1
+                raise QueueFullError(f"Kolejka klienta pełna ({self.max_queue} zapytań)")
+            ticket = _Ticket(client, self._position(client))
+            self._queues.setdefault(client, deque()).append(ticket)
+
+            while True:
+                now = time.monotonic()
+                self._dispatch(now)
+                if ticket.granted:
+                    return ticket.position, now - ticket.enqueued
+                if now - ticket.enqueued >= self.max_wait:
+                    tickets = self._queues.get(client)
+                    tickets.remove(ticket)
+                    if not tickets:
+                        del self._queues[client]
+                    self.rejected += 1
+                    raise QueueFullError(f"Przekroczono czas oczekiwania w kolejce ({self.max_wait:.0f}s)")
+                timeout = self.max_wait - (now - ticket.enqueued)
+                if self._active < self.parallel:
+                    timeout = min(timeout, max(self._next_start - now, 0.001))
+                self._cond.wait(timeout)
+
+    def try_acquire(self):
+        """
+        Zajmuje miejsce bez czekania, tylko gdy nikt nie czeka w kolejce i budżet
+        jest wolny (zapytania w tle, np. prefetch, nie opóźniają klientów).
+        """
+        with self._cond:
+            now = time.monotonic()
+            if self._queues or self._active >= self.parallel or now < self._next_start:
+                return False
+            self._active += 1
+            self._next_start = max(now, self._next_start) + self.interval
+            return True
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._dispatch(time.monotonic())
+            self._cond.notify_all()
+
+    def pause(self, seconds):
+        """Wstrzymuje przydzielanie miejsc (np. po 429 z API)."""
+        with self._cond:
+            self._next_start = max(self._next_start, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'active': self._active,
+                'waiting': sum(len(q) for q in self._queues.values()),
+                'clients': len(self._queues),
+                'granted': self.granted,
+                'rejected': self.rejected
+            }
+
+
+governor = UpstreamGovernor(UPSTREAM_RATE, UPSTREAM_PARALLEL, MAX_CLIENT_QUEUE, MAX_QUEUE_WAIT)
+
+
+def _ssl_context():
+    # SSL context z niższym poziomem bezpieczeństwa
+    # (API CEPiK używa starszych certyfikatów)
+    ssl_context = ssl.create_default_context()
+    ssl_context.set_ciphers('DEFAULT@SECLEVEL=1')
+    ssl_context.check_hostname = False
+    ssl_context.verify_mode = ssl.CERT_NONE
+    return ssl_context
+
+
+def _open_upstream(api_path):
+    req = urllib.request.Request(
+        f'{API_BASE_URL}{api_path}',
+        headers={
+            'Accept': 'application/json',
+            'User-Agent': 'BRONA/3.0'
+        }
+    )
+    with urllib.request.urlopen(req, context=_ssl_context(), timeout=30) as response:
+        return response.read()
+
+
+def _pause_after(error):
+    """Wstrzymuje budżet po 429/503 na czas z Retry-After (lub RATE_LIMIT_PAUSE)."""
+    retry_after = error.headers.get('Retry-After') if error.headers else None
+    pause = float(retry_after) if retry_after and retry_after.isdigit() else RATE_LIMIT_PAUSE
+    print(f"⏸️  API zwróciło {error.code} - wstrzymuję zapytania na {pause:.0f}s")
+    governor.pause(pause)
+
+
+def fetch_upstream(api_path, client):
+    """
+    Pobiera api_path z API CEPiK w ramach budżetu zapytań (governor).
+    Po 429/503 wstrzymuje wszystkie zapytania i ponawia (do UPSTREAM_RETRIES razy).
+
+    Returns:
+        (dane, miejsce w kolejce, łączny czas czekania w kolejce [s])
+    """
+    waited = 0.0
+    position = None
+    for attempt in range(UPSTREAM_RETRIES + 1):
+        queue_position, queue_wait = governor.acquire(client)
+        position = queue_position if position is None else position
+        waited += queue_wait
+        try:
+            return _open_upstream(api_path), position, waited
+        except HTTPError as e:
+            if e.code not in (429, 503) or attempt == UPSTREAM_RETRIES:
+                raise
+            _pause_after(e)
+        finally:
+            governor.release()
+
+
+def cache_key(api_path):
+    """Klucz pamięci podręcznej: ścieżka + parametry posortowane (kolejność w URL bez znaczenia)."""
+    parsed = urllib.parse.urlsplit(api_path)
+    params = sorted(urllib.parse.parse_qsl(parsed.query, keep_blank_values=True))
+    return f"{parsed.path}?{urllib.parse.urlencode(params)}" if params else parsed.path
+
+
+def page_cursor(api_path):
+    """(kursor, numer strony) dla stronicowanego zapytania /pojazdy, inaczej (None, None)."""
+    parsed = urllib.parse.urlsplit(api_path)
+    if parsed.path.rstrip('/') != '/pojazdy':
+        return None, None
+    params = urllib.parse.parse_qsl(parsed.query, keep_blank_values=True)
+    page = next((v for k, v in params if k == 'page'), '1')
+    if not page.isdigit():
+        return None, None
+    rest = sorted((k, v) for k, v in params if k != 'page')
+    return f"{parsed.path}?{urllib.parse.urlencode(rest)}", int(page)
+
+
+def with_page(api_path, page):
+    """api_path z podmienionym parametrem page."""
+    parsed = urllib.parse.urlsplit(api_path)
+    params = [(k, v) for k, v in urllib.parse.parse_qsl(parsed.query, keep_blank_values=True) if k != 'page']
+    params.append(('page', str(page)))
+    return f"{parsed.path}?{urllib.parse.urlencode(params)}"
+
+
+class ResponseCache:
+    """Odpowiedzi API w pamięci (LRU z czasem ważności)."""
+
+    def __init__(self, ttl=300, max_entries=500):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # klucz -> (czas zapisu, dane, źródło)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """(dane, źródło) lub None; źródło to 'fetch' albo 'prefetch'."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and time.monotonic() - entry[0] <= self.ttl
+
+    def put(self, key, data, source='fetch'):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), data, source)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class Prefetcher:
+    """
+    Pobieranie z wyprzedzeniem kolejnych stron /pojazdy do pamięci podręcznej.
+    Zadania wykonują wątki w tle, tylko gdy budżet zapytań jest wolny
+    (governor.try_acquire). Zadanie jest porzucane, gdy klient przestał
+    pobierać strony (PREFETCH_IDLE) albo już sam pobrał daną stronę.
+    """
+
+    def __init__(self, cache, depth=2, idle=30, workers=2):
+        self.cache = cache
+        self.depth = depth
+        self.idle = idle
+        self._lock = threading.Lock()
+        self._cursors = {}    # kursor -> (ostatnia strona klienta, czas)
+        self._inflight = {}   # klucz -> threading.Event (zaplanowane i trwające)
+        self._started = set() # klucze pobierane właśnie z API
+        self._jobs = queue.Queue(maxsize=100)
+        self.prefetched = 0
+        self.dropped = 0
+        for _ in range(workers if depth > 0 else 0):
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    def note_request(self, api_path, timeout=30):
+        """
+        Rejestruje zapytanie klienta o stronę: zaplanowany (jeszcze nie rozpoczęty)
+        prefetch tej strony jest porzucany, a trwający - klient na niego czeka
+        zamiast pobierać stronę drugi raz.
+        """
+        cursor, page = page_cursor(api_path)
+        if cursor is None:
+            return
+        key = cache_key(api_path)
+        now = time.monotonic()
+        with self._lock:
+            last_page, _ = self._cursors.get(cursor, (0, 0))
+            self._cursors[cursor] = (max(page, last_page), now)
+            # Stare kursory (klient przestał pobierać) nie są już potrzebne
+            for stale in [c for c, (_, t) in self._cursors.items() if now - t > self.idle]:
+                del self._cursors[stale]
+            event = self._inflight.get(key) if key in self._started else None
+        if event is not None:
+            event.wait(timeout)
+
+    def on_page(self, api_path, data):
+        """Planuje prefetch stron następujących po stronie pobranej przez klienta."""
+        cursor, page = page_cursor(api_path)
+        if cursor is None or self.depth <= 0:
+            return
+        try:
+            body = json.loads(data)
+        except ValueError:
+            return
+        if not (body.get('links') or {}).get('next'):
+            return
+        count = int((body.get('meta') or {}).get('count') or 0)
+        limit = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(api_path).query)).get('limit', '')
+        per_page = int(limit) if limit.isdigit() and int(limit) > 0 else len(body.get('data') or []) or 1
+        last = max(page + 1, math.ceil(count / per_page))
+
+        for next_page in range(page + 1, min(page + self.depth, last) + 1):
+            next_path = with_page(api_path, next_page)
+            key = cache_key(next_path)
+            with self._lock:
+                if key in self._inflight or key in self.cache:
+                    continue
+                self._inflight[key] = threading.Event()
+            try:
+                self._jobs.put_nowait((cursor, next_page, next_path, key))
+            except queue.Full:
+                self._finish(key)
+
+    def _wanted(self, cursor, page):
+        """Czy klient nadal pobiera strony kursora, a strona jest przed nim (pod blokadą)."""
+        last_page, touched = self._cursors.get(cursor, (0, 0))
+        return (
+            time.monotonic() - touched <= self.idle
+            and last_page < page <= last_page + self.depth
+        )
+
+    def _finish(self, key):
+        with self._lock:
+            self._started.discard(key)
+            event = self._inflight.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def _worker(self):
+        while True:
+            cursor, page, api_path, key = self._jobs.get()
+            try:
+                # Czekaj na wolny budżet, dopóki klient nadal pobiera kolejne strony
+                acquired = False
+                while not acquired:
+                    with self._lock:
+                        if not self._wanted(cursor, page):
+                            break
+                        if governor.try_acquire():
+                            self._started.add(key)
+                            acquired = True
+                    if not acquired:
+                        time.sleep(0.05)
+                if not acquired:
+                    self.dropped += 1
+                    continue
+                try:
+                    self.cache.put(key, _open_upstream(api_path), source='prefetch')
+                    self.prefetched += 1
+                except HTTPError as e:
+                    if e.code in (429, 503):
+                        _pause_after(e)
+                    self.dropped += 1
+                except (URLError, OSError):
+                    self.dropped += 1
+                finally:
+                    governor.release()
+            finally:
+                self._finish(key)
+
+
+cache = ResponseCache(CACHE_TTL, CACHE_MAX_ENTRIES)
+crawl_cache = ResponseCache(CACHE_TTL, CRAWL_CACHE_MAX_ENTRIES)
+prefetcher = Prefetcher(cache, PREFETCH_DEPTH, PREFETCH_IDLE, PREFETCH_WORKERS)
+
+
+def fetch_page(api_path, client, store=None):
+    """
+    Strona API z pamięci podręcznej proxy lub z API (w kolejce budżetu zapytań).
+    store - pamięć, do której trafia strona pobrana z API (domyślnie wspólna cache).
+    """
+    key = cache_key(api_path)
+    for source in (cache, crawl_cache):
+        cached = source.get(key)
+        if cached is not None:
+            return cached[0]
+    data, _, _ = fetch_upstream(api_path, client)
+    (store or cache).put(key, data)
+    return data
+
+
+def iter_pages(api_path, client, parallel=CRAWL_PARALLEL):
+    """
+    Wszystkie strony zapytania /pojazdy jako (numer strony, treść JSON), w kolejności stron.
+    Po pierwszej stronie (meta.count) kolejne pobierane są równolegle - najwyżej
+    `parallel` naraz, dalej w ramach wspólnego budżetu zapytań proxy. Strony pobrane
+    z API trafiają do osobnej pamięci crawl_cache.
+    """
+    body = json.loads(fetch_page(with_page(api_path, 1), client, crawl_cache))
+    yield 1, body
+    if not (body.get('links') or {}).get('next'):
+        return
+
+    count = int((body.get('meta') or {}).get('count') or 0)
+    last = max(2, math.ceil(count / CRAWL_PAGE_LIMIT))
+    pending = deque()
+    next_page = 2
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as executor:
+        try:
+            while True:
+                while next_page <= last and len(pending) < parallel:
+                    pending.append((next_page, executor.submit(fetch_page, with_page(api_path, next_page), client, crawl_cache)))
+                    next_page += 1
+                if not pending:
+                    return
+                page, future = pending.popleft()
+                body = json.loads(future.result())
+                yield page, body
+                has_next = (body.get('links') or {}).get('next')
+                if not has_next:
+                    return
+                if page == last:
+                    last += 1  # API ma więcej stron niż wynika z meta.count
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def year_filter(params):
+    """Filtr rekordów po rok-produkcji-od/-do (None, gdy nie podano zakresu)."""
+    year_from = _number(params.get('rok-produkcji-od'))
+    year_to = _number(params.get('rok-produkcji-do'))
+    if year_from is None and year_to is None:
+        return None
+
+    def keep(attributes):
+        year = _number(attributes.get('rok-produkcji'))
+        return year is not None and (year_from is None or year >= year_from) and (year_to is None or year <= year_to)
+    return keep
+
+
+def _crawl_queries(api_path):
+    """Ścieżki /pojazdy dla zapytania /agg/ lub /stream/ (po jednej na województwo z listy)."""
+    parsed = urllib.parse.urlsplit(api_path)
+    params = [
+        (k, v) for k, v in urllib.parse.parse_qsl(parsed.query, keep_blank_values=True)
+        if k not in PROXY_PARAMS and k not in ('page', 'limit')
+    ]
+    codes = [v for k, v in params if k == 'wojewodztwo']
+    codes = [c.strip() for value in codes for c in value.split(',') if c.strip()] or [None]
+    rest = [(k, v) for k, v in params if k != 'wojewodztwo']
+    paths = []
+    for code in codes:
+        query = ([('wojewodztwo', code)] if code else []) + rest + [('limit', str(CRAWL_PAGE_LIMIT))]
+        paths.append(f"{parsed.path}?{urllib.parse.urlencode(query)}")
+    return paths
+
+
+def aggregate(api_path, client):
+    """
+    Liczności grup i statystyki kolumn liczbowych dla zapytania /pojazdy.
+
+    Returns:
+        {'group_by', 'total', 'pages', 'groups': [{kolumny..., 'count', 'stats'}], 'stats', 'elapsed'}
+    """
+    params = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(api_path).query))
+    group_by = [c.strip() for c in params.get('group_by', '').split(',') if c.strip()]
+    stat_columns = [c.strip() for c in params.get('stats', '').split(',') if c.strip()]
+    top = int(params['top']) if params.get('top', '').isdigit() else None
+    keep = year_filter(params)
+    if not group_by:
+        raise BadRequestError("Wymagany parametr group_by")
+
+    started = time.monotonic()
+    groups = {}   # wartości grupujące -> [liczba, {kolumna: [n, suma, min, max]}]
+    totals = {c: [0, 0.0, None, None] for c in stat_columns}
+    total = 0
+    pages = 0
+    for query_path in _crawl_queries(api_path):
+        for _, body in iter_pages(query_path, client):
+            pages += 1
+            for record in body.get('data') or []:
+                attributes = record.get('attributes') or {}
+                if keep is not None and not keep(attributes):
+                    continue
+                total += 1
+                key = tuple(attributes.get(c) for c in group_by)
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = [0, {c: [0, 0.0, None, None] for c in stat_columns}]
+                group[0] += 1
+                for column in stat_columns:
+                    value = _number(attributes.get(column))
+                    if value is None:
+                        continue
+                    for acc in (group[1][column], totals[column]):
+                        acc[0] += 1
+                        acc[1] += value
+                        acc[2] = value if acc[2] is None else min(acc[2], value)
+                        acc[3] = value if acc[3] is None else max(acc[3], value)
+
+    def summary(acc):
+        n, value_sum, low, high = acc
+        return {'count': n, 'min': low, 'max': high, 'mean': value_sum / n if n else None}
+
+    rows = sorted(groups.items(), key=lambda item: -item[1][0])
+    if top:
+        rows = rows[:top]
+    return {
+        'group_by': group_by,
+        'total': total,
+        'pages': pages,
+        'groups': [
+            dict(zip(group_by, key), count=count, stats={c: summary(acc) for c, acc in stats.items()})
+            for key, (count, stats) in rows
+        ],
+        'group_count': len(groups),
+        'stats': {c: summary(acc) for c, acc in totals.items()},
+        'elapsed': round(time.monotonic() - started, 3)
+    }
+
+
+class AggregateCache:
+    """
+    Wyniki /agg/ według odcisku zapytania (posortowane parametry). Równoczesne
+    identyczne zapytania liczone są raz - pozostałe czekają na wynik pierwszego.
+    """
+
+    def __init__(self, ttl=3600, max_entries=200):
+        self.results = ResponseCache(ttl, max_entries)
+        self._lock = threading.Lock()
+        self._running = {}  # odcisk -> threading.Event
+
+    def get_or_compute(self, api_path, compute):
+        """(dane JSON, czy z pamięci podręcznej)."""
+        key = cache_key(api_path)
+        while True:
+            cached = self.results.get(key)
+            if cached is not None:
+                return cached[0], True
+            with self._lock:
+                event = self._running.get(key)
+                if event is None:
+                    event = self._running[key] = threading.Event()
+                    owner = True
+                else:
+                    owner = False
+            if not owner:
+                event.wait()
+                continue
+            try:
+                data = json.dumps(compute(), ensure_ascii=False).encode('utf-8')
+                self.results.put(key, data)
+                return data, False
+            finally:
+                with self._lock:
+                    del self._running[key]
+                event.set()
+
+
+aggregates = AggregateCache(AGG_CACHE_TTL)
+
 class CORSRequestHandler(SimpleHTTPRequestHandler):
     """Handler HTTP z obsługą CORS i proxy do API CEPiK"""
     
+    # HTTP/1.1: połączenia keep-alive i odpowiedzi chunked (/stream/) - każda
+    # odpowiedź musi mieć Content-Length albo Transfer-Encoding: chunked
+    protocol_version = 'HTTP/1.1'
+    
     def end_headers(self):
         # Dodaj nagłówki CORS do każdej odpowiedzi
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, X-Client-Id')
+        self.send_header('Access-Control-Expose-Headers', 'X-Queue-Position, X-Queue-Wait, X-Cache, X-Total-Count')
         SimpleHTTPRequestHandler.end_headers(self)
     
     def do_OPTIONS(self):
         """Obsługa preflight CORS request"""
         self.send_response(200)
+        self.send_header('Content-Length', '0')
         self.end_headers()
     
     def do_GET(self):
@@ -33,10 +684,18 @@ class CORSRequestHandler(SimpleHTTPRequestHandler):
         # Sprawdź czy to zapytanie do API
         if self.path.startswith('/api/'):
             self.proxy_api_request()
+        elif self.path.startswith('/agg/'):
+            self.aggregate_request()
+        elif self.path.startswith('/stream/'):
+            self.stream_request()
         else:
             # Normalne serwowanie plików statycznych
             super().do_GET()
     
+    def client_id(self):
+        """Klient do sprawiedliwego kolejkowania: nagłówek X-Client-Id lub adres IP."""
+        return self.headers.get('X-Client-Id') or self.client_address[0]
+    
     def proxy_api_request(self):
         """Przekaż zapytanie do API CEPiK i zwróć odpowiedź"""
         try:
@@ -56,35 +715,44 @@ class CORSRequestHandler(SimpleHTTPRequestHandler):
             if not api_path.startswith('/'):
                 api_path = '/' + api_path
 
-            api_url = f'https://api.cepik.gov.pl{api_path}'
-
-            print(f"Proxy: {self.path} -> {api_url}")
+            print(f"Proxy: {self.path} -> {API_BASE_URL}{api_path}")
             
-            # Stwórz SSL context z niższym poziomem bezpieczeństwa
-            # (API CEPiK używa starszych certyfikatów)
-            ssl_context = ssl.create_default_context()
-            ssl_context.set_ciphers('DEFAULT@SECLEVEL=1')
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
+            # Strony /pojazdy mogą już być w pamięci podręcznej (prefetch)
+            paginated = page_cursor(api_path)[0] is not None
+            key = cache_key(api_path)
+            cached = None
+            if paginated:
+                prefetcher.note_request(api_path)
+                cached = cache.get(key)
             
-            # Wykonaj zapytanie do API CEPiK
-            req = urllib.request.Request(
-                api_url,
-                headers={
-                    'Accept': 'application/json',
-                    'User-Agent': 'BRONA/3.0'
-                }
-            )
+            if cached is not None:
+                data, source = cached
+                position, waited = 0, 0.0
+                cache_status = 'PREFETCH' if source == 'prefetch' else 'HIT'
+            else:
+                # Wykonaj zapytanie do API CEPiK (w kolejce budżetu zapytań)
+                data, position, waited = fetch_upstream(api_path, self.client_id())
+                cache_status = 'MISS'
+                if paginated:
+                    cache.put(key, data)
             
-            with urllib.request.urlopen(req, context=ssl_context, timeout=30) as response:
-                data = response.read()
-                
-                # Wyślij odpowiedź
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json; charset=utf-8')
-                self.end_headers()
-                self.wfile.write(data)
+            # Wyślij odpowiedź
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('X-Queue-Position', str(position))
+            self.send_header('X-Queue-Wait', f"{waited:.3f}")
+            self.send_header('X-Cache', cache_status)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            
+            if paginated:
+                prefetcher.on_page(api_path, data)
                 
+        except QueueFullError as e:
+            print(f"Queue: {self.client_id()} - {e}")
+            self.send_json(503, {'error': str(e)}, {'Retry-After': str(e.retry_after)})
+            
         except HTTPError as e:
             print(f"HTTP Error: {e.code} - {e.reason}")
             self.send_error(e.code, f"API Error: {e.reason}")
@@ -97,16 +765,126 @@ class CORSRequestHandler(SimpleHTTPRequestHandler):
             print(f"Error: {type(e).__name__}: {str(e)}")
             self.send_error(500, f"Server Error: {str(e)}")
     
+    def send_json(self, status, payload, headers=None):
+        data = payload if isinstance(payload, bytes) else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def aggregate_request(self):
+        """Agregacja /agg/pojazdy?... - liczności grup zamiast rekordów"""
+        api_path = self.path[4:]  # Usuń '/agg'
+        if urllib.parse.urlsplit(api_path).path.rstrip('/') != '/pojazdy':
+            self.send_json(404, {'error': 'Obsługiwane jest tylko /agg/pojazdy'})
+            return
+        client = self.client_id()
+        try:
+            data, cached = aggregates.get_or_compute(api_path, lambda: aggregate(api_path, client))
+            self.send_json(200, data, {'X-Cache': 'HIT' if cached else 'MISS'})
+        except BadRequestError as e:
+            self.send_json(400, {'error': str(e)})
+        except QueueFullError as e:
+            self.send_json(503, {'error': str(e)}, {'Retry-After': str(e.retry_after)})
+        except HTTPError as e:
+            print(f"HTTP Error: {e.code} - {e.reason}")
+            self.send_json(e.code, {'error': f"API Error: {e.reason}"})
+        except URLError as e:
+            print(f"URL Error: {e.reason}")
+            self.send_json(502, {'error': f"Connection Error: {e.reason}"})
+        except ValueError as e:
+            # Niepoprawny JSON z API - błąd po stronie API, nie klienta
+            print(f"Aggregate error: {type(e).__name__}: {e}")
+            self.send_json(502, {'error': f"Invalid API response: {e}"})
+        except (OSError, http.client.HTTPException) as e:
+            # Timeout odczytu, zerwane połączenie z API (poza URLError)
+            print(f"Aggregate error: {type(e).__name__}: {e}")
+            self.send_json(502, {'error': f"Connection Error: {type(e).__name__}: {e}"})
+    
+    def write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+    
+    def stream_request(self):
+        """Wszystkie strony /stream/pojazdy?... jako NDJSON w jednej odpowiedzi chunked"""
+        api_path = self.path[7:]  # Usuń '/stream'
+        if urllib.parse.urlsplit(api_path).path.rstrip('/') != '/pojazdy':
+            self.send_json(404, {'error': 'Obsługiwane jest tylko /stream/pojazdy'})
+            return
+        client = self.client_id()
+        keep = year_filter(dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(api_path).query)))
+        queries = [iter_pages(query_path, client) for query_path in _crawl_queries(api_path)]
+        
+        # Nagłówki dopiero po pierwszych stronach (równolegle dla wszystkich województw) -
+        # błąd zapytania wraca jako zwykły kod HTTP, a X-Total-Count jest znane
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, CRAWL_PARALLEL)) as executor:
+                first_pages = list(executor.map(next, queries))
+        except (QueueFullError, OSError, http.client.HTTPException, ValueError) as e:
+            # OSError obejmuje HTTPError, URLError i timeout odczytu z urlopen
+            for pages in queries:
+                pages.close()
+            if isinstance(e, QueueFullError):
+                self.send_json(503, {'error': str(e)}, {'Retry-After': str(e.retry_after)})
+            elif isinstance(e, HTTPError):
+                self.send_json(e.code, {'error': f"API Error: {e.reason}"})
+            elif isinstance(e, URLError):
+                self.send_json(502, {'error': f"Connection Error: {e.reason}"})
+            elif isinstance(e, ValueError):
+                self.send_json(502, {'error': f"Invalid API response: {e}"})
+            else:
+                self.send_json(502, {'error': f"Connection Error: {type(e).__name__}: {e}"})
+            return
+        
+        total = sum(int((body.get('meta') or {}).get('count') or 0) for _, body in first_pages)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('X-Total-Count', str(total))
+        self.end_headers()
+        
+        def lines(body):
+            records = body.get('data') or []
+            if keep is not None:
+                records = [r for r in records if keep(r.get('attributes') or {})]
+            return b''.join(json.dumps(r, ensure_ascii=False).encode('utf-8') + b"\n" for r in records)
+        
+        try:
+            try:
+                for (_, body), pages in zip(first_pages, queries):
+                    self.write_chunk(lines(body))
+                    for _, body in pages:
+                        data = lines(body)
+                        if data:
+                            self.write_chunk(data)
+            except (QueueFullError, OSError, http.client.HTTPException, ValueError) as e:
+                if isinstance(e, (BrokenPipeError, ConnectionResetError)) and not isinstance(e, http.client.HTTPException):
+                    raise  # Zerwany zapis do klienta, nie błąd API (RemoteDisconnected to błąd API)
+                print(f"Stream error: {type(e).__name__}: {e}")
+                self.write_chunk(json.dumps({'error': str(e)}, ensure_ascii=False).encode('utf-8') + b"\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Klient zamknął połączenie - niepobrane strony są anulowane (iter_pages)
+            print(f"Stream: {client} rozłączył się")
+            self.close_connection = True
+        finally:
+            for pages in queries:
+                pages.close()
+    
     def log_message(self, format, *args):
         """Logowanie requestów"""
         # Tylko loguj proxy requests (sprawdź czy pierwszy argument to string)
-        if args and isinstance(args[0], str) and 'GET /api/' in args[0]:
+        if args and isinstance(args[0], str) and ('GET /api/' in args[0] or 'GET /agg/' in args[0]):
             print(f"{self.address_string()} - {format % args}")
 
 def run_server(port=8000):
     """Uruchom serwer proxy"""
     server_address = ('', port)
-    httpd = HTTPServer(server_address, CORSRequestHandler)
+    httpd = ThreadingHTTPServer(server_address, CORSRequestHandler)
+    httpd.daemon_threads = True
     
     print("=" * 70)
     print("🚗 BRONA - Proxy Server")
@@ -115,7 +893,13 @@ def run_server(port=8000):
     print(f"\n🌐 Otwórz przeglądarkę:")
     print(f"   http://localhost:{port}")
     print(f"\n📡 Proxy endpoint:")
-    print(f"   http://localhost:{port}/api/* -> https://api.cepik.gov.pl/*")
+    print(f"   http://localhost:{port}/api/* -> {API_BASE_URL}/*")
+    print(f"\n🚦 Budżet API: {UPSTREAM_RATE:g} zapytań/s, {UPSTREAM_PARALLEL} równolegle "
+          f"(kolejka do {MAX_CLIENT_QUEUE} zapytań na klienta)")
+    print(f"   http://localhost:{port}/agg/pojazdy?...&group_by=marka -> agregacje po stronie serwera")
+    print(f"   http://localhost:{port}/stream/pojazdy?... -> wszystkie strony jako NDJSON")
+    if PREFETCH_DEPTH > 0:
+        print(f"⏩ Prefetch: {PREFETCH_DEPTH} kolejne strony /pojazdy (pamięć podręczna {CACHE_TTL:.0f}s)")
     print("\n⚙️  Naciśnij Ctrl+C aby zatrzymać serwer\n")
     print("=" * 70)
     print()
@@ -0,0 +1,192 @@
+"""
+Indeks podpowiedzi marek i modeli pojazdów
+
+Marki pochodzą ze słownika 'marka' API CEPiK, modele - z par (marka, model)
+zaobserwowanych na pobranych stronach (surowe wartości rejestru, zanim
+_postprocess_dataframe usunie markę z nazwy modelu). Indeks odpowiada na
+zapytania prefiksowe (bisect na posortowanych kluczach) i przybliżone
+(indeks trigramów) bez przeglądania całego słownika.
+"""
+import bisect
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+_SEPARATORS = re.compile(r'[\s\-_./]+')
+
+
+def normalize_key(text: str) -> str:
+    """Klucz porównania: wielkie litery, bez polskich znaków i separatorów ("Corolla-Verso" -> "COROLLAVERSO")."""
+    text = unicodedata.normalize('NFKD', str(text).upper().replace('Ł', 'L'))
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return _SEPARATORS.sub('', text)
+
+
+def _trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _Vocabulary:
+    """Zbiór wartości z kluczami: dokładne dopasowanie, prefiks i trigramy."""
+
+    def __init__(self):
+        self.values: Dict[str, Set[str]] = {}   # klucz -> oryginalne wartości
+        self.keys: List[str] = []               # posortowane klucze (prefiksy)
+        self.grams: Dict[str, Set[str]] = {}    # trigram -> klucze
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key: str, value: str):
+        if not key:
+            return
+        values = self.values.get(key)
+        if values is None:
+            self.values[key] = {value}
+            bisect.insort(self.keys, key)
+            for gram in _trigrams(key):
+                self.grams.setdefault(gram, set()).add(key)
+        else:
+            values.add(value)
+
+    def exact(self, key: str) -> Set[str]:
+        return self.values.get(key, set())
+
+    def prefix(self, key: str, limit: int) -> List[str]:
+        start = bisect.bisect_left(self.keys, key)
+        found = []
+        for candidate in self.keys[start:]:
+            if not candidate.startswith(key) or len(found) >= limit:
+                break
+            found.append(candidate)
+        return found
+
+    def fuzzy(self, key: str, limit: int, min_score: float) -> List[Tuple[str, float]]:
+        """Klucze o największym podobieństwie trigramów (Jaccard) do podanego."""
+        query = _trigrams(key)
+        shared = Counter()
+        for gram in query:
+            shared.update(self.grams.get(gram, ()))
+        scored = []
+        for candidate, common in shared.items():
+            score = common / (len(query) + len(candidate) + 1 - common)  # |trigramy klucza| = len + 1
+            if score >= min_score:
+                scored.append((candidate, score))
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[:limit]
+
+
+class SuggestionIndex:
+    """
+    Podpowiedzi i rozwiązywanie nazw marek/modeli do dokładnych wartości rejestru.
+    Bezpieczny wątkowo - modele są dopisywane z wątków pobierających strony.
+    """
+
+    def __init__(self, min_score: float = 0.45):
+        self.min_score = min_score
+        self._lock = threading.Lock()
+        self._brands = _Vocabulary()
+        self._models: Dict[str, _Vocabulary] = {}  # klucz marki -> modele
+        self._all_models = _Vocabulary()
+        self._pairs: Set[Tuple[str, str]] = set()
+
+    @property
+    def brand_count(self) -> int:
+        return len(self._brands)
+
+    @property
+    def model_count(self) -> int:
+        return len(self._pairs)
+
+    def add_brands(self, brands: Iterable[str]):
+        """Dodaje marki (np. ze słownika 'marka')."""
+        with self._lock:
+            for brand in brands:
+                if brand and brand != '---':
+                    self._brands.add(normalize_key(brand), brand)
+
+    def observe(self, brands: Iterable, models: Iterable):
+        """
+        Dodaje zaobserwowane pary (marka, model) - surowe wartości z API.
+        Model jest indeksowany także bez nazwy marki ("TOYOTA COROLLA" -> "COROLLA").
+        """
+        pairs = set(zip(brands, models))
+        with self._lock:
+            for brand, model in pairs - self._pairs:
+                if not isinstance(brand, str) or not isinstance(model, str) or not model or model == '---':
+                    continue
+                self._pairs.add((brand, model))
+                brand_key = normalize_key(brand)
+                self._brands.add(brand_key, brand)
+                vocabulary = self._models.setdefault(brand_key, _Vocabulary())
+                model_key = normalize_key(model)
+                stripped_key = model_key[len(brand_key):] if model_key.startswith(brand_key) else None
+                for key in (model_key, stripped_key):
+                    if key:
+                        vocabulary.add(key, model)
+                        self._all_models.add(key, model)
+
+    def _lookup(self, vocabulary: _Vocabulary, text: str, limit: int) -> List[str]:
+        key = normalize_key(text)
+        keys = vocabulary.prefix(key, limit)  # pusty klucz pasuje do wszystkich
+        if key and len(keys) < limit:
+            keys += [k for k, _ in vocabulary.fuzzy(key, limit, self.min_score) if k not in keys]
+        values = []
+        for k in keys:
+            for value in sorted(vocabulary.exact(k)):
+                if value not in values:
+                    values.append(value)
+        return values[:limit]
+
+    def suggest_brands(self, text: str, limit: int = 20) -> List[str]:
+        """Marki pasujące prefiksem, a potem przybliżenie (literówki)."""
+        with self._lock:
+            return self._lookup(self._brands, text, limit)
+
+    def suggest_models(self, brand: Optional[str], text: str, limit: int = 20) -> List[str]:
+        """Modele marki (lub wszystkich marek) pasujące prefiksem lub przybliżeniem (pusty tekst - pierwsze znane)."""
+        with self._lock:
+            vocabulary = self._models.get(normalize_key(brand)) if brand else self._all_models
+            if vocabulary is None:
+                return []
+            return self._lookup(vocabulary, text, limit)
+
+    def resolve_brand(self, text: str) -> Optional[str]:
+        """Dokładna wartość marki z rejestru dla tekstu użytkownika (None, gdy niejednoznaczna/nieznana)."""
+        with self._lock:
+            values = self._brands.exact(normalize_key(text))
+        return next(iter(values)) if len(values) == 1 else None
+
+    def resolve_model(self, brand: Optional[str], text: str, limit: int = 5) -> Tuple[List[str], str]:
+        """
+        Zamienia tekst użytkownika na wartości modelu z rejestru.
+
+        Returns:
+            (wartości, sposób): sposób to 'exact' (dokładne dopasowanie klucza),
+            'prefix' / 'fuzzy' (kilka kandydatów - do rozszerzenia zapytania)
+            lub 'unknown' (brak w indeksie - wartość użytkownika bez zmian)
+        """
+        key = normalize_key(text)
+        with self._lock:
+            vocabulary = self._models.get(normalize_key(brand)) if brand else self._all_models
+            if not key or vocabulary is None:
+                return [text], 'unknown'
+
+            exact = vocabulary.exact(key)
+            if exact:
+                return sorted(exact), 'exact'
+            keys = vocabulary.prefix(key, limit)
+            if keys:
+                method = 'prefix'
+            else:
+                keys = [k for k, _ in vocabulary.fuzzy(key, limit, self.min_score)]
+                method = 'fuzzy'
+            values = []
+            for k in keys:
+                values.extend(v for v in sorted(vocabulary.exact(k)) if v not in values)
+        if not values:
+            return [text], 'unknown'
+        return values[:limit], method
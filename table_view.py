@@ -0,0 +1,326 @@
+"""
+Widok tabeli pojazdów liczony po stronie serwera
+Przeglądarka dostaje tylko bieżące okno wierszy (stronę), a wyszukiwanie
+i stronicowanie wykonywane są na współdzielonym zbiorze bez jego kopiowania -
+koszt renderowania tabeli nie rośnie z liczbą pobranych pojazdów.
+Permutacje sortowania liczone są raz na kolumnę dla danej wersji zbioru
+(zbiory w rejestrze są niezmienne) - posortowanie przefiltrowanego widoku
+to wybór pozycji z gotowej permutacji, a nie ponowne sortowanie.
+Filtry korzystają z indeksów bitmapowych (kategorie) i posortowanych wartości
+(zakresy liczbowe); wynik to wektor wybranych wierszy (SelectionView), z którego
+kolejne etapy pobierają tylko potrzebne kolumny.
+"""
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+
+class SelectionView:
+    """
+    Wybrane wiersze zbioru (wektor pozycji, None = wszystkie) bez kopiowania
+    DataFrame. Kolumny pobierane są na żądanie: view['marka'] zwraca Series
+    tylko wybranych wierszy, take() - DataFrame z wybranymi kolumnami.
+    """
+
+    def __init__(self, frame: pd.DataFrame, rows: Optional[np.ndarray] = None):
+        self.frame = frame
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.frame) if self.rows is None else len(self.rows)
+
+    @property
+    def columns(self) -> pd.Index:
+        return self.frame.columns
+
+    def _positions(self, positions=None):
+        if positions is None:
+            return slice(None) if self.rows is None else self.rows
+        return positions if self.rows is None else self.rows[positions]
+
+    def __getitem__(self, column: str) -> pd.Series:
+        if self.rows is None:
+            return self.frame[column]
+        return self.frame[column].take(self.rows)
+
+    def take(self, columns: Optional[List[str]] = None, positions=None) -> pd.DataFrame:
+        """
+        DataFrame wybranych wierszy (kopia tylko podanych kolumn).
+
+        Args:
+            columns: Kolumny (None = wszystkie)
+            positions: Pozycje lub wycinek w obrębie widoku (None = cały widok)
+        """
+        rows = self._positions(positions)
+        if columns is None:
+            return self.frame.iloc[rows]
+        return self.frame.iloc[rows, self.frame.columns.get_indexer(columns)]
+
+
+def search_mask(frame, columns: List[str], text: str) -> Optional[np.ndarray]:
+    """
+    Maska wierszy zawierających tekst (bez rozróżniania wielkości liter)
+    w którejkolwiek z podanych kolumn (frame: DataFrame lub SelectionView).
+
+    Returns:
+        Maska NumPy lub None, gdy tekst jest pusty (bez wyszukiwania)
+    """
+    text = (text or '').strip()
+    if not text:
+        return None
+
+    result = np.zeros(len(frame), dtype=bool)
+    for col in columns:
+        if col not in frame.columns:
+            continue
+        values = frame[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Wyszukiwanie w kategoriach (kilka tysięcy wartości), wiersze przez kody
+            categories = values.cat.categories.astype(str)
+            hits = np.asarray(categories.str.contains(text, case=False, regex=False), dtype=bool)
+            result |= np.append(hits, False)[values.cat.codes.to_numpy()]
+            continue
+        if not (pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values)):
+            values = values.astype(str)
+        matches = values.str.contains(text, case=False, regex=False, na=False)
+        result |= np.asarray(matches, dtype=bool)
+    return result
+
+
+class FrameIndex:
+    """
+    Indeksy sortowania niezmiennego DataFrame: kody rang kolumn (faktoryzacja
+    z sortowaniem, brak wartości = -1) i gotowe permutacje (stabilne, jak
+    sort_values(kind='stable')) dla użytych kombinacji kolumn i kierunków.
+    Bezpieczny wątkowo - ten sam zbiór może być sortowany przez wiele sesji.
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self._frame = weakref.ref(frame)  # bez blokowania zrzutu zbioru na dysk
+        self.rows = len(frame)
+        self._lock = threading.Lock()
+        self._codes: Dict[str, Tuple[np.ndarray, int]] = {}  # kolumna -> (kody, liczba wartości)
+        self._uniques: Dict[str, pd.Index] = {}               # kolumna -> wartości według kodu
+        self._orders: Dict[Tuple, np.ndarray] = {}
+        self._bitmaps: Dict[Tuple[str, int], np.ndarray] = {}  # (kolumna, kod) -> bity wierszy
+        self._ranges: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}  # kolumna -> (permutacja, wartości)
+
+    def codes(self, column: str) -> Tuple[np.ndarray, int]:
+        """Kody rang wartości kolumny (rosnąco; brak wartości = -1) i liczba różnych wartości."""
+        with self._lock:
+            cached = self._codes.get(column)
+        if cached is not None:
+            return cached
+        values = self._frame()[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Kody wspólnej tabeli (CategoryCodec) - bez faktoryzacji tekstu, tylko
+            # zawężenie do wartości obecnych w zbiorze
+            raw = values.cat.codes.to_numpy()
+            categories = values.cat.categories
+            present = np.flatnonzero(np.bincount(raw[raw >= 0], minlength=len(categories)))
+            lookup = np.full(len(categories), -1, dtype=np.int64)
+            lookup[present] = np.arange(len(present))
+            codes = np.where(raw < 0, -1, lookup[raw])
+            uniques = categories[present]
+        else:
+            codes, uniques = pd.factorize(values, sort=False)
+            uniques = pd.Index(uniques)
+        try:
+            by_rank = uniques.argsort()
+        except TypeError:
+            # Wartości różnych typów (np. liczby i tekst) - porządek jak dla tekstu
+            by_rank = np.argsort(np.asarray(uniques, dtype=str), kind='stable')
+        ranks = np.argsort(by_rank)
+        codes = np.where(codes < 0, -1, ranks[codes])
+        uniques = uniques.take(by_rank)
+        cached = (codes.astype(np.int32 if len(uniques) < 2 ** 31 else np.int64), len(uniques))
+        with self._lock:
+            self._codes[column] = cached
+            self._uniques[column] = pd.Index(uniques)
+        return cached
+
+    def categories(self, column: str) -> pd.Index:
+        """Wartości kolumny według kodu (categories(col)[kod])."""
+        self.codes(column)
+        with self._lock:
+            return self._uniques[column]
+
+    def distinct(self, column: str) -> int:
+        """Liczba różnych wartości kolumny (bez braków) - z indeksu, bez ponownego liczenia."""
+        return self.codes(column)[1]
+
+    def _bitmap(self, column: str, code: int) -> np.ndarray:
+        """Bitmapa (spakowane bity) wierszy o danym kodzie wartości."""
+        key = (column, code)
+        with self._lock:
+            bits = self._bitmaps.get(key)
+        if bits is None:
+            bits = np.packbits(self.codes(column)[0] == code)
+            bits.flags.writeable = False
+            with self._lock:
+                self._bitmaps[key] = bits
+        return bits
+
+    def isin(self, column: str, values) -> np.ndarray:
+        """Bitmapa wierszy o wartości z listy (dokładne dopasowanie) - suma bitmap wartości."""
+        codes = [int(code) for code in self.categories(column).get_indexer(list(values)) if code >= 0]
+        if not codes:
+            return np.zeros((self.rows + 7) // 8, dtype=np.uint8)
+        return np.bitwise_or.reduce([self._bitmap(column, code) for code in codes])
+
+    def _sorted_values(self, column: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Indeks zakresów: permutacja wierszy rosnąco według wartości liczbowej i posortowane wartości (bez braków)."""
+        with self._lock:
+            cached = self._ranges.get(column)
+        if cached is None:
+            values = pd.to_numeric(self._frame()[column], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+            order = np.argsort(values, kind='stable')  # NaN na końcu
+            valid = int(np.count_nonzero(~np.isnan(values)))
+            cached = (order[:valid], values[order[:valid]])
+            with self._lock:
+                self._ranges[column] = cached
+        return cached
+
+    def between(self, column: str, low=None, high=None) -> np.ndarray:
+        """Bitmapa wierszy o wartości liczbowej w zakresie [low, high] (brak wartości odrzucany)."""
+        order, values = self._sorted_values(column)
+        start = 0 if low is None else int(np.searchsorted(values, low, side='left'))
+        stop = len(values) if high is None else int(np.searchsorted(values, high, side='right'))
+        mask = np.zeros(self.rows, dtype=bool)
+        mask[order[start:stop]] = True
+        return np.packbits(mask)
+
+    def select(self, bitmaps: Sequence[np.ndarray]) -> Optional[np.ndarray]:
+        """Maska wierszy spełniających wszystkie filtry (iloczyn bitmap); None bez filtrów."""
+        if not bitmaps:
+            return None
+        bits = bitmaps[0]
+        for other in bitmaps[1:]:
+            bits = np.bitwise_and(bits, other)
+        return np.unpackbits(bits, count=self.rows).view(bool)
+
+    def _sort_key(self, column: str, ascending: bool, na_last: bool) -> np.ndarray:
+        codes, distinct = self.codes(column)
+        key = codes if ascending else distinct - 1 - codes
+        return np.where(codes < 0, distinct if na_last else -1, key)
+
+    def order(
+        self,
+        by: Union[str, Sequence[str]],
+        ascending: Union[bool, Sequence[bool]] = True,
+        na_position: str = 'last'
+    ) -> np.ndarray:
+        """
+        Permutacja pozycji wierszy posortowanych według kolumn (zapamiętywana).
+
+        Args:
+            by: Kolumna lub lista kolumn (pierwsza - najważniejsza)
+            ascending: Kierunek dla wszystkich kolumn lub lista kierunków
+            na_position: 'last' lub 'first' - miejsce wierszy bez wartości
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        if isinstance(ascending, bool):
+            ascending = [ascending] * len(by)
+        cache_key = (tuple(by), tuple(ascending), na_position)
+        with self._lock:
+            cached = self._orders.get(cache_key)
+        if cached is not None:
+            return cached
+
+        na_last = na_position == 'last'
+        keys = [self._sort_key(col, asc, na_last) for col, asc in zip(by, ascending)]
+        if len(keys) == 1:
+            order = np.argsort(keys[0], kind='stable')
+        else:
+            order = np.lexsort(keys[::-1])  # lexsort: ostatni klucz najważniejszy, stabilny
+        with self._lock:
+            self._orders[cache_key] = order
+        return order
+
+    def sorted_rows(
+        self,
+        by: Union[str, Sequence[str]],
+        ascending: Union[bool, Sequence[bool]] = True,
+        mask: Optional[np.ndarray] = None,
+        na_position: str = 'last'
+    ) -> np.ndarray:
+        """Pozycje wierszy spełniających maskę w kolejności sortowania (bez ponownego sortowania)."""
+        order = self.order(by, ascending, na_position)
+        if mask is None:
+            return order
+        return order[mask[order]]
+
+
+class FrameIndexCache:
+    """
+    Indeksy zbiorów kluczowane wersją zbioru (DatasetHandle.version - klucz w rejestrze
+    i czas rejestracji), najdawniej używane usuwane są powyżej limitu. Zbiór zrzucony
+    na dysk i wczytany ponownie ma te same wiersze, więc jego indeks pozostaje ważny.
+    """
+
+    def __init__(self, max_entries: int = 20):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, FrameIndex]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, frame: pd.DataFrame) -> FrameIndex:
+        """Indeks zbioru o danym kluczu (tworzony przy pierwszym użyciu)."""
+        with self._lock:
+            index = self._entries.get(key)
+            if index is None or index.rows != len(frame):
+                index = FrameIndex(frame)
+                self._entries[key] = index
+            else:
+                index._frame = weakref.ref(frame)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return index
+
+
+def page_count(rows: int, page_size: int) -> int:
+    """Liczba stron (co najmniej 1, także dla pustego wyniku)."""
+    return max(1, -(-rows // page_size))
+
+
+def page_bounds(page: int, page_size: int, rows: int) -> Tuple[int, int]:
+    """Zakres wierszy [start, stop) strony numerowanej od 1 (numer poza zakresem jest przycinany)."""
+    page = min(max(1, page), page_count(rows, page_size))
+    start = (page - 1) * page_size
+    return start, min(start + page_size, rows)
+
+
+def table_window(
+    view: SelectionView,
+    columns: List[str],
+    page: int,
+    page_size: int,
+    mask: Optional[np.ndarray] = None
+) -> Tuple[pd.DataFrame, int, int, int]:
+    """
+    Okno wierszy do wyświetlenia - pobierane są tylko wiersze strony.
+
+    Args:
+        view: Wiersze zbioru po filtrach i sortowaniu
+        columns: Kolumny tabeli
+        page: Numer strony (od 1)
+        page_size: Liczba wierszy na stronie
+        mask: Maska wyszukiwania (None = wszystkie wiersze)
+
+    Returns:
+        (okno, start, stop, liczba wierszy) - start/stop to pozycje w wyniku wyszukiwania
+    """
+    if mask is None:
+        rows = len(view)
+        start, stop = page_bounds(page, page_size, rows)
+        positions = slice(start, stop) if view.rows is None else np.arange(start, stop)
+    else:
+        matching = np.flatnonzero(mask)
+        rows = len(matching)
+        start, stop = page_bounds(page, page_size, rows)
+        positions = matching[start:stop]
+    return view.take(columns, positions), start, stop, rows
@@ -0,0 +1,112 @@
+"""Testy wspólnej tabeli kodów kategorycznych (CategoryCodec)."""
+import pandas as pd
+import pytest
+
+from cepik_api import CategoryCodec
+
+
+@pytest.fixture
+def codec():
+    return CategoryCodec(['marka', 'model'])
+
+
+def test_codes_are_stable_across_calls(codec):
+    first = codec.codes('marka', pd.Series(['TOYOTA', 'BMW', None, 'TOYOTA']))
+    second = codec.codes('marka', pd.Series(['AUDI', 'BMW', 'TOYOTA']))
+    third = codec.codes('marka', pd.Series(['BMW', None, 'AUDI']))
+    
+    assert first.tolist() == [0, 1, -1, 0]
+    assert second.tolist() == [2, 1, 0]
+    assert third.tolist() == [1, -1, 2]
+    assert list(codec.dtype('marka').categories) == ['TOYOTA', 'BMW', 'AUDI']
+
+
+def test_seed_assigns_codes_before_data(codec):
+    codec.seed('marka', ['VOLVO', 'AUDI', None, 'VOLVO'])
+    codec.seed('kolor', ['CZARNY'])  # kolumna spoza tabeli
+    
+    assert codec.codes('marka', pd.Series(['AUDI', 'FIAT'])).tolist() == [1, 2]
+    assert len(codec) == 3
+
+
+def test_columns_have_separate_tables(codec):
+    codec.codes('marka', pd.Series(['TOYOTA']))
+    
+    assert codec.codes('model', pd.Series(['YARIS', 'TOYOTA'])).tolist() == [0, 1]
+
+
+def test_encode_keeps_values_and_index(codec):
+    values = pd.Series(['BMW', None, 'AUDI'], index=[5, 6, 7], name='marka')
+    encoded = codec.encode('marka', values)
+    
+    assert isinstance(encoded.dtype, pd.CategoricalDtype)
+    assert encoded.index.tolist() == [5, 6, 7]
+    assert encoded.astype(object).where(encoded.notna(), None).tolist() == ['BMW', None, 'AUDI']
+    # Ponowne kodowanie już zakodowanej kolumny nie zmienia kodów
+    assert codec.codes('marka', encoded).tolist() == encoded.cat.codes.tolist()
+
+
+def test_foreign_categorical_is_remapped(codec):
+    codec.codes('marka', pd.Series(['TOYOTA', 'BMW']))
+    foreign = pd.Series(pd.Categorical(['AUDI', 'BMW', None], categories=['BMW', 'AUDI']))
+    
+    assert codec.codes('marka', foreign).tolist() == [2, 1, -1]
+
+
+def as_objects(series):
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def test_concat_frames_with_different_categories(codec):
+    first = codec.encode_frame(pd.DataFrame({'marka': ['TOYOTA', 'BMW'], 'rok': [2010, 2011]}))
+    second = pd.DataFrame({
+        'marka': pd.Categorical(['AUDI', None, 'BMW'], categories=['AUDI', 'BMW']),
+        'rok': [2012, 2013, 2014],
+        'model': ['A4', None, 'X5'],
+    })
+    third = pd.DataFrame({'marka': ['FIAT'], 'rok': [2015]})
+    
+    result = codec.concat([first, second, third], ignore_index=True)
+    
+    assert list(result.columns) == ['marka', 'rok', 'model']
+    assert as_objects(result['marka']) == ['TOYOTA', 'BMW', 'AUDI', None, 'BMW', 'FIAT']
+    assert as_objects(result['model']) == [None, None, 'A4', None, 'X5', None]
+    assert result['rok'].tolist() == [2010, 2011, 2012, 2013, 2014, 2015]
+    assert result['marka'].dtype == codec.dtype('marka')
+    assert result['model'].dtype == codec.dtype('model')
+
+
+def test_concat_shared_dtype_in_different_columns(codec):
+    # Ten sam obiekt typu w dwóch kolumnach - mapowanie kategorii jest liczone per kolumna
+    codec.codes('model', pd.Series(['YARIS']))
+    values = pd.Categorical(['AUDI', 'BMW'], categories=['BMW', 'AUDI'])
+    frame = pd.DataFrame({'marka': values, 'model': values[::-1]})
+    assert frame['marka'].dtype is frame['model'].dtype
+    
+    result = codec.concat([frame, frame], ignore_index=True)
+    
+    assert as_objects(result['marka']) == ['AUDI', 'BMW', 'AUDI', 'BMW']
+    assert as_objects(result['model']) == ['BMW', 'AUDI', 'BMW', 'AUDI']
+
+
+def test_concat_with_spilled_arrow_frames(codec, tmp_path):
+    dataset_store = pytest.importorskip('dataset_store')
+    pytest.importorskip('pyarrow')
+    
+    frame = codec.encode_frame(pd.DataFrame({'marka': ['TOYOTA', None, 'BMW'], 'model': ['YARIS', 'X5', None]}))
+    path = str(tmp_path / 'spill.arrow')
+    dataset_store.write_arrow_file(path, frame)
+    spilled, _ = dataset_store.read_arrow_file(path)
+    # Kolumna tekstowa zapisana przed kodowaniem wraca jako pd.ArrowDtype
+    raw_path = str(tmp_path / 'raw.arrow')
+    dataset_store.write_arrow_file(raw_path, pd.DataFrame({'marka': ['AUDI', None], 'model': ['A4', 'Q5']}))
+    raw, _ = dataset_store.read_arrow_file(raw_path)
+    assert isinstance(raw['marka'].dtype, pd.ArrowDtype)
+    fresh = codec.encode_frame(pd.DataFrame({'marka': ['FIAT'], 'model': ['PANDA']}))
+    
+    result = codec.concat([spilled, raw, fresh], ignore_index=True)
+    
+    assert as_objects(result['marka']) == ['TOYOTA', None, 'BMW', 'AUDI', None, 'FIAT']
+    assert as_objects(result['model']) == ['YARIS', 'X5', None, 'A4', 'Q5', 'PANDA']
+    # Kody zapisane przed przeniesieniem na dysk się nie zmieniają
+    assert result['marka'].cat.codes.tolist()[:3] == frame['marka'].cat.codes.tolist()
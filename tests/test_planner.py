@@ -0,0 +1,154 @@
+"""Testy planera zapytań (CepikAPI.plan_query bez próbek meta.count)."""
+import pytest
+
+from cepik_api import CepikAPI, _merge_filter_values
+
+
+@pytest.fixture
+def api():
+    return CepikAPI()
+
+
+def plan(api, **spec):
+    spec.setdefault('voivodeship_code', '14')
+    spec.setdefault('date_from', '20240101')
+    spec.setdefault('date_to', '20240131')
+    return api.plan_query(spec, probe=False)
+
+
+def test_string_filter_is_pushed_down(api):
+    result = plan(api, filters={'rodzaj-paliwa': 'BENZYNA'})
+    
+    assert result['api_filters'] == {'rodzaj-paliwa': 'BENZYNA'}
+    assert result['fanout'] == {}
+    assert result['local_filters'] == {}
+    assert len(result['queries']) == 1
+    assert result['queries'][0]['additional_filters'] == {'rodzaj-paliwa': 'BENZYNA'}
+
+
+def test_single_value_list_is_pushed_down(api):
+    result = plan(api, filters={'rodzaj-paliwa': ['BENZYNA']})
+    
+    assert result['api_filters'] == {'rodzaj-paliwa': 'BENZYNA'}
+    assert result['fanout'] == {}
+    assert len(result['queries']) == 1
+
+
+def test_short_list_fans_out_one_query_per_value(api):
+    values = ['BENZYNA', 'OLEJ NAPĘDOWY', 'GAZ']
+    result = plan(api, voivodeship_codes=['14', '24'], filters={'rodzaj-paliwa': values})
+    
+    assert result['fanout'] == {'rodzaj-paliwa': values}
+    assert result['local_filters'] == {}
+    assert [(q['voivodeship_code'], q['additional_filters']['rodzaj-paliwa']) for q in result['queries']] == [
+        (code, value) for code in ['14', '24'] for value in values
+    ]
+
+
+def test_list_at_fanout_limit_fans_out(api):
+    values = [f'V{i}' for i in range(CepikAPI.MAX_FANOUT_VALUES)]
+    result = plan(api, filters={'rodzaj-paliwa': values})
+    
+    assert result['fanout'] == {'rodzaj-paliwa': values}
+    assert len(result['queries']) == CepikAPI.MAX_FANOUT_VALUES
+
+
+def test_list_over_fanout_limit_is_filtered_locally(api):
+    values = [f'V{i}' for i in range(CepikAPI.MAX_FANOUT_VALUES + 1)]
+    result = plan(api, filters={'rodzaj-paliwa': values})
+    
+    assert result['fanout'] == {}
+    assert result['local_filters'] == {'rodzaj-paliwa': values}
+    assert len(result['queries']) == 1
+    assert result['queries'][0]['additional_filters'] == {}
+
+
+def test_only_one_column_fans_out(api):
+    result = plan(api, filters={'rodzaj-paliwa': ['BENZYNA', 'GAZ'], 'rodzaj-pojazdu': ['A', 'B']})
+    
+    assert result['fanout'] == {'rodzaj-paliwa': ['BENZYNA', 'GAZ']}
+    assert result['local_filters'] == {'rodzaj-pojazdu': ['A', 'B']}
+    assert len(result['queries']) == 2
+
+
+def test_unknown_column_is_filtered_locally(api):
+    result = plan(api, filters={'kolor': 'CZARNY'})
+    
+    assert result['api_filters'] == {}
+    assert result['local_filters'] == {'kolor': 'CZARNY'}
+
+
+def test_brand_list_fans_out_as_brand_parameter(api):
+    result = plan(api, brand=['TOYOTA', 'BMW'])
+    
+    assert result['fanout'] == {'marka': ['TOYOTA', 'BMW']}
+    assert [q['brand'] for q in result['queries']] == ['TOYOTA', 'BMW']
+    assert all('marka' not in q['additional_filters'] for q in result['queries'])
+
+
+def test_long_brand_list_is_filtered_locally(api):
+    brands = [f'MARKA{i}' for i in range(CepikAPI.MAX_FANOUT_VALUES + 1)]
+    result = plan(api, brand=brands)
+    
+    assert result['fanout'] == {}
+    assert result['local_filters'] == {'marka': brands}
+    assert [q['brand'] for q in result['queries']] == [None]
+
+
+def test_brand_from_filters_is_merged_with_parameter(api):
+    result = plan(api, brand='TOYOTA', filters={'marka': ['TOYOTA', 'BMW']})
+    
+    assert result['fanout'] == {}
+    assert [q['brand'] for q in result['queries']] == ['TOYOTA']
+
+
+def test_model_list_gives_query_per_model(api):
+    result = plan(api, brand='TOYOTA', model=['YARIS', 'COROLLA'])
+    
+    assert [(q['brand'], q['model']) for q in result['queries']] == [('TOYOTA', 'YARIS'), ('TOYOTA', 'COROLLA')]
+
+
+def test_year_range_is_filtered_locally(api):
+    result = plan(api, year_from=2015, year_to=2020)
+    
+    assert result['local_filters'] == {'rok-produkcji': (2015, 2020)}
+    assert result['api_filters'] == {}
+
+
+def test_all_voivodeships_by_default(api):
+    result = plan(api, voivodeship_code=None)
+    
+    assert [q['voivodeship_code'] for q in result['queries']] == list(CepikAPI.WOJEWODZTWA_KODY)
+
+
+def test_plan_without_probe_has_no_estimates(api):
+    result = plan(api)
+    
+    assert result['estimated_count'] == 0
+    assert result['pages'] == 0
+    assert result['errors'] == []
+    assert all(q['pages'] is None for q in result['queries'])
+
+
+@pytest.mark.parametrize('column', ['marka', 'model'])
+def test_conflicting_brand_or_model_raises(api, column):
+    parameter = 'brand' if column == 'marka' else 'model'
+    with pytest.raises(ValueError):
+        plan(api, **{parameter: 'A'}, filters={column: 'B'})
+
+
+@pytest.mark.parametrize('value, other, expected', [
+    (None, 'A', 'A'),
+    ('A', None, 'A'),
+    ('A', '', 'A'),
+    ('', [], None),
+    ('A', ['A', 'B'], 'A'),
+    (['A', 'B', 'C'], ['C', 'B'], ['B', 'C']),
+])
+def test_merge_filter_values(value, other, expected):
+    assert _merge_filter_values('marka', value, other) == expected
+
+
+def test_merge_filter_values_conflict():
+    with pytest.raises(ValueError, match="marka"):
+        _merge_filter_values('marka', ['A', 'B'], ['C'])
@@ -0,0 +1,123 @@
+"""Testy predykatów: maski Col(...) muszą być zgodne z odpowiednimi wyrażeniami pandas."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from cepik_api import Col, Predicate, _BoolOp, _IsIn, _IsNull, _Not, _Range, all_of, filters_predicate
+
+try:
+    import pyarrow as pa  # Kolumny tekstowe z migawek (ArrowDtype)
+except ImportError:
+    pa = None
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        'rok-produkcji': ['2010', '2015', None, 'brak', '2020', '2018'],
+        'masa-wlasna': pd.array([900, pd.NA, 1500, 1200, pd.NA, 2000], dtype='Int64'),
+        'marka': pd.Categorical(['TOYOTA', 'BMW', None, 'AUDI', 'TOYOTA', None]),
+        'kolor': ['CZARNY', None, 'BIAŁY', 'CZARNY', np.nan, 'SREBRNY'],
+        'rodzaj-paliwa': pd.array(
+            ['BENZYNA', None, 'GAZ', 'BENZYNA', 'OLEJ NAPĘDOWY', None], dtype=pd.ArrowDtype(pa.string()) if pa else 'string'
+        ),
+    })
+
+
+def numeric(frame, column):
+    return pd.to_numeric(frame[column], errors='coerce')
+
+
+def expected_masks(frame):
+    """Pary (predykat, maska pandas) dla tej samej ramki."""
+    year = numeric(frame, 'rok-produkcji')
+    weight = numeric(frame, 'masa-wlasna')
+    return [
+        (Col('rok-produkcji').between(2012, 2019), year.between(2012, 2019)),
+        (Col('rok-produkcji').ge(2015), year >= 2015),
+        (Col('rok-produkcji').le(2015), year <= 2015),
+        (Col('rok-produkcji').between(), year.notna()),
+        (Col('masa-wlasna').between(1000, None), weight >= 1000),
+        (Col('masa-wlasna').isin([900, 2000]), weight.isin([900, 2000])),
+        (Col('rok-produkcji').isin([2010, 2020]), year.isin([2010, 2020])),
+        (Col('marka').eq('TOYOTA'), frame['marka'] == 'TOYOTA'),
+        (Col('marka').isin(['BMW', 'AUDI']), frame['marka'].isin(['BMW', 'AUDI'])),
+        (Col('kolor').isin(['CZARNY']), frame['kolor'].isin(['CZARNY'])),
+        (Col('rodzaj-paliwa').eq('BENZYNA'), frame['rodzaj-paliwa'] == 'BENZYNA'),
+        (Col('marka').isnull(), frame['marka'].isna()),
+        (Col('kolor').isnull(), frame['kolor'].isna()),
+        (Col('masa-wlasna').notnull(), frame['masa-wlasna'].notna()),
+        (Col('rodzaj-paliwa').isnull(), frame['rodzaj-paliwa'].isna()),
+        (
+            Col('rok-produkcji').ge(2015) & Col('marka').eq('TOYOTA'),
+            (year >= 2015) & (frame['marka'] == 'TOYOTA'),
+        ),
+        (
+            Col('marka').isnull() | Col('kolor').eq('CZARNY'),
+            frame['marka'].isna() | (frame['kolor'] == 'CZARNY'),
+        ),
+        (~Col('marka').eq('TOYOTA'), ~(frame['marka'] == 'TOYOTA').fillna(False)),
+        (~Col('rok-produkcji').between(2012, 2019), ~year.between(2012, 2019)),
+        (
+            ~(Col('marka').isin(['BMW', 'AUDI']) | Col('masa-wlasna').le(1000)),
+            ~(frame['marka'].isin(['BMW', 'AUDI']) | (weight <= 1000).fillna(False)),
+        ),
+    ]
+
+
+def as_bool(mask):
+    return np.asarray(pd.Series(mask).fillna(False), dtype=bool)
+
+
+def test_masks_match_pandas(frame):
+    for predicate, expected in expected_masks(frame):
+        mask = predicate.mask(frame)
+        assert mask.dtype == bool
+        assert mask.tolist() == as_bool(expected).tolist()
+
+
+def test_masks_on_columnar_chunk_match_dataframe(frame):
+    # Fragment kolumnowy z decode_page_worker: listy wartości tekstowych z None
+    chunk = {
+        column: [None if pd.isna(value) else (str(value) if column == 'masa-wlasna' else value) for value in frame[column]]
+        for column in frame.columns
+    }
+    for predicate, expected in expected_masks(frame):
+        assert predicate.mask(chunk).tolist() == as_bool(expected).tolist()
+
+
+def test_missing_column_behaves_like_all_missing(frame):
+    assert Col('brak').isnull().mask(frame).all()
+    assert not Col('brak').eq('X').mask(frame).any()
+    assert not Col('brak').between(1, 2).mask({'kolor': ['A', 'B']}).any()
+    assert Col('brak').isnull().mask({}, rows=3).tolist() == [True, True, True]
+
+
+def test_operators_build_expression_tree():
+    a, b, c = Col('a').eq(1), Col('b').isnull(), Col('c').between(1, 2)
+    
+    assert isinstance(a, _IsIn) and isinstance(b, _IsNull) and isinstance(c, _Range)
+    assert isinstance(~a, _Not)
+    combined = (a & b) & c
+    assert isinstance(combined, _BoolOp) and combined.op == 'and' and combined.parts == [a, b, c]
+    assert (a | b).op == 'or'
+    assert combined.columns() == {'a', 'b', 'c'}
+
+
+def test_predicate_is_abstract():
+    with pytest.raises(TypeError):
+        Predicate()
+
+
+def test_all_of_and_filters_predicate(frame):
+    assert all_of(None, None) is None
+    single = Col('marka').eq('BMW')
+    assert all_of(None, single) is single
+    
+    where = filters_predicate({'rok-produkcji': (2012, None), 'marka': ['TOYOTA', 'BMW'], 'kolor': 'CZARNY'})
+    expected = (
+        (numeric(frame, 'rok-produkcji') >= 2012)
+        & frame['marka'].isin(['TOYOTA', 'BMW'])
+        & (frame['kolor'] == 'CZARNY')
+    )
+    assert where.mask(frame).tolist() == as_bool(expected).tolist()
@@ -0,0 +1,187 @@
+"""Testy budżetu zapytań proxy (UpstreamGovernor) i nagłówków kolejki w odpowiedziach."""
+import json
+import threading
+import time
+import urllib.request
+from http.server import ThreadingHTTPServer
+from urllib.error import HTTPError
+
+import pytest
+
+import proxy_server
+from proxy_server import QueueFullError, UpstreamGovernor
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "przekroczono czas oczekiwania"
+        time.sleep(0.005)
+
+
+class Clients:
+    """Wątki klientów czekające w governor.acquire; kolejność przydziału w `granted`."""
+    
+    def __init__(self, governor):
+        self.governor = governor
+        self.granted = []
+        self.positions = {}
+        self.errors = []
+        self.threads = []
+    
+    def enqueue(self, client, name=None):
+        def run():
+            try:
+                position, _ = self.governor.acquire(client)
+            except QueueFullError as e:
+                self.errors.append((client, e))
+                return
+            self.positions[name or client] = position
+            self.granted.append(client)
+            self.governor.release()
+        
+        waiting = self.governor.stats()['waiting']
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+        # Kolejność w kolejce jest częścią testu - następny klient dopiero po dopisaniu
+        wait_for(lambda: self.governor.stats()['waiting'] == waiting + 1)
+    
+    def join(self):
+        for thread in self.threads:
+            thread.join(timeout=2)
+
+
+@pytest.fixture
+def governor():
+    governor = UpstreamGovernor(rate=0, parallel=1, max_queue=10, max_wait=5)
+    # Jedyne miejsce zajęte - wszyscy kolejni klienci czekają w kolejce
+    governor.acquire('holder')
+    return governor
+
+
+def test_clients_are_served_round_robin(governor):
+    clients = Clients(governor)
+    for i in range(4):
+        clients.enqueue('A', f'A{i}')
+    clients.enqueue('B')
+    clients.enqueue('C')
+    
+    governor.release()
+    clients.join()
+    
+    assert clients.granted == ['A', 'B', 'C', 'A', 'A', 'A']
+    assert governor.stats() == {'active': 0, 'waiting': 0, 'clients': 0, 'granted': 7, 'rejected': 0}
+
+
+def test_queue_position_counts_other_clients_round_robin(governor):
+    clients = Clients(governor)
+    for i in range(3):
+        clients.enqueue('A', f'A{i}')
+    clients.enqueue('B')
+    clients.enqueue('C')
+    clients.enqueue('B', 'B1')
+    
+    governor.release()
+    clients.join()
+    
+    # A: własne zapytania; B i C: jedno zapytanie każdego klienta przed nimi na rundę
+    assert clients.positions == {'A0': 0, 'A1': 1, 'A2': 2, 'B': 1, 'C': 2, 'B1': 4}
+
+
+def test_full_client_queue_is_rejected(governor):
+    governor.max_queue = 2
+    clients = Clients(governor)
+    clients.enqueue('A')
+    clients.enqueue('A')
+    
+    with pytest.raises(QueueFullError) as error:
+        governor.acquire('A')
+    assert error.value.retry_after > 0
+    
+    # Inny klient ma własną kolejkę
+    clients.enqueue('B')
+    governor.release()
+    clients.join()
+    assert clients.granted == ['A', 'B', 'A']
+    assert governor.stats()['rejected'] == 1
+
+
+def test_wait_longer_than_max_wait_is_rejected(governor):
+    governor.max_wait = 0.05
+    
+    with pytest.raises(QueueFullError):
+        governor.acquire('A')
+    assert governor.stats()['waiting'] == 0
+
+
+def test_rate_spaces_upstream_starts():
+    governor = UpstreamGovernor(rate=20, parallel=4)
+    starts = []
+    for _ in range(4):
+        governor.acquire('A')
+        starts.append(time.monotonic())
+        governor.release()
+    
+    assert min(b - a for a, b in zip(starts, starts[1:])) >= 0.04
+
+
+@pytest.fixture
+def proxy(monkeypatch, governor):
+    """Proxy na losowym porcie z fałszywym API i governor z zajętym jedynym miejscem."""
+    monkeypatch.setattr(proxy_server, 'governor', governor)
+    monkeypatch.setattr(proxy_server, '_open_upstream', lambda api_path: b'{"data": []}')
+    monkeypatch.setattr(proxy_server, 'print', lambda *args, **kwargs: None, raising=False)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), proxy_server.CORSRequestHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def get(url, client):
+    request = urllib.request.Request(url, headers={'X-Client-Id': client})
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return response.status, response.headers, response.read()
+
+
+def test_response_has_queue_position(proxy, governor):
+    clients = Clients(governor)
+    clients.enqueue('A')
+    clients.enqueue('A')
+    result = {}
+    request = threading.Thread(target=lambda: result.update(response=get(f'{proxy}/api/slowniki/marka', 'B')))
+    request.start()
+    wait_for(lambda: governor.stats()['waiting'] == 3)
+    
+    time.sleep(0.05)
+    governor.release()
+    request.join(timeout=5)
+    clients.join()
+    
+    status, headers, body = result['response']
+    assert status == 200
+    assert body == b'{"data": []}'
+    assert headers['X-Queue-Position'] == '1'
+    assert float(headers['X-Queue-Wait']) >= 0.05
+    assert headers['X-Cache'] == 'MISS'
+    assert clients.granted == ['A', 'A']
+
+
+def test_queue_overflow_returns_503_with_retry_after(proxy, governor):
+    governor.max_queue = 1
+    clients = Clients(governor)
+    clients.enqueue('A')
+    
+    with pytest.raises(HTTPError) as error:
+        get(f'{proxy}/api/slowniki/marka', 'A')
+    
+    assert error.value.code == 503
+    assert error.value.headers['Retry-After'] == '5'
+    assert 'error' in json.loads(error.value.read())
+    
+    governor.release()
+    clients.join()
+    assert clients.granted == ['A']
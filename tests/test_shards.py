@@ -0,0 +1,218 @@
+"""Testy pobierania wszystkich województw w shardach (ShardScheduler, search_all_voivodeships_columnar)."""
+import json
+import threading
+import time
+
+import pytest
+import requests
+
+import cepik_api
+from cepik_api import CepikAPI, PAGE_LIMIT, ProgressStream, RetryPolicy, ShardScheduler
+
+ROWS_PER_PAGE = 5
+
+
+def test_scheduler_prefers_own_queue_newest_first():
+    scheduler = ShardScheduler(2)
+    for task in ['a', 'b', 'c']:
+        scheduler.push(0, task)
+    
+    assert scheduler.get(0) == 'c'
+    assert scheduler.stolen == 0
+
+
+def test_scheduler_steals_oldest_task_from_longest_queue():
+    scheduler = ShardScheduler(3)
+    scheduler.push(0, 'a')
+    for task in ['b', 'c', 'd']:
+        scheduler.push(1, task)
+    
+    assert scheduler.get(2) == 'b'
+    assert scheduler.stolen == 1
+
+
+def test_scheduler_waits_for_tasks_that_add_work():
+    scheduler = ShardScheduler(2)
+    scheduler.push(0, 'first')
+    assert scheduler.get(0) == 'first'
+    
+    # Zadanie w toku może dodać pracę - drugi wątek nie może jeszcze zakończyć
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(scheduler.get(1)))
+    waiter.start()
+    time.sleep(0.05)
+    assert waiter.is_alive()
+    
+    scheduler.push(0, 'second')
+    scheduler.task_done()
+    waiter.join(timeout=1)
+    assert result == ['second']
+    
+    scheduler.task_done()
+    assert scheduler.get(0) is None
+    assert scheduler.get(1) is None
+
+
+def make_response(url, payload, status=200):
+    response = requests.Response()
+    response.status_code = status
+    response.url = url
+    response._content = json.dumps(payload).encode()
+    return response
+
+
+class FakeApi:
+    """
+    Fałszywe /pojazdy: województwo ma pages[kod] stron po ROWS_PER_PAGE rekordów
+    (meta.count jak przy pełnych stronach), ID są unikalne dla (kod, marka, strona, wiersz).
+    fail(kod, strona, razy) - odpowiedź 500 dla danej strony przez podaną liczbę prób.
+    """
+    
+    def __init__(self, pages, delay=0.005):
+        self.pages = pages
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.requests = []   # (kod, marka, strona)
+        self.threads = {}    # kod -> wątki, które pobierały jego strony
+        self.failures = {}
+    
+    def fail(self, code, page, times=1):
+        self.failures[(code, page)] = times
+    
+    def get(self, url, params=None, timeout=None, **kwargs):
+        time.sleep(self.delay)
+        code = params['wojewodztwo']
+        brand = params.get('filter[marka]', '')
+        page = int(params.get('page', 1))
+        pages = self.pages.get(code, 1)
+        with self.lock:
+            self.requests.append((code, brand, page))
+            self.threads.setdefault(code, set()).add(threading.get_ident())
+            if self.failures.get((code, page)):
+                self.failures[(code, page)] -= 1
+                return make_response(url, {}, 500)
+        
+        data = [{
+            'id': f'{code}-{brand}-{page}-{row}',
+            'type': 'pojazd',
+            'attributes': {
+                'marka': brand or 'TOYOTA',
+                'model': 'YARIS',
+                'rok-produkcji': str(2000 + row),
+                'wojewodztwo-kod': code,
+            }
+        } for row in range(ROWS_PER_PAGE)]
+        return make_response(url, {
+            'data': data,
+            'meta': {'count': pages * PAGE_LIMIT},
+            'links': {'next': 'next' if page < pages else None}
+        })
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = FakeApi({'14': 20, '24': 10})
+    monkeypatch.setattr(requests.Session, 'get', lambda session, url, **kwargs: fake.get(url, **kwargs))
+    return fake
+
+
+@pytest.fixture
+def api():
+    api = CepikAPI(hedging=False, retry_policy=RetryPolicy(max_retries=0, base_delay=0.01))
+    api.rate_limiter.min_interval = 0
+    return api
+
+
+def expected_pages(fake, codes):
+    return sum(fake.pages.get(code, 1) for code in codes)
+
+
+def test_crawl_fetches_every_page_once(api, fake):
+    df, errors, statuses = api.search_all_voivodeships_columnar('20240101', '20240131')
+    
+    codes = list(CepikAPI.WOJEWODZTWA_KODY)
+    total = expected_pages(fake, codes)
+    assert errors == []
+    assert len(df) == total * ROWS_PER_PAGE
+    assert df['id'].is_unique
+    assert sorted(fake.requests) == sorted(
+        (code, '', page) for code in codes for page in range(1, fake.pages.get(code, 1) + 1)
+    )
+    assert {s['status'] for s in statuses.values()} == {'✅ Ukończono'}
+    assert statuses['14']['pages'] == 20
+    assert statuses['14']['count'] == 20 * ROWS_PER_PAGE
+
+
+def test_large_voivodeship_is_split_between_workers(api, fake):
+    api.search_all_voivodeships_columnar('20240101', '20240131', max_workers=4)
+    
+    # 20 stron = pierwsza strona + shardy po SHARD_PAGES stron przejmowane przez wolne wątki
+    assert CepikAPI.SHARD_PAGES < 19
+    assert len(fake.threads['14']) > 1
+
+
+def test_crawl_from_plan_queries(api, fake):
+    plan = api.plan_query({
+        'voivodeship_codes': ['14', '24'],
+        'date_from': '20240101',
+        'date_to': '20240131',
+        'brand': ['TOYOTA', 'BMW'],
+        'year_from': 2002,
+        'filters': {'rodzaj-paliwa': 'BENZYNA'}
+    }, probe=False)
+    
+    df, errors, statuses = api.search_all_voivodeships_columnar('20240101', '20240131', plan=plan)
+    
+    assert errors == []
+    assert set(statuses) == {'14', '24'}
+    assert {brand for _, brand, _ in fake.requests} == {'TOYOTA', 'BMW'}
+    # Filtr lokalny roku z planu: wiersze 0 i 1 każdej strony (2000, 2001) odrzucone
+    assert len(df) == 2 * (20 + 10) * (ROWS_PER_PAGE - 2)
+    assert df['id'].is_unique
+    assert df['rok-produkcji'].min() == 2002
+
+
+def test_progress_starts_once_per_voivodeship(api, fake, monkeypatch):
+    started = []
+    original = ProgressStream.start
+    
+    def start(self, key):
+        started.append(key)
+        original(self, key)
+    
+    monkeypatch.setattr(ProgressStream, 'start', start)
+    plan = api.plan_query({
+        'voivodeship_codes': ['14', '24'], 'date_from': '20240101', 'date_to': '20240131', 'brand': ['A', 'B', 'C']
+    }, probe=False)
+    
+    api.search_all_voivodeships_columnar('20240101', '20240131', plan=plan)
+    
+    assert sorted(started) == ['14', '24']
+
+
+def test_failure_mid_crawl_drops_only_that_voivodeship(api, fake):
+    fake.fail('14', 12)
+    
+    df, errors, statuses = api.search_all_voivodeships_columnar('20240101', '20240131')
+    
+    assert len(errors) == 1 and errors[0].startswith('MAZOWIECKIE: Błąd połączenia: 500')
+    assert statuses['14']['status'] == '❌ Błąd'
+    assert statuses['24']['status'] == '✅ Ukończono'
+    assert not df['id'].str.startswith('14-').any()
+    others = expected_pages(fake, [code for code in CepikAPI.WOJEWODZTWA_KODY if code != '14'])
+    assert len(df) == others * ROWS_PER_PAGE
+    assert df['id'].is_unique
+
+
+def test_transient_failure_is_retried(fake, monkeypatch):
+    api = CepikAPI(hedging=False, retry_policy=RetryPolicy(max_retries=2, base_delay=0.01))
+    api.rate_limiter.min_interval = 0
+    fake.fail('14', 12)
+    fake.fail('24', 1)
+    
+    df, errors, statuses = api.search_all_voivodeships_columnar('20240101', '20240131')
+    
+    assert errors == []
+    assert len(df) == expected_pages(fake, CepikAPI.WOJEWODZTWA_KODY) * ROWS_PER_PAGE
+    assert df['id'].is_unique
+    assert fake.requests.count(('14', '', 12)) == 2
@@ -0,0 +1,168 @@
+"""
+Serie czasowe rejestracji pojazdów
+Liczby rejestracji w okresach (dzień / tydzień / miesiąc), opcjonalnie w podziale
+na wartości kolumny kategorycznej (marka, rodzaj paliwa, ...). Okres każdego
+wiersza i kody kategorii liczone są raz na wersję zbioru; zliczanie to jedno
+np.bincount po połączonym kluczu (okres, kategoria), bez grupowania w pandas.
+"""
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from cepik_api import parse_dates
+from table_view import FrameIndex
+
+# Okresy: kod -> etykieta
+FREQUENCIES = {'D': 'Dzień', 'W': 'Tydzień', 'M': 'Miesiąc'}
+
+OTHER_LABEL = 'Inne'
+MISSING_LABEL = '(brak)'
+
+
+def bucket_ids(dates: pd.Series, freq: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Numer okresu każdego wiersza (od 0 dla najwcześniejszego, brak daty = -1).
+
+    Args:
+        dates: Kolumna dat (datetime64 lub tekst "YYYY-MM-DD")
+        freq: 'D' (dzień), 'W' (tydzień od poniedziałku) lub 'M' (miesiąc)
+
+    Returns:
+        (numery okresów, daty początku kolejnych okresów)
+    """
+    values = parse_dates(dates).to_numpy(dtype='datetime64[ns]')
+    valid = ~np.isnat(values)
+    if freq == 'M':
+        ids = values.astype('datetime64[M]').astype(np.int64)
+    else:
+        ids = values.astype('datetime64[D]').astype(np.int64)
+        if freq == 'W':
+            ids = (ids + 3) // 7  # 1970-01-01 to czwartek - tygodnie od poniedziałku
+    if not valid.any():
+        return np.full(len(values), -1, dtype=np.int32), np.array([], dtype='datetime64[D]')
+
+    low, high = ids[valid].min(), ids[valid].max()
+    steps = np.arange(low, high + 1)
+    if freq == 'M':
+        starts = steps.astype('datetime64[M]').astype('datetime64[D]')
+    elif freq == 'W':
+        starts = (steps * 7 - 3).astype('datetime64[D]')
+    else:
+        starts = steps.astype('datetime64[D]')
+    return np.where(valid, ids - low, -1).astype(np.int32), starts
+
+
+class TrendEngine:
+    """
+    Liczby rejestracji w okresach dla zbiorów kluczowanych wersją (DatasetHandle.version).
+    Zapamiętuje okresy wierszy i gotowe serie (najdawniej używane usuwane powyżej limitu).
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, object]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, key: Hashable, factory, valid=None):
+        with self._lock:
+            if key in self._entries and (valid is None or valid(self._entries[key])):
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = factory()
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def counts(
+        self,
+        dataset_key: Hashable,
+        frame: pd.DataFrame,
+        index: FrameIndex,
+        date_column: str,
+        freq: str = 'M',
+        by: Optional[str] = None,
+        rows: Optional[np.ndarray] = None,
+        selection_key: Hashable = None,
+        top: int = 8
+    ) -> pd.DataFrame:
+        """
+        Liczba rejestracji w okresach.
+
+        Args:
+            dataset_key: Wersja zbioru (DatasetHandle.version - klucz w rejestrze i czas
+                rejestracji; sam klucz może wskazywać zbiór pobrany ponownie)
+            frame: Zbiór
+            index: Indeks zbioru (kody kategorii kolumny by)
+            date_column: Kolumna daty
+            freq: 'D', 'W' lub 'M'
+            by: Kolumna kategoryczna podziału (None = jedna seria 'Liczba')
+            rows: Pozycje wybranych wierszy (None = cały zbiór)
+            selection_key: Klucz wyboru wierszy (np. filtry) - bez niego wynik
+                dla podzbioru nie jest zapamiętywany
+            top: Liczba najczęstszych kategorii (pozostałe jako 'Inne')
+
+        Returns:
+            DataFrame: indeks - początek okresu, kolumny - serie
+        """
+        result_key = ('counts', dataset_key, date_column, freq, by, top, selection_key if rows is not None else None)
+        if rows is not None and selection_key is None:
+            return self._count(dataset_key, frame, index, date_column, freq, by, rows, top)
+        return self._cached(result_key, lambda: self._count(dataset_key, frame, index, date_column, freq, by, rows, top))
+
+    def _count(self, dataset_key, frame, index, date_column, freq, by, rows, top) -> pd.DataFrame:
+        # Okresy muszą odpowiadać wierszom zbioru - inaczej wpis jest liczony od nowa
+        ids, starts = self._cached(
+            ('buckets', dataset_key, date_column, freq),
+            lambda: bucket_ids(frame[date_column], freq),
+            valid=lambda cached: len(cached[0]) == len(frame)
+        )
+        if rows is not None:
+            ids = ids[rows]
+        valid = ids >= 0
+        periods = len(starts)
+        period_index = pd.DatetimeIndex(starts, name='okres')
+
+        if by is None:
+            counts = np.bincount(ids[valid], minlength=periods)
+            return _trim(pd.DataFrame({'Liczba': counts}, index=period_index))
+
+        codes, distinct = index.codes(by)
+        if rows is not None:
+            codes = codes[rows]
+        codes = np.where(codes < 0, distinct, codes)[valid]  # brak wartości jako osobna kategoria
+        ids = ids[valid]
+
+        # Najczęstsze kategorie, reszta łącznie jako 'Inne'
+        totals = np.bincount(codes, minlength=distinct + 1)
+        ranked = np.argsort(-totals, kind='stable')
+        chosen = ranked[:top][totals[ranked[:top]] > 0]
+        lookup = np.full(distinct + 1, len(chosen), dtype=np.int64)
+        lookup[chosen] = np.arange(len(chosen))
+        series = len(chosen) + 1
+
+        counts = np.bincount(ids.astype(np.int64) * series + lookup[codes], minlength=periods * series).reshape(periods, series)
+        categories = index.categories(by)
+        labels = [MISSING_LABEL if code == distinct else str(categories[code]) for code in chosen]
+        result = pd.DataFrame(counts, index=period_index, columns=labels + [OTHER_LABEL])
+        if not result[OTHER_LABEL].any():
+            result = result.drop(columns=OTHER_LABEL)
+        return _trim(result)
+
+
+def _trim(result: pd.DataFrame) -> pd.DataFrame:
+    """Usuwa puste okresy na początku i końcu serii (po filtrach)."""
+    nonzero = np.flatnonzero(result.to_numpy().sum(axis=1))
+    if not len(nonzero):
+        return result.iloc[0:0]
+    return result.iloc[nonzero[0]:nonzero[-1] + 1]
+
+
+def shares(counts: pd.DataFrame) -> pd.DataFrame:
+    """Udział serii w każdym okresie [%] (np. zmiana udziału rodzajów paliwa miesiąc do miesiąca)."""
+    totals = counts.sum(axis=1).replace(0, np.nan)
+    return counts.div(totals, axis=0).mul(100).fillna(0)